@@ -1,20 +1,58 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import ClassVar, List, Optional, Dict, Any
+from datetime import datetime, timedelta
 import os
+import json
+import time
+import asyncio
+import pytz
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
 from dotenv import load_dotenv
 
-from app.api.groq_client import GroqClient
-from app.memory.faiss_memory import FaissMemory
-from app.calendar.google_calendar import GoogleCalendar
-from fastapi.responses import RedirectResponse
+from app.api.groq_client import GroqClient, GroqError
+from app.api.jobs import JobManager, JobLimitExceeded
+from app.api.prompt_builder import PromptBuilder
+from app.api.response_cache import ResponseCache
+from app.memory.memory_client import MemoryClient
+from app.monitoring.metrics import REGISTRY
+from fastapi.responses import RedirectResponse, StreamingResponse, PlainTextResponse, JSONResponse
 
 # Load environment variables
 load_dotenv()
 
+STARTUP_SECONDS = REGISTRY.gauge("startup_seconds", "Time taken by each startup stage", ["stage"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global main_loop, services_ready
+    main_loop = asyncio.get_running_loop()
+    services_ready = asyncio.Event()
+    # Open the pooled Groq connection once and share it across requests
+    await groq_client.start()
+    # Memory and Calendar load in the background so the server answers
+    # /health/live right away; /health/ready reports when they are usable
+    startup_task = asyncio.create_task(start_services())
+    yield
+    startup_task.cancel()
+    await asyncio.gather(startup_task, return_exceptions=True)
+    await groq_client.close()
+    calendar_jobs.shutdown()
+    if calendar_sync is not None:
+        calendar_sync.stop()
+    if calendar is not None:
+        calendar.close()
+    memory_executor.shutdown(wait=True)
+    if isinstance(memory, MemoryClient):
+        await memory.close()
+    elif memory is not None:
+        memory.close()
+
 # Initialize FastAPI app
-app = FastAPI(title="Business Assistant API")
+app = FastAPI(title="Business Assistant API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -25,24 +63,256 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "API request latency until the response starts", ["method", "route", "status"]
+)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template so per-user paths share a series
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_SECONDS.observe(
+        time.perf_counter() - started, method=request.method, route=route, status=response.status_code
+    )
+    return response
+
 # Initialize services
-groq_client = GroqClient(api_key=os.getenv("GROQ_API_KEY"))
-memory = FaissMemory()
-calendar = GoogleCalendar()
+groq_client = GroqClient(
+    api_key=os.getenv("GROQ_API_KEY"),
+    timeout=float(os.getenv("GROQ_TIMEOUT", "60")),
+    connect_timeout=float(os.getenv("GROQ_CONNECT_TIMEOUT", "10")),
+    max_connections=int(os.getenv("GROQ_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    prompt_builder=PromptBuilder(
+        max_prompt_tokens=int(os.getenv("PROMPT_MAX_TOKENS", "3000")),
+        max_item_tokens=int(os.getenv("PROMPT_MAX_ITEM_TOKENS", "400")),
+        compressed_item_tokens=int(os.getenv("PROMPT_COMPRESSED_ITEM_TOKENS", "80")),
+        recency_half_life_hours=float(os.getenv("PROMPT_RECENCY_HALF_LIFE_HOURS", "72"))
+    ),
+    base_url=os.getenv("GROQ_API_BASE_URL"),
+    max_retries=int(os.getenv("GROQ_MAX_RETRIES", "2")),
+    backoff_seconds=float(os.getenv("GROQ_BACKOFF_SECONDS", "0.5")),
+    max_backoff_seconds=float(os.getenv("GROQ_MAX_BACKOFF_SECONDS", "8")),
+    hedge_after_seconds=float(os.getenv("GROQ_HEDGE_AFTER_SECONDS")) if os.getenv("GROQ_HEDGE_AFTER_SECONDS") else None,
+    max_concurrency=int(os.getenv("GROQ_MAX_CONCURRENCY", "64")),
+    queue_timeout_seconds=float(os.getenv("GROQ_QUEUE_TIMEOUT_SECONDS", "10")),
+    breaker_failures=int(os.getenv("GROQ_BREAKER_FAILURES", "5")),
+    breaker_reset_seconds=float(os.getenv("GROQ_BREAKER_RESET_SECONDS", "30"))
+)
+# Memory and Calendar are created by start_services() after the server is up:
+# importing FAISS, the embedding model and the Google API client takes seconds
+memory = None
+calendar = None
+calendar_sync = None  # CalendarSyncScheduler, unless CALENDAR_SYNC_INTERVAL_SECONDS is 0
+services_ready = None  # asyncio.Event, set once memory and calendar are usable
+startup = {"error": None, "seconds": {}}
+
+def _build_memory():
+    # Imported here so importing the API doesn't load FAISS or the model
+    from app.memory.memory_server import memory_from_env
+    built = memory_from_env()
+    built.warm_up()
+    return built
+
+def _build_calendar():
+    from app.calendar.google_calendar import GoogleCalendar
+    return GoogleCalendar(
+        max_cached_users=int(os.getenv("CALENDAR_SERVICE_CACHE_SIZE", "256")),
+        api_root_url=os.getenv("GOOGLE_CALENDAR_API_ROOT"),
+        freebusy_ttl_seconds=float(os.getenv("CALENDAR_FREEBUSY_TTL_SECONDS", "300")),
+        credentials_dir=os.getenv("GOOGLE_CREDENTIALS_DIR"),
+        event_cache_path=os.getenv("CALENDAR_EVENT_CACHE_PATH"),
+        sync_past_days=int(os.getenv("CALENDAR_SYNC_PAST_DAYS", "7"))
+    )
+
+def _start_calendar_sync(built_calendar):
+    """Keep the local event cache current in the background (see CalendarSyncScheduler)"""
+    from app.calendar.sync_scheduler import CalendarSyncScheduler
+    interval = float(os.getenv("CALENDAR_SYNC_INTERVAL_SECONDS", "300"))
+    if interval <= 0:
+        return None
+    scheduler = CalendarSyncScheduler(
+        built_calendar,
+        interval_seconds=interval,
+        max_backoff_seconds=float(os.getenv("CALENDAR_SYNC_MAX_BACKOFF_SECONDS", "3600")),
+        workers=int(os.getenv("CALENDAR_SYNC_WORKERS", "2"))
+    )
+    scheduler.start()
+    return scheduler
+
+async def _timed(stage: str, func):
+    started = time.perf_counter()
+    result = await asyncio.get_running_loop().run_in_executor(None, func)
+    startup["seconds"][stage] = time.perf_counter() - started
+    STARTUP_SECONDS.set(startup["seconds"][stage], stage=stage)
+    return result
+
+async def start_services():
+    """Create memory and calendar (in parallel, off the event loop), then mark the API ready"""
+    global memory, calendar, calendar_sync
+    started = time.perf_counter()
+    try:
+        # With MEMORY_SERVER_SOCKET set (multi-worker mode, see main.py) every worker
+        # shares one FaissMemory in a memory server process instead of loading its own
+        memory_server_socket = os.getenv("MEMORY_SERVER_SOCKET")
+        if memory_server_socket:
+            client = MemoryClient(memory_server_socket)
+            await client.get_stats()
+            memory, calendar = client, await _timed("calendar", _build_calendar)
+        else:
+            memory, calendar = await asyncio.gather(
+                _timed("memory", _build_memory), _timed("calendar", _build_calendar)
+            )
+        calendar_sync = _start_calendar_sync(calendar)
+    except Exception as e:
+        startup["error"] = str(e)
+        print(f"Error starting services: {str(e)}")
+        return
+    startup["seconds"]["ready"] = time.perf_counter() - started
+    STARTUP_SECONDS.set(startup["seconds"]["ready"], stage="ready")
+    services_ready.set()
+
+async def require_ready():
+    """Dependency for routes that need memory or calendar"""
+    if services_ready is None or not services_ready.is_set():
+        raise HTTPException(status_code=503, detail="Service is starting", headers={"Retry-After": "5"})
+
+main_loop = None
+# Jobs clients poll for; in multi-worker mode their status is published to the
+# memory server so whichever worker gets the poll can answer it
+POLLED_JOB_KINDS = ("schedule_meeting", "schedule_meetings_batch")
+
+def publish_job(job: Dict[str, Any]):
+    """Send a job's status to the memory server (called from job threads)"""
+    if job["kind"] in POLLED_JOB_KINDS and main_loop is not None and isinstance(memory, MemoryClient):
+        asyncio.run_coroutine_threadsafe(memory.put_job(job), main_loop)
+
+# Calendar calls block on Google (and on the OAuth flow for new users), so they
+# run as jobs on a bounded pool with a per-user limit
+calendar_jobs = JobManager(
+    max_workers=int(os.getenv("CALENDAR_WORKERS", "4")),
+    max_pending=int(os.getenv("CALENDAR_MAX_PENDING_JOBS", "100")),
+    max_jobs_per_user=int(os.getenv("CALENDAR_MAX_JOBS_PER_USER")) if os.getenv("CALENDAR_MAX_JOBS_PER_USER") else None,
+    max_queries_per_user=(
+        int(os.getenv("CALENDAR_MAX_QUERIES_PER_USER")) if os.getenv("CALENDAR_MAX_QUERIES_PER_USER") else None
+    ),
+    result_ttl_seconds=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600")),
+    max_tracked=int(os.getenv("JOB_MAX_TRACKED", "10000")),
+    thread_name_prefix="calendar",
+    on_change=publish_job
+)
+
+# Answers to repeated questions are served without calling Groq
+response_cache = ResponseCache(
+    similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+    context_overlap=float(os.getenv("RESPONSE_CACHE_CONTEXT_OVERLAP", "0.5")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "10000")),
+    scope=os.getenv("RESPONSE_CACHE_SCOPE", "user")
+)
+
+# Embedding and FAISS work runs here instead of on the event loop. FaissMemory
+# locks per user, so searches for different users (and reads of the same
+# user) run in parallel.
+memory_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("MEMORY_WORKERS", "4")), thread_name_prefix="memory"
+)
+
+# Upcoming meetings from the synced event cache are added to chat prompts
+CHAT_UPCOMING_HOURS = float(os.getenv("CHAT_UPCOMING_HOURS", "48"))
+CHAT_UPCOMING_MAX_EVENTS = int(os.getenv("CHAT_UPCOMING_MAX_EVENTS", "5"))
+
+def _read_schedule(user_id: str) -> List[Dict[str, Any]]:
+    if not calendar.has_credentials(user_id):
+        return []
+    # Users who authorized since the scheduler last looked are synced right away
+    calendar_sync.add_user(user_id)
+    return calendar.upcoming_events(user_id, hours=CHAT_UPCOMING_HOURS, limit=CHAT_UPCOMING_MAX_EVENTS)
+
+async def upcoming_schedule(user_id: str) -> List[Dict[str, Any]]:
+    """A user's upcoming meetings for chat context, read from the local event cache"""
+    if calendar_sync is None or CHAT_UPCOMING_MAX_EVENTS <= 0:
+        return []
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, _read_schedule, user_id)
+    except Exception as e:
+        print(f"Error reading upcoming events: {str(e)}")
+        return []
+
+async def run_memory(func, *args, **kwargs):
+    """Run a FaissMemory call on the memory executor (MemoryClient calls are awaited directly)"""
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(memory_executor, partial(func, *args, **kwargs))
+
+async def run_cache(func, *args):
+    """Run a response cache call off the event loop; its similarity scan grows with the cache"""
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
 
 # Define request and response models
 class ChatRequest(BaseModel):
     message: str
     user_id: str
 
-class MeetingRequest(BaseModel):
+class MeetingDetails(BaseModel):
     summary: str
     description: Optional[str] = None
     start_time: str
     end_time: str
     attendees: Optional[List[str]] = None
+
+class MeetingRequest(MeetingDetails):
+    user_id: str
+
+class BatchMeetingRequest(BaseModel):
+    meetings: List[MeetingDetails]
     user_id: str
 
+class FindSlotsRequest(BaseModel):
+    # Every day of the window is scanned, so the window is bounded
+    MAX_WINDOW_DAYS: ClassVar[int] = 62
+    
+    user_id: str
+    duration_minutes: int = Field(gt=0, le=24 * 60)
+    window_start: str
+    window_end: str
+    attendees: Optional[List[str]] = None
+    work_start: str = "09:00"
+    work_end: str = "17:00"
+    timezone: str = "UTC"
+    include_weekends: bool = False
+    step_minutes: int = Field(30, gt=0, le=24 * 60)
+    max_slots: int = Field(10, gt=0, le=100)
+    
+    @model_validator(mode="after")
+    def check_window(self):
+        start, end = (
+            datetime.fromisoformat(value.replace("Z", "+00:00"))
+            for value in (self.window_start, self.window_end)
+        )
+        # Times without an offset are UTC, as in GoogleCalendar.find_slots
+        start, end = (pytz.utc.localize(value) if value.tzinfo is None else value for value in (start, end))
+        if end <= start:
+            raise ValueError("window_end must be after window_start")
+        if end - start > timedelta(days=self.MAX_WINDOW_DAYS):
+            raise ValueError(f"The window can be at most {self.MAX_WINDOW_DAYS} days long")
+        return self
+    
+    @model_validator(mode="after")
+    def check_working_hours(self):
+        try:
+            work_from, work_to = (
+                datetime.strptime(value, "%H:%M").time() for value in (self.work_start, self.work_end)
+            )
+        except ValueError:
+            raise ValueError("work_start and work_end must be times as HH:MM")
+        if work_to <= work_from:
+            raise ValueError("work_end must be after work_start")
+        return self
+
 class ChatResponse(BaseModel):
     response: str
     context: Optional[Dict[str, Any]] = None
@@ -51,55 +321,264 @@ class ChatResponse(BaseModel):
 async def root():
     return {"message": "Business Assistant API is running"}
 
-@app.post("/chat", response_model=ChatResponse)
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(require_ready)])
 async def chat(request: ChatRequest):
+    # The schedule is read from SQLite while the message is embedded and searched
+    schedule_task = asyncio.create_task(upcoming_schedule(request.user_id))
+    
+    # Embed once, outside the memory executor so concurrent requests share a
+    # batch; the same vector is reused for search and add
+    query_embedding = await memory.aembed(request.message)
+    
     # Retrieve relevant memories
-    relevant_memories = memory.search(request.message, request.user_id)
+    relevant_memories = await run_memory(
+        memory.search, request.message, request.user_id, embedding=query_embedding
+    )
+    schedule = await schedule_task
     
-    # Generate AI response
-    response = groq_client.generate_response(
-        request.message, 
-        context=relevant_memories
+    # Serve repeated questions from the response cache
+    response = await run_cache(
+        response_cache.lookup, request.user_id, request.message, query_embedding, relevant_memories, schedule
     )
+    cached = response is not None
+    
+    # Generate AI response
+    if not cached:
+        try:
+            response = await groq_client.agenerate_response(
+                request.message, 
+                context=relevant_memories,
+                schedule=schedule
+            )
+        except GroqError:
+            # The apology is only shown, never cached or remembered as an answer
+            return ChatResponse(
+                response=groq_client.FALLBACK_RESPONSE,
+                context={"memories": relevant_memories, "schedule": schedule, "cached": False, "error": True}
+            )
+        await run_cache(
+            response_cache.store,
+            request.user_id, request.message, query_embedding, response, relevant_memories, schedule
+        )
     
     # Store the interaction in memory
-    memory.add(request.user_id, request.message, response)
+    await run_memory(
+        memory.add, request.user_id, request.message, response, embedding=query_embedding
+    )
     
     return ChatResponse(
         response=response,
-        context={"memories": relevant_memories}
+        context={"memories": relevant_memories, "schedule": schedule, "cached": cached}
+    )
+
+@app.post("/chat/stream", dependencies=[Depends(require_ready)])
+async def chat_stream(request: ChatRequest):
+    """Stream the AI response as server-sent events"""
+    # Retrieve relevant memories and upcoming meetings before the stream starts
+    schedule_task = asyncio.create_task(upcoming_schedule(request.user_id))
+    query_embedding = await memory.aembed(request.message)
+    relevant_memories = await run_memory(
+        memory.search, request.message, request.user_id, embedding=query_embedding
+    )
+    schedule = await schedule_task
+    
+    cached_response = await run_cache(
+        response_cache.lookup, request.user_id, request.message, query_embedding, relevant_memories, schedule
+    )
+    
+    async def event_stream():
+        if cached_response is not None:
+            # A cached answer goes out as a single chunk
+            response = cached_response
+            yield f"data: {json.dumps({'token': response})}\n\n"
+        else:
+            tokens = []
+            try:
+                async for token in groq_client.astream_response(
+                    request.message,
+                    context=relevant_memories,
+                    schedule=schedule
+                ):
+                    tokens.append(token)
+                    yield f"data: {json.dumps({'token': token})}\n\n"
+            except GroqError:
+                # Nothing is cached or remembered; the client gets whatever streamed, or the apology
+                if not tokens:
+                    yield f"data: {json.dumps({'token': groq_client.FALLBACK_RESPONSE})}\n\n"
+                context = {"memories": relevant_memories, "schedule": schedule, "cached": False, "error": True}
+                done = {"response": "".join(tokens) or groq_client.FALLBACK_RESPONSE, "context": context}
+                yield f"event: done\ndata: {json.dumps(done)}\n\n"
+                return
+            
+            # Only a completed stream is stored; a client disconnect stops here
+            response = "".join(tokens)
+            await run_cache(
+                response_cache.store,
+                request.user_id, request.message, query_embedding, response, relevant_memories, schedule
+            )
+        
+        await run_memory(
+            memory.add, request.user_id, request.message, response, embedding=query_embedding
+        )
+        
+        context = {"memories": relevant_memories, "schedule": schedule, "cached": cached_response is not None}
+        yield f"event: done\ndata: {json.dumps({'response': response, 'context': context})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
-@app.post("/schedule-meeting")
+def _create_event(request: MeetingRequest) -> Dict[str, Any]:
+    meeting_link = calendar.create_event(
+        summary=request.summary,
+        description=request.description,
+        start_time=request.start_time,
+        end_time=request.end_time,
+        attendees=request.attendees,
+        user_id=request.user_id
+    )
+    return {"meeting_link": meeting_link}
+
+def _create_events(request: BatchMeetingRequest) -> Dict[str, Any]:
+    results = calendar.create_events(
+        request.user_id,
+        [meeting.model_dump() for meeting in request.meetings]
+    )
+    return {"results": [{"index": index, **result} for index, result in enumerate(results)]}
+
+@app.post("/schedule-meeting", status_code=202, dependencies=[Depends(require_ready)])
 async def schedule_meeting(request: MeetingRequest):
+    """Queue a meeting for scheduling; poll /jobs/{job_id} for the meeting link"""
+    try:
+        job = calendar_jobs.submit("schedule_meeting", request.user_id, _create_event, request)
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if isinstance(memory, MemoryClient):
+        await memory.put_job(job)
+    return job
+
+@app.post("/schedule-meetings/batch", status_code=202, dependencies=[Depends(require_ready)])
+async def schedule_meetings_batch(request: BatchMeetingRequest):
+    """Queue many meetings for scheduling through Calendar API batch requests"""
     try:
-        meeting_link = calendar.create_event(
-            summary=request.summary,
-            description=request.description,
-            start_time=request.start_time,
-            end_time=request.end_time,
-            attendees=request.attendees,
-            user_id=request.user_id
+        job = calendar_jobs.submit("schedule_meetings_batch", request.user_id, _create_events, request)
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if isinstance(memory, MemoryClient):
+        await memory.put_job(job)
+    return job
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(require_ready)])
+async def get_job(job_id: str):
+    """Report a job's status and, once finished, its result or error"""
+    job = calendar_jobs.get(job_id)
+    if job is None and isinstance(memory, MemoryClient):
+        # Started by another worker
+        job = await memory.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/find-slots", dependencies=[Depends(require_ready)])
+async def find_slots(request: FindSlotsRequest):
+    """Suggest meeting times when the user and all attendees are free"""
+    try:
+        pytz.timezone(request.timezone)
+    except pytz.UnknownTimeZoneError:
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {request.timezone}")
+    try:
+        return await calendar_jobs.run(
+            "find_slots", request.user_id, calendar.find_slots,
+            request.user_id, **request.model_dump(exclude={"user_id"})
         )
-        return {"meeting_link": meeting_link}
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/memories/{user_id}")
-async def get_memories(user_id: str, query: Optional[str] = None, limit: int = 10):
+@app.get("/calendar/stats", dependencies=[Depends(require_ready)])
+async def calendar_stats():
+    """Report Calendar service and free/busy cache hits, event sync, and calendar job counts"""
+    stats = {**calendar.get_stats(), "jobs": calendar_jobs.get_stats()}
+    if calendar_sync is not None:
+        stats["sync_scheduler"] = calendar_sync.get_stats()
+    return stats
+
+def _memory_cursor(memory_record: Dict[str, Any]) -> str:
+    # Position in the user's timeline; repr() round-trips the float exactly
+    return f"{memory_record.get('timestamp', 0)!r}:{memory_record['id']}"
+
+@app.get("/memories/{user_id}", dependencies=[Depends(require_ready)])
+async def get_memories(user_id: str, query: Optional[str] = None, limit: int = 10, cursor: Optional[str] = None):
+    """
+    Search memories, or list them newest first a page at a time: pass the
+    returned next_cursor to get the following (older) page
+    """
     if query:
-        memories = memory.search(query, user_id, limit)
-    else:
-        memories = memory.get_recent(user_id, limit)
-    return {"memories": memories}
+        query_embedding = await memory.aembed(query)
+        memories = await run_memory(memory.search, query, user_id, limit, embedding=query_embedding)
+        return {"memories": memories, "next_cursor": None}
+    
+    before = None
+    if cursor:
+        try:
+            timestamp, memory_id = cursor.rsplit(":", 1)
+            before = (float(timestamp), int(memory_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    memories = await run_memory(memory.get_recent, user_id, limit, before)
+    next_cursor = _memory_cursor(memories[-1]) if len(memories) == limit and memories else None
+    return {"memories": memories, "next_cursor": next_cursor}
+
+@app.get("/memory/stats", dependencies=[Depends(require_ready)])
+async def memory_stats():
+    """Report memory cache loads/evictions for sizing MEMORY_BUDGET_MB"""
+    return await run_memory(memory.get_stats)
+
+@app.get("/response-cache/stats")
+async def response_cache_stats():
+    """Report response cache hits and misses"""
+    return response_cache.get_stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request and per-stage latency histograms, counters and component stats"""
+    stats = {
+        "groq": groq_client.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "jobs": calendar_jobs.get_stats()
+    }
+    if services_ready is not None and services_ready.is_set():
+        stats["memory"] = await run_memory(memory.get_stats)
+        stats["calendar"] = calendar.get_stats()
+        if calendar_sync is not None:
+            stats["calendar_sync"] = calendar_sync.get_stats()
+    return PlainTextResponse(REGISTRY.render(stats), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
+@app.get("/health/live")
 def health_check():
+    """Liveness: the server is up and answering, even while services are still loading"""
     return {"status": "ok"}
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: memory and calendar are loaded, with how long each startup stage took"""
+    ready = services_ready is not None and services_ready.is_set()
+    if startup["error"]:
+        status = "failed"
+    else:
+        status = "ready" if ready else "starting"
+    return JSONResponse(
+        {"status": status, "error": startup["error"], "startup_seconds": startup["seconds"]},
+        status_code=200 if ready else 503
+    )
+
 
-@app.get("/google-auth")
+@app.get("/google-auth", dependencies=[Depends(require_ready)])
 async def google_auth():
     """Initialize Google OAuth flow"""
     return RedirectResponse(calendar.get_authorization_url())
\ No newline at end of file
@@ -1,79 +1,582 @@
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import json
+import random
+import asyncio
 import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from app.api.prompt_builder import PromptBuilder
+from app.api.resilience import CircuitBreaker, parse_retry_after, backoff_delay
+from app.monitoring.metrics import REGISTRY
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+GROQ_SECONDS = REGISTRY.histogram(
+    "groq_request_seconds", "Groq chat completion latency", ["method", "outcome"]
+)
+GROQ_TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "groq_time_to_first_token_seconds", "Time from sending a streaming request to its first token"
+)
+GROQ_TOKENS = REGISTRY.counter(
+    "groq_tokens_total", "Tokens reported in Groq API usage", ["type"]
+)
+GROQ_RETRIES = REGISTRY.counter(
+    "groq_retries_total", "Groq requests retried after a failed attempt", ["outcome"]
+)
+GROQ_HEDGES = REGISTRY.counter(
+    "groq_hedged_requests_total", "Hedged Groq requests, by which of the two answered first", ["winner"]
+)
+
+# Statuses worth retrying besides 5xx: request timeout, conflict and rate limiting
+RETRYABLE_STATUSES = {408, 409, 429}
+# How often a queued async request checks for a free slot
+SLOT_POLL_SECONDS = 0.005
+
+
+class GroqError(Exception):
+    """
+    A Groq request that failed, after any retries
+
+    ``retryable`` failures (rate limits, server errors, timeouts, connection
+    errors) say Groq is unhealthy and count towards the circuit breaker.
+    Other HTTP errors mean Groq refused this particular request. Failures
+    with neither happened on our side (circuit open, no free request slot).
+    """
+
+    def __init__(
+        self,
+        message: str,
+        outcome: str = "error",
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        retryable: bool = False
+    ):
+        super().__init__(message)
+        self.outcome = outcome
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
 class GroqClient:
-    def __init__(self, api_key: str):
+    # What the API replies when no answer could be generated; it is never stored
+    FALLBACK_RESPONSE = "I'm sorry, I couldn't generate a response right now. Please try again in a moment."
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        prompt_builder: Optional[PromptBuilder] = None,
+        base_url: Optional[str] = None,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 8.0,
+        hedge_after_seconds: Optional[float] = None,
+        max_concurrency: int = 0,
+        queue_timeout_seconds: float = 10.0,
+        breaker_failures: int = 5,
+        breaker_reset_seconds: float = 30.0
+    ):
         self.api_key = api_key
-        self.base_url = "https://api.groq.com/openai/v1"
+        self.base_url = (base_url or "https://api.groq.com/openai/v1").rstrip("/")
         self.model = "qwen-qwq-32b"
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        # Fits memory context into the prompt-token budget
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        # Shared pooled client for the async path, opened by start()
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+        # Failed attempts are retried with jittered exponential backoff, or
+        # after Retry-After when Groq sends one (unless that is longer than
+        # max_backoff_seconds, which a chat reply shouldn't wait for)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        # Non-streaming requests still unanswered after this long are sent
+        # again and the first answer wins (None disables hedging)
+        self.hedge_after_seconds = hedge_after_seconds
+        # At most max_concurrency requests are in flight (0 = unlimited), sync
+        # and async together; the rest wait up to queue_timeout_seconds for a slot
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset_seconds)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.stats = {"attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0, "queue_timeouts": 0}
         logger.info(f"Initialized GroqClient with model: {self.model}")
-        
-    def generate_response(self, message: str, context: Optional[List[Dict[str, Any]]] = None) -> str:
-        """
-        Generate a response using the Groq API with Qwen-32B model
-        
-        Args:
-            message: The user's message
-            context: Optional list of previous interactions for context
-            
-        Returns:
-            The generated response text
-        """
-        headers = {
+
+    async def start(self):
+        """Open the shared connection pool (call once at application startup)"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers(),
+                timeout=self.timeout,
+                limits=self.limits
+            )
+            logger.info("Opened pooled Groq API client")
+
+    async def close(self):
+        """Close the shared connection pool (call once at application shutdown)"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            logger.info("Closed pooled Groq API client")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report attempts, retries, hedging, requests in flight and the circuit breaker state"""
+        return {
+            **self.stats,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "breaker": self.breaker.get_stats()
+        }
+
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+
+    def _build_messages(
+        self,
+        message: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for a request, including context from memory and the user's upcoming meetings"""
         # Prepare system message with instructions
         system_message = """
         You are an AI Business Assistant that helps with customer inquiries, 
         scheduling meetings, and providing information. Be professional, 
         helpful, and concise in your responses.
         """
-        
-        # Prepare messages including context from memory if available
-        messages = [{"role": "system", "content": system_message}]
-        
-        # Add context from memory if available
+
+        # Prepare messages including ranked, deduplicated and budgeted context from memory
         if context:
-            logger.info(f"Adding {len(context)} context items from memory")
-            for item in context:
-                messages.append({"role": "user", "content": item.get("query", "")})
-                messages.append({"role": "assistant", "content": item.get("response", "")})
-        
-        # Add the current message
-        messages.append({"role": "user", "content": message})
-        
+            logger.info(f"Selecting context from {len(context)} memory items")
+        return self.prompt_builder.build(system_message, message, context, schedule)
+
+    def _payload(self, messages: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 1024
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @staticmethod
+    def _record_usage(usage: Dict[str, Any]):
+        GROQ_TOKENS.inc(usage.get("prompt_tokens") or 0, type="prompt")
+        GROQ_TOKENS.inc(usage.get("completion_tokens") or 0, type="completion")
+
+    @staticmethod
+    def _status_error(status_code: int, headers: httpx.Headers, body: str) -> GroqError:
+        return GroqError(
+            f"Error from Groq API: {status_code} - {body}",
+            outcome=f"http_{status_code}",
+            status_code=status_code,
+            retry_after=parse_retry_after(headers.get("Retry-After")),
+            retryable=status_code in RETRYABLE_STATUSES or status_code >= 500
+        )
+
+    @staticmethod
+    def _transport_error(e: Exception) -> GroqError:
+        return GroqError(
+            f"Exception when calling Groq API: {str(e) or type(e).__name__}",
+            outcome="timeout" if isinstance(e, httpx.TimeoutException) else "connection",
+            retryable=True
+        )
+
+    @staticmethod
+    def _bad_response(e: Exception) -> GroqError:
+        # A 200 we can't read is a Groq failure like a 5xx, so it counts against the breaker
+        return GroqError(
+            f"Malformed response from Groq API: {type(e).__name__}: {e}",
+            outcome="bad_response",
+            retryable=True
+        )
+
+    def _parse_response(self, response: httpx.Response) -> str:
+        if response.status_code != 200:
+            raise self._status_error(response.status_code, response.headers, response.text)
+        try:
+            response_data = response.json()
+            content = response_data["choices"][0]["message"]["content"]
+            usage = response_data.get("usage") or {}
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            raise self._bad_response(e)
+        self._record_usage(usage)
+        logger.info(
+            f"Successfully received response from Groq API "
+            f"(prompt tokens: {usage.get('prompt_tokens')}, completion tokens: {usage.get('completion_tokens')})"
+        )
+        return content
+
+    def _check_breaker(self):
+        """Fail fast instead of calling Groq while it keeps failing"""
+        if not self.breaker.allow():
+            raise GroqError("Groq API circuit breaker is open", outcome="circuit_open")
+
+    def _record_error(self, error: GroqError):
+        self.stats["failures"] += 1
+        if error.retryable:
+            self.breaker.record_failure()
+        elif error.status_code is not None:
+            # Groq answered, it just refused this request
+            self.breaker.record_success()
+
+    def _retry_delay(self, attempt: int, error: GroqError) -> Optional[float]:
+        """Seconds to wait before retrying a failed attempt, or None to give up"""
+        if not error.retryable or attempt >= self.max_retries:
+            return None
+        if error.retry_after is not None:
+            if error.retry_after > self.max_backoff_seconds:
+                return None
+            # Jitter on top, so clients told the same time don't all come back at once
+            return error.retry_after + random.uniform(0.0, self.backoff_seconds)
+        return backoff_delay(attempt, self.backoff_seconds, self.max_backoff_seconds)
+
+    def _log_retry(self, attempt: int, error: GroqError, delay: float):
+        self.stats["retries"] += 1
+        GROQ_RETRIES.inc(outcome=error.outcome)
+        logger.warning(f"Groq request failed ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+
+    def _queue_timed_out(self) -> GroqError:
+        self.stats["queue_timeouts"] += 1
+        return GroqError("Timed out waiting for a free Groq request slot", outcome="queue_timeout")
+
+    def _count_in_flight(self, delta: int):
+        with self._in_flight_lock:
+            self._in_flight += delta
+
+    @contextmanager
+    def _sync_slot(self):
+        if self._slots is not None and not self._slots.acquire(timeout=self.queue_timeout):
+            raise self._queue_timed_out()
+        self._count_in_flight(1)
+        try:
+            yield
+        finally:
+            self._count_in_flight(-1)
+            if self._slots is not None:
+                self._slots.release()
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one of the max_concurrency request slots while a request is in flight"""
+        if self._slots is not None:
+            # The semaphore is shared with blocking callers, so poll it rather
+            # than block the event loop (or leak a slot to a cancelled thread)
+            deadline = time.monotonic() + self.queue_timeout
+            while not self._slots.acquire(blocking=False):
+                if time.monotonic() >= deadline:
+                    raise self._queue_timed_out()
+                await asyncio.sleep(SLOT_POLL_SECONDS)
+        self._count_in_flight(1)
+        try:
+            yield
+        finally:
+            self._count_in_flight(-1)
+            if self._slots is not None:
+                self._slots.release()
+
+    def _post(self, payload: Dict[str, Any]) -> str:
+        """One attempt at a blocking chat completion"""
+        with self._sync_slot():
+            self._check_breaker()
+            self.stats["attempts"] += 1
+            try:
+                with httpx.Client(timeout=self.timeout) as client:
+                    response = client.post(
+                        f"{self.base_url}/chat/completions",
+                        headers=self._headers(),
+                        json=payload
+                    )
+                result = self._parse_response(response)
+            except httpx.HTTPError as e:
+                raise self._transport_error(e)
+            except GroqError:
+                # The caller records the outcome with the breaker (_record_error)
+                raise
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def _apost(self, payload: Dict[str, Any]) -> str:
+        """One attempt at a chat completion on the pooled connection"""
+        async with self._slot():
+            self._check_breaker()
+            self.stats["attempts"] += 1
+            try:
+                response = await self._async_client.post("/chat/completions", json=payload)
+                result = self._parse_response(response)
+            except httpx.HTTPError as e:
+                raise self._transport_error(e)
+            except GroqError:
+                # The caller records the outcome with the breaker (_record_error)
+                raise
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def _ahedged(self, payload: Dict[str, Any]) -> str:
+        """
+        Send the request again if it is slow, and take whichever copy answers first
+
+        No hedge is sent while requests queue for slots or the breaker isn't
+        closed, so hedging only spends spare capacity.
+        """
+        first = asyncio.create_task(self._apost(payload))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after_seconds)
+            if done:
+                return first.result()
+            slots_free = self._slots is None or self._in_flight < self.max_concurrency
+            if not slots_free or self.breaker.state != CircuitBreaker.CLOSED:
+                return await first
+
+            self.stats["hedges"] += 1
+            logger.info(f"No Groq response after {self.hedge_after_seconds:.2f}s; sending a hedged request")
+            hedge = asyncio.create_task(self._apost(payload))
+            tasks.add(hedge)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        GROQ_HEDGES.inc(winner="hedge" if task is hedge else "first")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def generate_response(
+        self,
+        message: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """
+        Generate a response using the Groq API with Qwen-32B model
+
+        Args:
+            message: The user's message
+            context: Optional list of previous interactions for context
+            schedule: Optional upcoming calendar events, from GoogleCalendar.upcoming_events
+
+        Returns:
+            The generated response text
+
+        Raises:
+            GroqError: If no response could be generated, after any retries
+        """
+        messages = self._build_messages(message, context, schedule)
+        payload = self._payload(messages)
+        started = time.perf_counter()
+        outcome = "error"
+
         try:
             logger.info("Sending request to Groq API")
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json={
-                        "model": self.model,
-                        "messages": messages,
-                        "temperature": 0.7,
-                        "max_tokens": 1024
-                    }
-                )
-                
-                if response.status_code == 200:
-                    response_data = response.json()
-                    logger.info("Successfully received response from Groq API")
-                    return response_data["choices"][0]["message"]["content"]
-                else:
-                    error_message = f"Error from Groq API: {response.status_code} - {response.text}"
-                    logger.error(error_message)
-                    return f"I'm sorry, I encountered an error: {error_message}"
-                    
-        except Exception as e:
-            error_msg = f"Exception when calling Groq API: {str(e)}"
-            logger.error(error_msg)
-            return "I'm sorry, I encountered an error while processing your request."
\ No newline at end of file
+            attempt = 0
+            while True:
+                try:
+                    response = self._post(payload)
+                    outcome = "ok"
+                    return response
+                except GroqError as e:
+                    outcome = e.outcome
+                    self._record_error(e)
+                    delay = self._retry_delay(attempt, e)
+                    if delay is None:
+                        logger.error(str(e))
+                        raise
+                    self._log_retry(attempt, e, delay)
+                    time.sleep(delay)
+                    attempt += 1
+        finally:
+            GROQ_SECONDS.observe(time.perf_counter() - started, method="generate", outcome=outcome)
+
+    async def agenerate_response(
+        self,
+        message: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """
+        Async version of generate_response that reuses the pooled connection
+
+        Args:
+            message: The user's message
+            context: Optional list of previous interactions for context
+            schedule: Optional upcoming calendar events, from GoogleCalendar.upcoming_events
+
+        Returns:
+            The generated response text
+
+        Raises:
+            GroqError: If no response could be generated, after any retries
+        """
+        if self._async_client is None:
+            await self.start()
+
+        messages = self._build_messages(message, context, schedule)
+        payload = self._payload(messages)
+        started = time.perf_counter()
+        outcome = "error"
+
+        try:
+            logger.info("Sending request to Groq API")
+            attempt = 0
+            while True:
+                try:
+                    if self.hedge_after_seconds is not None:
+                        response = await self._ahedged(payload)
+                    else:
+                        response = await self._apost(payload)
+                    outcome = "ok"
+                    return response
+                except GroqError as e:
+                    outcome = e.outcome
+                    self._record_error(e)
+                    delay = self._retry_delay(attempt, e)
+                    if delay is None:
+                        logger.error(str(e))
+                        raise
+                    self._log_retry(attempt, e, delay)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+        finally:
+            GROQ_SECONDS.observe(time.perf_counter() - started, method="agenerate", outcome=outcome)
+
+    async def astream_response(
+        self,
+        message: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response token by token using the OpenAI-compatible streaming mode
+
+        Failed attempts are retried only until the first token is out; a
+        stream that breaks after that can't be restarted without repeating
+        text, so its error is raised.
+
+        Args:
+            message: The user's message
+            context: Optional list of previous interactions for context
+            schedule: Optional upcoming calendar events, from GoogleCalendar.upcoming_events
+
+        Yields:
+            Content deltas as they arrive from the Groq API
+
+        Raises:
+            GroqError: If the stream failed, after any retries
+        """
+        if self._async_client is None:
+            await self.start()
+
+        messages = self._build_messages(message, context, schedule)
+        payload = self._payload(messages, stream=True)
+        started = time.perf_counter()
+        first_token = True
+        outcome = "error"
+
+        try:
+            logger.info("Sending streaming request to Groq API")
+            attempt = 0
+            while True:
+                try:
+                    async with self._slot():
+                        self._check_breaker()
+                        self.stats["attempts"] += 1
+                        try:
+                            async with self._async_client.stream(
+                                "POST",
+                                "/chat/completions",
+                                json=payload
+                            ) as response:
+                                if response.status_code != 200:
+                                    body = (await response.aread()).decode(errors="replace")
+                                    raise self._status_error(response.status_code, response.headers, body)
+                                # Groq counts as healthy once a chunk parses, not on the status line alone
+                                answered = False
+
+                                # Server-sent events: one "data: {...}" line per chunk, ending with "data: [DONE]"
+                                async for line in response.aiter_lines():
+                                    if not line.startswith("data:"):
+                                        continue
+                                    data = line[len("data:"):].strip()
+                                    if data == "[DONE]":
+                                        break
+
+                                    try:
+                                        chunk = json.loads(data)
+                                        # Groq reports usage on the final chunk under x_groq
+                                        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+                                        choices = chunk.get("choices") or [{}]
+                                        token = choices[0].get("delta", {}).get("content")
+                                    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                                        raise self._bad_response(e)
+                                    if not answered:
+                                        self.breaker.record_success()
+                                        answered = True
+                                    if usage:
+                                        self._record_usage(usage)
+                                    if token:
+                                        if first_token:
+                                            elapsed = time.perf_counter() - started
+                                            GROQ_TIME_TO_FIRST_TOKEN.observe(elapsed)
+                                            logger.info(f"Time to first token: {elapsed:.3f}s")
+                                            first_token = False
+                                        yield token
+                                if not answered:
+                                    self.breaker.record_success()
+                        except httpx.HTTPError as e:
+                            raise self._transport_error(e)
+                        except GroqError:
+                            raise
+                        except BaseException:
+                            self.breaker.abandon()
+                            raise
+                    break
+                except GroqError as e:
+                    outcome = e.outcome
+                    self._record_error(e)
+                    delay = self._retry_delay(attempt, e) if first_token else None
+                    if delay is None:
+                        logger.error(f"Error streaming from Groq API: {e}")
+                        raise
+                    self._log_retry(attempt, e, delay)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+            outcome = "ok"
+            logger.info(f"Finished streaming response from Groq API in {time.perf_counter() - started:.3f}s")
+        finally:
+            GROQ_SECONDS.observe(time.perf_counter() - started, method="stream", outcome=outcome)
@@ -0,0 +1,232 @@
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+
+class JobLimitExceeded(Exception):
+    """Raised when a job is rejected because too many are already in progress"""
+
+
+class JobManager:
+    """
+    Runs blocking calls on a bounded thread pool and tracks them as jobs.
+
+    Google Calendar calls block on HTTP and, for a user without a token,
+    on the browser OAuth flow. Running them here keeps the event loop free,
+    and the per-user limit stops one slow or unauthenticated user from
+    taking every worker: by default a user may have a quarter of the
+    workers' worth of jobs queued or running (at least one). Submitting returns a job right away; its status
+    and result can be polled until ``result_ttl_seconds`` after it finishes,
+    and at most ``max_tracked`` jobs are kept (the oldest finished ones are
+    forgotten first).
+
+    ``run()`` is for read-only queries the caller waits on: they share the
+    pool but aren't tracked as jobs, and have their own per-user limit
+    (``max_queries_per_user``, by default half the workers), so a user's
+    pending jobs don't hold up their queries.
+    ``on_change`` is called with the job whenever a worker thread starts or
+    finishes it, e.g. to publish its status to other processes.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_pending: int = 100,
+        max_jobs_per_user: Optional[int] = None,
+        max_queries_per_user: Optional[int] = None,
+        result_ttl_seconds: float = 3600.0,
+        max_tracked: int = 10000,
+        thread_name_prefix: str = "jobs",
+        on_change: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.max_pending = max_pending
+        self.max_jobs_per_user = max_jobs_per_user if max_jobs_per_user is not None else max(1, max_workers // 4)
+        self.max_queries_per_user = (
+            max_queries_per_user if max_queries_per_user is not None else max(1, max_workers // 2)
+        )
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_tracked = max_tracked
+        self.on_change = on_change
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._jobs = OrderedDict()  # Job ID -> job, oldest first
+        self._active_per_user = {}  # User ID -> queued or running jobs
+        self._active = 0
+        self._queries_per_user = {}  # User ID -> queued or running queries
+        self._queries = 0
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0, "queries": 0, "evicted": 0}
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in job.items() if key != "future"}
+
+    def _prune(self, now: float):
+        """Forget finished jobs older than the result TTL"""
+        cutoff = now - self.result_ttl_seconds
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            # Jobs are in submission order, so none after this one can have expired
+            if job["submitted_at"] > cutoff:
+                break
+            if job["finished_at"] is not None and job["finished_at"] <= cutoff:
+                del self._jobs[job_id]
+
+    def _evict(self):
+        """Over max_tracked, forget the oldest finished jobs before their TTL is up"""
+        if len(self._jobs) <= self.max_tracked:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_tracked:
+                break
+            if self._jobs[job_id]["finished_at"] is not None:
+                del self._jobs[job_id]
+                self.stats["evicted"] += 1
+
+    def submit(self, kind: str, user_id: str, func, *args, **kwargs) -> Dict[str, Any]:
+        """
+        Queue func(*args, **kwargs) as a job
+
+        Returns:
+            The job (id, kind, status, timestamps)
+
+        Raises:
+            JobLimitExceeded: The pool or the user already has too many jobs in progress
+        """
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if self._active >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise JobLimitExceeded("Too many jobs in progress, try again later")
+            if self._active_per_user.get(user_id, 0) >= self.max_jobs_per_user:
+                self.stats["rejected"] += 1
+                raise JobLimitExceeded(f"User {user_id} already has {self.max_jobs_per_user} jobs in progress")
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "kind": kind,
+                "user_id": user_id,
+                "status": self.QUEUED,
+                "submitted_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+            self._jobs[job["job_id"]] = job
+            self._evict()
+            self._active += 1
+            self._active_per_user[user_id] = self._active_per_user.get(user_id, 0) + 1
+            self.stats["submitted"] += 1
+            job["future"] = self._executor.submit(self._run, job, func, args, kwargs)
+            return self._public(job)
+
+    def _notify(self, job: Dict[str, Any]):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(job)
+        except Exception as e:
+            print(f"Error publishing job {job['job_id']}: {str(e)}")
+
+    def _run(self, job: Dict[str, Any], func, args, kwargs):
+        with self._lock:
+            job["status"] = self.RUNNING
+            job["started_at"] = time.time()
+            public = self._public(job)
+        self._notify(public)
+
+        status, result, error = self.FAILED, None, None
+        try:
+            result = func(*args, **kwargs)
+            status = self.SUCCEEDED
+            return result
+        except Exception as e:
+            print(f"Error in {job['kind']} job {job['job_id']}: {str(e)}")
+            error = str(e)
+            raise
+        finally:
+            with self._lock:
+                job.update(status=status, result=result, error=error, finished_at=time.time())
+                self._active -= 1
+                remaining = self._active_per_user[job["user_id"]] - 1
+                if remaining:
+                    self._active_per_user[job["user_id"]] = remaining
+                else:
+                    del self._active_per_user[job["user_id"]]
+                self.stats[status] += 1
+                public = self._public(job)
+            self._notify(public)
+
+    async def run(self, kind: str, user_id: str, func, *args, **kwargs):
+        """
+        Run a query on the pool and wait for its result without blocking the event loop
+
+        Nothing is kept once it finishes, so there is no job to poll.
+
+        Raises:
+            JobLimitExceeded: The pool or the user already has too many jobs or queries in progress
+        """
+        with self._lock:
+            if self._active + self._queries >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise JobLimitExceeded("Too many jobs in progress, try again later")
+            if self._queries_per_user.get(user_id, 0) >= self.max_queries_per_user:
+                self.stats["rejected"] += 1
+                raise JobLimitExceeded(
+                    f"User {user_id} already has {self.max_queries_per_user} {kind} queries in progress"
+                )
+            self._queries += 1
+            self._queries_per_user[user_id] = self._queries_per_user.get(user_id, 0) + 1
+            self.stats["queries"] += 1
+
+        def finished(_=None):
+            # Counted until the call itself ends, even if the caller stopped waiting
+            with self._lock:
+                self._queries -= 1
+                remaining = self._queries_per_user[user_id] - 1
+                if remaining:
+                    self._queries_per_user[user_id] = remaining
+                else:
+                    del self._queries_per_user[user_id]
+
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            finished()
+            raise
+        future.add_done_callback(finished)
+        return await asyncio.wrap_future(future)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's status and, once finished, its result or error"""
+        with self._lock:
+            self._prune(time.time())
+            job = self._jobs.get(job_id)
+            return self._public(job) if job is not None else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report job counts"""
+        with self._lock:
+            return {
+                **self.stats,
+                "active": self._active,
+                "active_queries": self._queries,
+                "tracked": len(self._jobs),
+                "max_jobs_per_user": self.max_jobs_per_user,
+                "max_queries_per_user": self.max_queries_per_user
+            }
+
+    def shutdown(self):
+        """Stop accepting work and drop queued jobs; running ones finish in the background"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
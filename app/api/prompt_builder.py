@@ -0,0 +1,195 @@
+import re
+import time
+import math
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reasoning traces the model emits before its answer; they are not useful as context
+THINK_BLOCK = re.compile(r"<think>.*?</think>", re.DOTALL)
+TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+class PromptBuilder:
+    """
+    Builds chat messages from memory context under a prompt-token budget.
+
+    Context items are ranked by a mix of FAISS distance and recency,
+    near-identical memories are dropped, the most recent turns are kept
+    (almost) whole while older ones are truncated, and items are added in
+    rank order until the budget runs out. Token counts are estimated, which
+    is accurate enough for budgeting without shipping a tokenizer.
+    """
+
+    # Per-message overhead of the chat format (role, separators)
+    MESSAGE_OVERHEAD_TOKENS = 4
+    # Longest meeting title kept in the schedule block
+    MAX_SCHEDULE_SUMMARY_TOKENS = 30
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 3000,
+        max_item_tokens: int = 400,
+        compressed_item_tokens: int = 80,
+        full_recent_items: int = 2,
+        recency_half_life_hours: float = 72.0,
+        recency_weight: float = 0.3,
+        dedup_threshold: float = 0.85
+    ):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_item_tokens = max_item_tokens
+        self.compressed_item_tokens = compressed_item_tokens
+        self.full_recent_items = full_recent_items
+        self.recency_half_life_hours = recency_half_life_hours
+        self.recency_weight = recency_weight
+        self.dedup_threshold = dedup_threshold
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Estimate BPE tokens: at least one per word/punctuation piece, or ~4 characters"""
+        if not text:
+            return 0
+        return max(len(TOKEN_PIECE.findall(text)), math.ceil(len(text) / 4))
+
+    @classmethod
+    def truncate(cls, text: str, max_tokens: int) -> str:
+        """Cut text down to roughly max_tokens, keeping the beginning"""
+        if cls.count_tokens(text) <= max_tokens:
+            return text
+
+        pieces = list(re.finditer(r"\S+\s*", text))
+        kept, tokens = [], 0
+        for piece in pieces:
+            cost = cls.count_tokens(piece.group())
+            if tokens + cost > max_tokens - 1:
+                break
+            kept.append(piece.group())
+            tokens += cost
+        return "".join(kept).rstrip() + " …"
+
+    @staticmethod
+    def clean_response(response: str) -> str:
+        """Strip reasoning traces from a stored response"""
+        return THINK_BLOCK.sub("", response).strip()
+
+    @staticmethod
+    def _shingles(text: str) -> set:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < 3:
+            return set(words)
+        return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    def _is_duplicate(self, shingles: set, kept: List[set]) -> bool:
+        for other in kept:
+            union = shingles | other
+            if union and len(shingles & other) / len(union) >= self.dedup_threshold:
+                return True
+        return False
+
+    def _score(self, item: Dict[str, Any], now: float) -> float:
+        """Higher is better: closeness in embedding space plus a recency bonus"""
+        distance = item.get("distance")
+        relevance = 1.0 / (1.0 + distance) if distance is not None else 0.5
+        age_hours = max(0.0, now - item.get("timestamp", now)) / 3600.0
+        recency = 0.5 ** (age_hours / self.recency_half_life_hours)
+        return (1 - self.recency_weight) * relevance + self.recency_weight * recency
+
+    def select_context(
+        self,
+        context: List[Dict[str, Any]],
+        budget: int
+    ) -> Tuple[List[Tuple[str, str, Dict[str, Any]]], int]:
+        """
+        Rank, deduplicate, compress and fit context items into a token budget
+
+        Returns:
+            (query, response, item) triples in chronological order, and their token count
+        """
+        now = time.time()
+        ranked = sorted(context, key=lambda item: self._score(item, now), reverse=True)
+
+        # The newest turns keep more detail than older ones
+        newest = sorted(context, key=lambda item: item.get("timestamp", 0), reverse=True)
+        full_ids = {id(item) for item in newest[:self.full_recent_items]}
+
+        selected, kept_shingles, used = [], [], 0
+        for item in ranked:
+            query = item.get("query", "")
+            response = self.clean_response(item.get("response", ""))
+
+            shingles = self._shingles(query + " " + response)
+            if self._is_duplicate(shingles, kept_shingles):
+                continue
+
+            item_budget = self.max_item_tokens if id(item) in full_ids else self.compressed_item_tokens
+            query = self.truncate(query, item_budget // 2)
+            response = self.truncate(response, item_budget - self.count_tokens(query))
+
+            cost = (
+                self.count_tokens(query) + self.count_tokens(response)
+                + 2 * self.MESSAGE_OVERHEAD_TOKENS
+            )
+            if used + cost > budget:
+                continue
+
+            selected.append((query, response, item))
+            kept_shingles.append(shingles)
+            used += cost
+
+        selected.sort(key=lambda entry: entry[2].get("timestamp", 0))
+        return selected, used
+
+    @classmethod
+    def format_schedule(cls, schedule: List[Dict[str, Any]]) -> str:
+        """Describe upcoming events (as returned by GoogleCalendar.upcoming_events) for the system message"""
+        lines = ["Upcoming meetings on the user's calendar (UTC):"]
+        for event in schedule:
+            start = datetime.fromisoformat(event["start"])
+            end = datetime.fromisoformat(event["end"])
+            if event.get("all_day"):
+                when = f"{start:%a %Y-%m-%d} (all day)"
+            else:
+                when = f"{start:%a %Y-%m-%d %H:%M}-{end:%H:%M}"
+            line = f"- {when}: {cls.truncate(event.get('summary') or '(no title)', cls.MAX_SCHEDULE_SUMMARY_TOKENS)}"
+            if event.get("attendees"):
+                line += f" (with {', '.join(event['attendees'])})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def build(
+        self,
+        system_message: str,
+        message: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for a request and log its prompt-token count"""
+        context = context or []
+        if schedule:
+            # The schedule is current state rather than history, so it always fits ahead of context
+            system_message = f"{system_message.rstrip()}\n\n{self.format_schedule(schedule)}"
+        fixed = (
+            self.count_tokens(system_message) + self.count_tokens(message)
+            + 2 * self.MESSAGE_OVERHEAD_TOKENS
+        )
+        selected, context_tokens = self.select_context(context, max(0, self.max_prompt_tokens - fixed))
+
+        messages = [{"role": "system", "content": system_message}]
+        for query, response, _ in selected:
+            messages.append({"role": "user", "content": query})
+            messages.append({"role": "assistant", "content": response})
+        messages.append({"role": "user", "content": message})
+
+        raw_tokens = fixed + sum(
+            self.count_tokens(item.get("query", "")) + self.count_tokens(item.get("response", ""))
+            + 2 * self.MESSAGE_OVERHEAD_TOKENS
+            for item in context
+        )
+        prompt_tokens = fixed + context_tokens
+        logger.info(
+            f"Prompt tokens: {prompt_tokens} (estimated; {len(selected)}/{len(context)} context items, "
+            f"{raw_tokens - prompt_tokens} saved vs. unbudgeted)"
+        )
+        return messages
@@ -0,0 +1,240 @@
+import re
+import time
+import itertools
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+
+# Tokens that pin a question to specific things: anything with a digit (order
+# numbers, dates, amounts), snake_case names and all-caps codes
+_IDENTIFIER = re.compile(r"[\w/.:-]*\d[\w/.:-]*|\b\w+_\w+\b|\b[A-Z][A-Z0-9-]+\b")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def _identifiers(text: str) -> frozenset:
+    return frozenset(token.strip("/.:-").lower() for token in _IDENTIFIER.findall(text))
+
+
+class ResponseCache:
+    """
+    Semantic cache of AI responses keyed on the query embedding.
+
+    A lookup hits when a cached query's embedding is within
+    ``similarity_threshold`` (cosine) of the new one and, for per-user
+    scope, the memory context retrieved for both overlaps by at least
+    ``context_overlap`` (Jaccard over memory timestamps). Earlier turns
+    asking the same question are ignored when comparing context, since
+    they only exist because the question was asked before. Queries that
+    name different identifiers (order numbers, dates, codes) never match,
+    however similar their embeddings. An answer
+    given with the user's upcoming meetings in the prompt is only reused
+    while those meetings are unchanged. Global scope applies the same
+    checks and also shares answers across users, but only answers that
+    drew on no memories or meetings: anything personal stays with its user.
+
+    Entries expire after ``ttl_seconds`` and the least recently used are
+    evicted beyond ``max_entries``. Each scope keeps its embeddings in a
+    preallocated matrix that doubles when full, so storing doesn't copy
+    the scope's other entries.
+    """
+
+    GLOBAL_SCOPE = "__global__"
+    # Rows allocated for a new scope's embedding matrix
+    INITIAL_ROWS = 16
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        context_overlap: float = 0.5,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 10000,
+        scope: str = "user"
+    ):
+        if scope not in ("user", "global"):
+            raise ValueError(f"Unknown response cache scope: {scope}")
+
+        self.similarity_threshold = similarity_threshold
+        self.context_overlap = context_overlap
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.scope = scope
+
+        self._entries = OrderedDict()  # Entry ID -> entry, least recently used first
+        self._scopes = {}  # Scope key -> {"ids": entry ID per row, "matrix": embeddings, "created": times}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _scope_key(self, user_id: str) -> str:
+        return self.GLOBAL_SCOPE if self.scope == "global" else user_id
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype='float32').reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _context_keys(message: str, context: Optional[List[Dict[str, Any]]]) -> frozenset:
+        """Identify the retrieved memories, ignoring earlier asks of the same question"""
+        normalized = _normalize(message)
+        return frozenset(
+            item.get("timestamp") for item in (context or [])
+            if _normalize(item.get("query", "")) != normalized
+        )
+
+    @staticmethod
+    def _schedule_key(schedule: Optional[List[Dict[str, Any]]]) -> tuple:
+        """Identify the upcoming events a response was generated with"""
+        return tuple(
+            (event.get("id"), event.get("start"), event.get("end"), event.get("summary"))
+            for event in (schedule or [])
+        )
+
+    def _remove(self, entry_id: int):
+        """Drop an entry, moving its scope's last row into the gap"""
+        entry = self._entries.pop(entry_id)
+        scope = self._scopes[entry["scope"]]
+        row, last = entry["row"], len(scope["ids"]) - 1
+        if row != last:
+            moved_id = scope["ids"][last]
+            scope["ids"][row] = moved_id
+            scope["matrix"][row] = scope["matrix"][last]
+            scope["created"][row] = scope["created"][last]
+            self._entries[moved_id]["row"] = row
+        scope["ids"].pop()
+        if not scope["ids"]:
+            del self._scopes[entry["scope"]]
+
+    def _append(self, entry_id: int, entry: Dict[str, Any], embedding: np.ndarray):
+        """Add an entry's embedding to its scope's matrix, growing it when full"""
+        scope = self._scopes.get(entry["scope"])
+        if scope is None:
+            scope = self._scopes[entry["scope"]] = {
+                "ids": [],
+                "matrix": np.empty((self.INITIAL_ROWS, len(embedding)), dtype='float32'),
+                "created": np.empty(self.INITIAL_ROWS)
+            }
+        rows = len(scope["ids"])
+        if rows == len(scope["matrix"]):
+            matrix = np.empty((2 * rows, scope["matrix"].shape[1]), dtype='float32')
+            matrix[:rows] = scope["matrix"]
+            created = np.empty(2 * rows)
+            created[:rows] = scope["created"]
+            scope["matrix"], scope["created"] = matrix, created
+        scope["matrix"][rows] = embedding
+        scope["created"][rows] = entry["created"]
+        scope["ids"].append(entry_id)
+        entry["row"] = rows
+
+    def lookup(
+        self,
+        user_id: str,
+        message: str,
+        embedding: np.ndarray,
+        context: Optional[List[Dict[str, Any]]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[str]:
+        """Return a cached response for a similar query with matching context, or None"""
+        if self.max_entries <= 0:
+            return None
+
+        query = self._unit(embedding)
+        context_keys = self._context_keys(message, context)
+        schedule_key = self._schedule_key(schedule)
+        identifiers = _identifiers(message)
+        now = time.time()
+
+        with self._lock:
+            scope = self._scopes.get(self._scope_key(user_id))
+            if scope is None:
+                self.misses += 1
+                return None
+
+            # Drop expired entries from this scope before comparing
+            rows = len(scope["ids"])
+            expired = np.flatnonzero(now - scope["created"][:rows] > self.ttl_seconds)
+            for entry_id in [scope["ids"][row] for row in expired]:
+                self._remove(entry_id)
+                self.expired += 1
+            scope = self._scopes.get(self._scope_key(user_id))
+            if scope is None:
+                self.misses += 1
+                return None
+
+            similarities = scope["matrix"][:len(scope["ids"])] @ query
+
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.similarity_threshold:
+                    break
+                entry_id = scope["ids"][position]
+                entry = self._entries[entry_id]
+                if entry["schedule_key"] != schedule_key or entry["identifiers"] != identifiers:
+                    continue
+                if entry["user_id"] != user_id and (entry["context_keys"] or entry["schedule_key"]):
+                    continue
+                union = entry["context_keys"] | context_keys
+                overlap = len(entry["context_keys"] & context_keys) / len(union) if union else 1.0
+                if overlap < self.context_overlap:
+                    continue
+
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return entry["response"]
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        user_id: str,
+        message: str,
+        embedding: np.ndarray,
+        response: str,
+        context: Optional[List[Dict[str, Any]]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Cache a response for a query and the context it was generated with"""
+        if self.max_entries <= 0:
+            return
+
+        entry = {
+            "scope": self._scope_key(user_id),
+            "user_id": user_id,
+            "context_keys": self._context_keys(message, context),
+            "schedule_key": self._schedule_key(schedule),
+            "identifiers": _identifiers(message),
+            "response": response,
+            "created": time.time()
+        }
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._append(entry_id, entry, self._unit(embedding))
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report cache size and hit/miss counts"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "scope": self.scope,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions
+            }
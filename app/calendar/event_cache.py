@@ -0,0 +1,166 @@
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import pytz
+
+
+def _event_time(value: Dict[str, str]) -> Optional[float]:
+    """Seconds since the epoch for an event's start or end (all-day dates are UTC midnight)"""
+    text = value.get("dateTime") or value.get("date")
+    if not text:
+        return None
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = pytz.utc.localize(parsed)
+    return parsed.timestamp()
+
+
+class EventCache:
+    """
+    Local SQLite copy of users' calendar events, kept current by sync.
+
+    ``events`` holds the fields the assistant needs from each event, indexed
+    by start time, and ``sync_state`` the Calendar API ``nextSyncToken`` per
+    (user, calendar) for the next incremental sync. A full sync replaces a
+    calendar's events; an incremental one upserts changed events and deletes
+    cancelled ones. Both happen in one transaction with the new token, so a
+    crash never leaves a token that skips changes.
+
+    Several processes can share the file (WAL mode with a busy timeout).
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS events (
+        user_id TEXT NOT NULL,
+        calendar_id TEXT NOT NULL,
+        event_id TEXT NOT NULL,
+        summary TEXT,
+        start_ts REAL,
+        end_ts REAL,
+        all_day INTEGER NOT NULL DEFAULT 0,
+        location TEXT,
+        attendees TEXT,
+        html_link TEXT,
+        updated TEXT,
+        PRIMARY KEY (user_id, calendar_id, event_id)
+    );
+    CREATE INDEX IF NOT EXISTS events_by_start ON events (user_id, start_ts);
+    CREATE TABLE IF NOT EXISTS sync_state (
+        user_id TEXT NOT NULL,
+        calendar_id TEXT NOT NULL,
+        sync_token TEXT,
+        synced_at REAL NOT NULL,
+        PRIMARY KEY (user_id, calendar_id)
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self.stats = {"full_syncs": 0, "incremental_syncs": 0, "upserts": 0, "deletes": 0}
+
+    @staticmethod
+    def _row(user_id: str, calendar_id: str, event: Dict[str, Any]) -> tuple:
+        start, end = event.get("start", {}), event.get("end", {})
+        return (
+            user_id,
+            calendar_id,
+            event["id"],
+            event.get("summary", ""),
+            _event_time(start),
+            _event_time(end),
+            int("date" in start and "dateTime" not in start),
+            event.get("location"),
+            json.dumps([attendee.get("email") for attendee in event.get("attendees", [])]),
+            event.get("htmlLink"),
+            event.get("updated")
+        )
+
+    def _write(self, user_id: str, calendar_id: str, events: List[Dict[str, Any]]):
+        """Upsert events and delete cancelled ones (called in a transaction)"""
+        cancelled = [(user_id, calendar_id, event["id"]) for event in events if event.get("status") == "cancelled"]
+        live = [self._row(user_id, calendar_id, event) for event in events if event.get("status") != "cancelled"]
+        self._conn.executemany(
+            "DELETE FROM events WHERE user_id = ? AND calendar_id = ? AND event_id = ?", cancelled
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", live
+        )
+        self.stats["upserts"] += len(live)
+        self.stats["deletes"] += len(cancelled)
+
+    def apply_sync(
+        self,
+        user_id: str,
+        calendar_id: str,
+        events: List[Dict[str, Any]],
+        sync_token: Optional[str],
+        full: bool
+    ):
+        """Store the result of a full or incremental sync together with its next sync token"""
+        with self._lock, self._conn:
+            if full:
+                self._conn.execute(
+                    "DELETE FROM events WHERE user_id = ? AND calendar_id = ?", (user_id, calendar_id)
+                )
+            self._write(user_id, calendar_id, events)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                (user_id, calendar_id, sync_token, time.time())
+            )
+            self.stats["full_syncs" if full else "incremental_syncs"] += 1
+
+    def upsert(self, user_id: str, calendar_id: str, events: List[Dict[str, Any]]):
+        """Store events created through this app right away, ahead of the next sync"""
+        with self._lock, self._conn:
+            self._write(user_id, calendar_id, events)
+
+    def sync_state(self, user_id: str, calendar_id: str) -> Optional[Dict[str, Any]]:
+        """The stored sync token and when the calendar was last synced, or None if it never was"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, synced_at FROM sync_state WHERE user_id = ? AND calendar_id = ?",
+                (user_id, calendar_id)
+            ).fetchone()
+        return {"sync_token": row[0], "synced_at": row[1]} if row else None
+
+    def upcoming(self, user_id: str, start: float, end: float, limit: int = 10) -> List[Dict[str, Any]]:
+        """Events of a user overlapping [start, end), earliest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT event_id, calendar_id, summary, start_ts, end_ts, all_day, location, attendees, html_link "
+                "FROM events WHERE user_id = ? AND start_ts < ? AND end_ts > ? ORDER BY start_ts LIMIT ?",
+                (user_id, end, start, limit)
+            ).fetchall()
+        return [
+            {
+                "id": event_id,
+                "calendar_id": calendar_id,
+                "summary": summary,
+                "start": datetime.fromtimestamp(start_ts, pytz.utc).isoformat(),
+                "end": datetime.fromtimestamp(end_ts, pytz.utc).isoformat(),
+                "all_day": bool(all_day),
+                "location": location,
+                "attendees": json.loads(attendees or "[]"),
+                "html_link": html_link
+            }
+            for event_id, calendar_id, summary, start_ts, end_ts, all_day, location, attendees, html_link in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            events = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+            calendars = self._conn.execute("SELECT COUNT(*) FROM sync_state").fetchone()[0]
+        return {**self.stats, "events": events, "synced_calendars": calendars}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,28 +1,195 @@
 import os
 import json
-from typing import List, Optional, Dict, Any
+import time
+import heapq
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional, Dict, Any, Tuple
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from datetime import datetime
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+from datetime import datetime, timedelta
 import pytz
 
+from app.calendar.event_cache import EventCache
+from app.calendar.interval_index import IntervalIndex
+from app.monitoring.metrics import REGISTRY
+
+CALENDAR_SECONDS = REGISTRY.histogram(
+    "calendar_operation_seconds", "Time spent in Google Calendar operations", ["operation"]
+)
+CALENDAR_ERRORS = REGISTRY.counter(
+    "calendar_errors_total", "Failed Google Calendar operations", ["operation"]
+)
+
+
+class AuthorizationRequired(Exception):
+    """A user has no usable stored credentials, and the caller may not start an OAuth flow"""
+
+
+def _timestamp(value: str) -> float:
+    """Seconds since the epoch for an ISO time; times without an offset are UTC"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = pytz.utc.localize(parsed)
+    return parsed.timestamp()
+
+
 class GoogleCalendar:
-    def __init__(self):
+    # Google recommends at most 50 calls per Calendar batch request
+    MAX_BATCH_SIZE = 50
+    # Events per page when listing events for sync (the API allows up to 2500)
+    SYNC_PAGE_SIZE = 250
+    
+    def __init__(
+        self,
+        max_cached_users: int = 256,
+        refresh_margin_seconds: int = 300,
+        api_root_url: Optional[str] = None,
+        freebusy_ttl_seconds: float = 300.0,
+        max_cached_calendars: int = 4096,
+        credentials_dir: Optional[str] = None,
+        event_cache_path: Optional[str] = None,
+        sync_past_days: int = 7
+    ):
         # Make sure to use the correct scope for Google Calendar
         self.scopes = ['https://www.googleapis.com/auth/calendar']
-        self.credentials_dir = os.path.join(os.path.dirname(__file__), "credentials")
+        self.credentials_dir = credentials_dir or os.path.join(os.path.dirname(__file__), "credentials")
         
         # Create credentials directory if it doesn't exist
         os.makedirs(self.credentials_dir, exist_ok=True)
         
         # Path to client secrets file
         self.client_secrets_file = os.path.join(self.credentials_dir, "client_secret.json")
+        
+        # Alternative API root (e.g. a local stand-in server); None means Google
+        self.api_root_url = api_root_url.rstrip("/") if api_root_url else None
+        
+        # Per-user cache of credentials and built Calendar services (LRU, coldest first).
+        # Service objects are not thread-safe, so each entry has its own lock.
+        self.max_cached_users = max_cached_users
+        self.refresh_margin = timedelta(seconds=refresh_margin_seconds)
+        self._services = OrderedDict()  # User ID -> {"creds", "service", "lock"}
+        self._services_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+        
+        # Free/busy cache per (user ID, calendar ID), LRU: busy intervals plus the
+        # time ranges already fetched. Entries are dropped after the TTL so changes
+        # made outside this app show up.
+        self.freebusy_ttl = freebusy_ttl_seconds
+        self.max_cached_calendars = max_cached_calendars
+        self._freebusy = OrderedDict()  # (user ID, calendar ID) -> {"busy", "covered", "error", "fetched"}
+        self._freebusy_lock = threading.Lock()
+        self.freebusy_stats = {"queries": 0, "calendar_hits": 0, "calendar_misses": 0}
+        
+        # Local copy of users' events, filled by a full events().list and then
+        # kept current with syncToken incremental syncs (see sync_events)
+        self.events = EventCache(
+            event_cache_path or os.path.join(os.path.dirname(__file__), "event_cache.sqlite3")
+        )
+        self.sync_past_days = sync_past_days
+        self.sync_stats = {"full": 0, "incremental": 0, "tokens_expired": 0, "changes": 0}
+    
+    def _token_file(self, user_id: str) -> str:
+        return os.path.join(self.credentials_dir, f"{user_id}_token.json")
+    
+    def has_credentials(self, user_id: str) -> bool:
+        """Whether a user has authorized Calendar access (so using it won't start an OAuth flow)"""
+        return os.path.exists(self._token_file(user_id))
+    
+    def authorized_users(self) -> List[str]:
+        """Users with stored Google credentials"""
+        suffix = "_token.json"
+        return [
+            filename[:-len(suffix)] for filename in os.listdir(self.credentials_dir)
+            if filename.endswith(suffix)
+        ]
+    
+    def _save_credentials(self, user_id: str, creds: Credentials):
+        with open(self._token_file(user_id), "w") as token:
+            token.write(creds.to_json())
+    
+    def _expires_soon(self, creds: Credentials) -> bool:
+        """Whether credentials are invalid or expire within the refresh margin"""
+        if not creds.valid:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        return creds.expiry is not None and creds.expiry - datetime.utcnow() < self.refresh_margin
+    
+    def _get_entry(self, user_id: str) -> Dict[str, Any]:
+        """Get (or create) the cache entry for a user"""
+        with self._services_lock:
+            entry = self._services.get(user_id)
+            if entry is not None:
+                self._services.move_to_end(user_id)
+                return entry
+            
+            entry = {"creds": None, "service": None, "lock": threading.RLock()}
+            self._services[user_id] = entry
+            while len(self._services) > self.max_cached_users:
+                self._services.popitem(last=False)
+                self.stats["evictions"] += 1
+            return entry
+    
+    @contextmanager
+    def _service(self, user_id: str, interactive: bool = True):
+        """
+        Use a user's cached Calendar service
+        
+        Credentials are refreshed shortly before they expire, and the service is
+        only built on the first use per user, so a repeated call costs one HTTP
+        request. The user's lock is held while the service is in use. With
+        interactive=False only stored credentials are used (see _get_credentials).
+        """
+        entry = self._get_entry(user_id)
+        with entry["lock"]:
+            creds = entry["creds"]
+            if creds is not None and self._expires_soon(creds) and creds.refresh_token:
+                try:
+                    creds.refresh(Request())
+                    self._save_credentials(user_id, creds)
+                    self.stats["refreshes"] += 1
+                except Exception as e:
+                    print(f"Error refreshing credentials for {user_id}: {str(e)}")
+                    creds = None
+            
+            if creds is None or not creds.valid:
+                self.stats["misses"] += 1
+                entry["creds"] = self._get_credentials(user_id, interactive)
+                client_options = None
+                if self.api_root_url:
+                    client_options = {"api_endpoint": f"{self.api_root_url}/calendar/v3/"}
+                entry["service"] = build(
+                    'calendar', 'v3', credentials=entry["creds"], cache_discovery=False,
+                    client_options=client_options
+                )
+            else:
+                self.stats["hits"] += 1
+            
+            yield entry["service"]
     
-    def _get_credentials(self, user_id: str) -> Credentials:
-        """Get or refresh credentials for a user"""
-        token_file = os.path.join(self.credentials_dir, f"{user_id}_token.json")
+    def get_stats(self) -> Dict[str, Any]:
+        """Report service cache hits, misses and credential refreshes"""
+        return {
+            **self.stats,
+            "cached_users": len(self._services),
+            "freebusy": {**self.freebusy_stats, "cached_calendars": len(self._freebusy)},
+            "sync": {**self.sync_stats, "cache": self.events.get_stats()}
+        }
+    
+    def _get_credentials(self, user_id: str, interactive: bool = True) -> Credentials:
+        """
+        Get or refresh credentials for a user
+        
+        Without stored credentials that are valid or refreshable, this starts the
+        OAuth flow in a browser, or raises AuthorizationRequired if not interactive
+        (background work must never wait on a consent screen).
+        """
+        token_file = self._token_file(user_id)
         creds = None
         
         # Load existing credentials
@@ -36,6 +203,8 @@ class GoogleCalendar:
             if creds and creds.expired and creds.refresh_token:
                 creds.refresh(Request())
             else:
+                if not interactive:
+                    raise AuthorizationRequired(f"{user_id} has not authorized Google Calendar access")
                 if not os.path.exists(self.client_secrets_file):
                     raise FileNotFoundError(
                         f"Client secrets file not found at {self.client_secrets_file}. "
@@ -59,11 +228,54 @@ class GoogleCalendar:
                 creds = flow.run_local_server(port=8501)
                 
             # Save credentials
-            with open(token_file, "w") as token:
-                token.write(creds.to_json())
+            self._save_credentials(user_id, creds)
         
         return creds
     
+    def _event_body(
+        self,
+        summary: str,
+        start_time: str,
+        end_time: str,
+        description: Optional[str] = None,
+        attendees: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Build the Calendar API body for an event"""
+        # Format attendees
+        formatted_attendees = None
+        if attendees:
+            formatted_attendees = [{'email': email} for email in attendees]
+        
+        # Create event body
+        event_body = {
+            'summary': summary,
+            'description': description or '',
+            'start': {
+                'dateTime': start_time,
+                'timeZone': 'UTC',
+            },
+            'end': {
+                'dateTime': end_time,
+                'timeZone': 'UTC',
+            },
+            'reminders': {
+                'useDefault': True,
+            },
+        }
+        
+        # Add attendees if provided
+        if formatted_attendees:
+            event_body['attendees'] = formatted_attendees
+        
+        return event_body
+    
+    def _new_batch(self, service, callback) -> BatchHttpRequest:
+        """Create a batch request, pointed at the alternative API root if one is set"""
+        if self.api_root_url:
+            return BatchHttpRequest(callback=callback, batch_uri=f"{self.api_root_url}/batch/calendar/v3")
+        return service.new_batch_http_request(callback=callback)
+    
+    @CALENDAR_SECONDS.time(operation="create_event")
     def create_event(
         self, 
         summary: str, 
@@ -88,44 +300,335 @@ class GoogleCalendar:
             The event link/URL
         """
         try:
-            # Get credentials
-            creds = self._get_credentials(user_id)
-            
-            # Build the service
-            service = build('calendar', 'v3', credentials=creds)
-            
-            # Format attendees
-            formatted_attendees = None
-            if attendees:
-                formatted_attendees = [{'email': email} for email in attendees]
-            
-            # Create event body
-            event_body = {
-                'summary': summary,
-                'description': description or '',
-                'start': {
-                    'dateTime': start_time,
-                    'timeZone': 'UTC',
-                },
-                'end': {
-                    'dateTime': end_time,
-                    'timeZone': 'UTC',
-                },
-                'reminders': {
-                    'useDefault': True,
-                },
-            }
+            event_body = self._event_body(summary, start_time, end_time, description, attendees)
             
-            # Add attendees if provided
-            if formatted_attendees:
-                event_body['attendees'] = formatted_attendees
+            # Create the event with the user's cached service
+            with self._service(user_id) as service:
+                event = service.events().insert(calendarId='primary', body=event_body).execute()
             
-            # Create the event
-            event = service.events().insert(calendarId='primary', body=event_body).execute()
+            # Keep cached free/busy data and events current without refetching them
+            self._record_busy(user_id, ['primary'] + (attendees or []), start_time, end_time)
+            self.events.upsert(user_id, 'primary', [event])
             
             # Return the event link
             return event.get('htmlLink', '')
             
         except Exception as e:
+            CALENDAR_ERRORS.inc(operation="create_event")
             print(f"Error creating calendar event: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    @CALENDAR_SECONDS.time(operation="create_events")
+    def create_events(self, user_id: str, meetings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Create many calendar events through Calendar API batch requests
+        
+        Args:
+            user_id: User ID for authentication
+            meetings: Dicts with summary, start_time, end_time and optional
+                description and attendees, as for create_event
+            
+        Returns:
+            One result per meeting, in order: {"meeting_link": ...} or {"error": ...}
+        """
+        results = [None] * len(meetings)
+        
+        def on_response(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                CALENDAR_ERRORS.inc(operation="create_events")
+                results[index] = {"error": str(exception)}
+            else:
+                results[index] = {"meeting_link": response.get('htmlLink', '')}
+                meeting = meetings[index]
+                self._record_busy(
+                    user_id, ['primary'] + (meeting.get("attendees") or []),
+                    meeting["start_time"], meeting["end_time"]
+                )
+                self.events.upsert(user_id, 'primary', [response])
+        
+        with self._service(user_id) as service:
+            for start in range(0, len(meetings), self.MAX_BATCH_SIZE):
+                batch = self._new_batch(service, on_response)
+                for index in range(start, min(start + self.MAX_BATCH_SIZE, len(meetings))):
+                    meeting = meetings[index]
+                    event_body = self._event_body(
+                        meeting["summary"],
+                        meeting["start_time"],
+                        meeting["end_time"],
+                        meeting.get("description"),
+                        meeting.get("attendees")
+                    )
+                    batch.add(
+                        service.events().insert(calendarId='primary', body=event_body),
+                        request_id=str(index)
+                    )
+                
+                try:
+                    batch.execute()
+                except Exception as e:
+                    # The whole batch failed; report it on every item that has no result
+                    CALENDAR_ERRORS.inc(operation="create_events")
+                    print(f"Error creating calendar events in batch: {str(e)}")
+                    for index in range(start, min(start + self.MAX_BATCH_SIZE, len(meetings))):
+                        if results[index] is None:
+                            results[index] = {"error": str(e)}
+        
+        return results
+    
+    def _list_events(self, service, calendar_id: str, sync_token: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Page through events().list: everything from sync_past_days ago, or the changes since a sync token
+        
+        Returns:
+            The events (changed and cancelled ones for an incremental list) and the next sync token
+        """
+        params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": self.SYNC_PAGE_SIZE}
+        if sync_token:
+            params["syncToken"] = sync_token
+        else:
+            since = datetime.now(pytz.utc) - timedelta(days=self.sync_past_days)
+            params["timeMin"] = since.isoformat()
+        
+        events = []
+        while True:
+            response = service.events().list(**params).execute()
+            events.extend(response.get("items", []))
+            if not response.get("nextPageToken"):
+                return events, response.get("nextSyncToken")
+            params["pageToken"] = response["nextPageToken"]
+    
+    @CALENDAR_SECONDS.time(operation="sync_events")
+    def sync_events(
+        self,
+        user_id: str,
+        calendar_id: str = 'primary',
+        max_age_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Bring a user's cached events up to date
+        
+        The first sync lists all events from sync_past_days ago; later ones
+        only fetch changes since the stored sync token. When Google expires the
+        token (HTTP 410) the calendar is listed in full again.
+        
+        Args:
+            user_id: User ID for authentication
+            calendar_id: Calendar to sync
+            max_age_seconds: Skip the sync if the calendar was synced more recently than this
+            
+        Returns:
+            {"full": whether it was a full sync, "changes": events fetched}, or {"skipped": True}
+        
+        Raises:
+            AuthorizationRequired: If the user has no usable stored credentials
+        """
+        state = self.events.sync_state(user_id, calendar_id)
+        if max_age_seconds is not None and state and time.time() - state["synced_at"] < max_age_seconds:
+            return {"skipped": True}
+        
+        sync_token = state["sync_token"] if state else None
+        try:
+            # Syncs run in the background, so they never prompt for authorization
+            with self._service(user_id, interactive=False) as service:
+                try:
+                    events, next_token = self._list_events(service, calendar_id, sync_token)
+                except HttpError as e:
+                    if not sync_token or e.resp.status != 410:
+                        raise
+                    # Google dropped the token; only a full sync can recover
+                    self.sync_stats["tokens_expired"] += 1
+                    sync_token = None
+                    events, next_token = self._list_events(service, calendar_id, None)
+        except Exception as e:
+            CALENDAR_ERRORS.inc(operation="sync_events")
+            print(f"Error syncing calendar events for {user_id}: {str(e)}")
+            raise
+        
+        full = sync_token is None
+        self.events.apply_sync(user_id, calendar_id, events, next_token, full)
+        self.sync_stats["full" if full else "incremental"] += 1
+        self.sync_stats["changes"] += len(events)
+        return {"full": full, "changes": len(events)}
+    
+    def upcoming_events(self, user_id: str, hours: float = 48.0, limit: int = 10) -> List[Dict[str, Any]]:
+        """A user's events from now until hours ahead, from the local cache (no API call)"""
+        now = time.time()
+        return self.events.upcoming(user_id, now, now + hours * 3600, limit)
+    
+    def close(self):
+        self.events.close()
+    
+    def _record_busy(self, user_id: str, calendar_ids: List[str], start_time: str, end_time: str):
+        """Add a newly created event to the cached free/busy data of its calendars"""
+        start, end = _timestamp(start_time), _timestamp(end_time)
+        with self._freebusy_lock:
+            for calendar_id in calendar_ids:
+                entry = self._freebusy.get((user_id, calendar_id))
+                if entry is not None:
+                    entry["busy"].add(start, end)
+    
+    def _busy_indexes(
+        self,
+        user_id: str,
+        calendar_ids: List[str],
+        start: float,
+        end: float
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get cached free/busy entries covering [start, end) for calendars
+        
+        Calendars whose cache doesn't cover the range are fetched together in
+        one freebusy().query call, widened to whole UTC days so nearby
+        queries are served from the cache.
+        """
+        now = time.monotonic()
+        entries, missing = {}, []
+        with self._freebusy_lock:
+            for calendar_id in calendar_ids:
+                key = (user_id, calendar_id)
+                entry = self._freebusy.get(key)
+                if entry is not None and now - entry["fetched"] > self.freebusy_ttl:
+                    del self._freebusy[key]
+                    entry = None
+                if entry is not None and entry["covered"].covers(start, end):
+                    self._freebusy.move_to_end(key)
+                    entries[calendar_id] = entry
+                    self.freebusy_stats["calendar_hits"] += 1
+                else:
+                    missing.append(calendar_id)
+                    self.freebusy_stats["calendar_misses"] += 1
+        
+        if not missing:
+            return entries
+        
+        day = 86400
+        fetch_start = start - start % day
+        fetch_end = end + (-end % day)
+        time_min = datetime.fromtimestamp(fetch_start, pytz.utc).isoformat()
+        time_max = datetime.fromtimestamp(fetch_end, pytz.utc).isoformat()
+        
+        calendars = {}
+        with self._service(user_id) as service:
+            # The API accepts at most 50 calendars per query
+            for offset in range(0, len(missing), self.MAX_BATCH_SIZE):
+                body = {
+                    "timeMin": time_min,
+                    "timeMax": time_max,
+                    "timeZone": "UTC",
+                    "items": [{"id": calendar_id} for calendar_id in missing[offset:offset + self.MAX_BATCH_SIZE]]
+                }
+                with CALENDAR_SECONDS.time(operation="freebusy_query"):
+                    calendars.update(service.freebusy().query(body=body).execute().get("calendars", {}))
+        
+        fetched = time.monotonic()
+        with self._freebusy_lock:
+            for calendar_id in missing:
+                key = (user_id, calendar_id)
+                entry = self._freebusy.get(key)
+                if entry is None:
+                    entry = {"busy": IntervalIndex(), "covered": IntervalIndex(), "error": None, "fetched": fetched}
+                    self._freebusy[key] = entry
+                self._freebusy.move_to_end(key)
+                
+                result = calendars.get(calendar_id, {})
+                errors = result.get("errors")
+                entry["error"] = errors[0].get("reason", "unknown") if errors else None
+                for busy in result.get("busy", []):
+                    entry["busy"].add(_timestamp(busy["start"]), _timestamp(busy["end"]))
+                entry["covered"].add(fetch_start, fetch_end)
+                entries[calendar_id] = entry
+            
+            while len(self._freebusy) > self.max_cached_calendars:
+                self._freebusy.popitem(last=False)
+        
+        return entries
+    
+    @CALENDAR_SECONDS.time(operation="find_slots")
+    def find_slots(
+        self,
+        user_id: str,
+        duration_minutes: int,
+        window_start: str,
+        window_end: str,
+        attendees: Optional[List[str]] = None,
+        work_start: str = "09:00",
+        work_end: str = "17:00",
+        timezone: str = "UTC",
+        include_weekends: bool = False,
+        step_minutes: int = 30,
+        max_slots: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Find times when the user and all attendees are free
+        
+        Args:
+            user_id: User ID for authentication; the user's primary calendar is always checked
+            duration_minutes: Length of the meeting
+            window_start: Earliest start in ISO format
+            window_end: Latest end in ISO format
+            attendees: Optional attendee email addresses (calendar IDs)
+            work_start: Start of working hours (HH:MM) in timezone
+            work_end: End of working hours (HH:MM) in timezone
+            timezone: IANA time zone for working hours and returned slots
+            include_weekends: Whether Saturdays and Sundays are considered
+            step_minutes: Slots start on multiples of this many minutes
+            max_slots: Maximum number of slots to return
+            
+        Returns:
+            {"slots": [{"start", "end"}, ...], "unavailable": calendars whose
+            free/busy data could not be read}
+        """
+        tz = pytz.timezone(timezone)
+        start, end = _timestamp(window_start), _timestamp(window_end)
+        duration = duration_minutes * 60
+        step = step_minutes * 60
+        calendar_ids = list(dict.fromkeys(['primary'] + (attendees or [])))
+        
+        entries = self._busy_indexes(user_id, calendar_ids, start, end)
+        
+        with self._freebusy_lock:
+            self.freebusy_stats["queries"] += 1
+            # Union of everyone's busy time in the window, in start order
+            busy = list(heapq.merge(*(entry["busy"].overlapping(start, end) for entry in entries.values())))
+            unavailable = [calendar_id for calendar_id, entry in entries.items() if entry["error"]]
+        
+        work_from = datetime.strptime(work_start, "%H:%M").time()
+        work_to = datetime.strptime(work_end, "%H:%M").time()
+        
+        slots = []
+        position = 0
+        day = datetime.fromtimestamp(start, tz).date()
+        last_day = datetime.fromtimestamp(end, tz).date()
+        while day <= last_day and len(slots) < max_slots:
+            if include_weekends or day.weekday() < 5:
+                # Working hours of this day, clipped to the requested window
+                day_start = max(start, tz.localize(datetime.combine(day, work_from)).timestamp())
+                day_end = min(end, tz.localize(datetime.combine(day, work_to)).timestamp())
+                
+                # Walk the free gaps between busy intervals
+                free_from = day_start
+                while position < len(busy) and busy[position][1] <= day_start:
+                    position += 1
+                scan = position
+                while free_from < day_end and len(slots) < max_slots:
+                    if scan < len(busy) and busy[scan][0] < day_end:
+                        free_to = busy[scan][0]
+                    else:
+                        free_to = day_end
+                    
+                    slot_start = free_from + (-free_from % step)
+                    while slot_start + duration <= free_to and len(slots) < max_slots:
+                        slots.append({
+                            "start": datetime.fromtimestamp(slot_start, tz).isoformat(),
+                            "end": datetime.fromtimestamp(slot_start + duration, tz).isoformat()
+                        })
+                        slot_start += step
+                    
+                    if free_to >= day_end:
+                        break
+                    free_from = max(free_from, busy[scan][1])
+                    scan += 1
+            day += timedelta(days=1)
+        
+        return {"slots": slots, "unavailable": unavailable}
@@ -0,0 +1,45 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, Tuple
+
+
+class IntervalIndex:
+    """
+    Set of half-open [start, end) time intervals, kept merged and sorted.
+
+    Busy time only matters as a union, so overlapping and touching intervals
+    are merged on insert. That keeps starts and ends both sorted, and an
+    overlap query is two bisects plus a walk over the hits, the same bound
+    an interval tree gives, with plain lists.
+    """
+
+    def __init__(self):
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, start: float, end: float):
+        """Insert an interval, merging it with any it overlaps or touches"""
+        if end <= start:
+            return
+        # Intervals from i (first ending at or after start) to j (first starting after end)
+        i = bisect_left(self.ends, start)
+        j = bisect_right(self.starts, end)
+        if i < j:
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j - 1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def covers(self, start: float, end: float) -> bool:
+        """Whether [start, end) lies entirely inside one stored interval"""
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and self.ends[i] >= end
+
+    def overlapping(self, start: float, end: float) -> Iterator[Tuple[float, float]]:
+        """Yield stored intervals that overlap [start, end), in order"""
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            yield self.starts[i], self.ends[i]
+            i += 1
@@ -0,0 +1,138 @@
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+
+
+class CalendarSyncScheduler:
+    """
+    Keeps users' event caches current by syncing them in the background.
+
+    Every user with Google credentials (found on each round, or added with
+    ``add_user``) is synced every ``interval_seconds``, with some jitter so
+    users spread out. A failed sync is retried after an exponential backoff
+    per user, from ``min_backoff_seconds`` up to ``max_backoff_seconds``, so
+    one user with revoked credentials or a flaky calendar doesn't hold up or
+    hammer anything. Calendars another process synced recently are skipped,
+    so several API workers sharing the cache don't repeat each other's work.
+    """
+
+    def __init__(
+        self,
+        calendar,
+        interval_seconds: float = 300.0,
+        min_backoff_seconds: float = 30.0,
+        max_backoff_seconds: float = 3600.0,
+        workers: int = 2
+    ):
+        self.calendar = calendar
+        self.interval = interval_seconds
+        self.min_backoff = min_backoff_seconds
+        self.max_backoff = max_backoff_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="calendar-sync")
+        self._condition = threading.Condition()
+        self._due = []  # (due time, user ID) heap; stale entries are skipped
+        self._users = {}  # User ID -> {"due", "failures", "running", "last_error", "last_synced"}
+        self._thread = None
+        self._stopped = False
+        self._next_discovery = 0.0
+        self.stats = {"syncs": 0, "failures": 0, "skipped": 0}
+
+    def _schedule(self, user_id: str, due: float):
+        """Set when a user is next synced (called with the condition held)"""
+        self._users[user_id]["due"] = due
+        heapq.heappush(self._due, (due, user_id))
+        self._condition.notify()
+
+    def add_user(self, user_id: str):
+        """Start syncing a user (right away if they are new)"""
+        with self._condition:
+            if user_id not in self._users:
+                self._users[user_id] = {
+                    "due": 0.0, "failures": 0, "running": False, "last_error": None, "last_synced": None
+                }
+                self._schedule(user_id, time.time())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="calendar-sync-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self):
+        while True:
+            if time.time() >= self._next_discovery:
+                try:
+                    for user_id in self.calendar.authorized_users():
+                        self.add_user(user_id)
+                except Exception as e:
+                    print(f"Error listing users for calendar sync: {str(e)}")
+                self._next_discovery = time.time() + self.interval
+
+            with self._condition:
+                if self._stopped:
+                    return
+                now = time.time()
+                due = []
+                while self._due and self._due[0][0] <= now:
+                    _, user_id = heapq.heappop(self._due)
+                    state = self._users.get(user_id)
+                    # Skip entries superseded by a later reschedule
+                    if state is not None and state["due"] <= now and not state["running"]:
+                        state["running"] = True
+                        due.append(user_id)
+                if not due:
+                    wait = min(self._due[0][0] if self._due else now + self.interval, self._next_discovery) - now
+                    self._condition.wait(timeout=max(0.0, wait))
+                    continue
+
+            for user_id in due:
+                self._executor.submit(self._sync_user, user_id)
+
+    def _sync_user(self, user_id: str):
+        error = None
+        skipped = False
+        try:
+            # Another worker may have synced this calendar moments ago
+            skipped = self.calendar.sync_events(user_id, max_age_seconds=self.interval / 2).get("skipped", False)
+        except Exception as e:
+            error = e
+
+        with self._condition:
+            state = self._users[user_id]
+            state["running"] = False
+            now = time.time()
+            if error is None:
+                state["failures"] = 0
+                state["last_error"] = None
+                if skipped:
+                    self.stats["skipped"] += 1
+                else:
+                    state["last_synced"] = now
+                    self.stats["syncs"] += 1
+                delay = self.interval * random.uniform(0.9, 1.1)
+            else:
+                state["failures"] += 1
+                state["last_error"] = str(error)
+                self.stats["failures"] += 1
+                backoff = min(self.max_backoff, self.min_backoff * 2 ** (state["failures"] - 1))
+                delay = backoff * random.uniform(0.5, 1.0)
+            if not self._stopped:
+                self._schedule(user_id, now + delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                **self.stats,
+                "users": len(self._users),
+                "backing_off": sum(1 for state in self._users.values() if state["failures"]),
+                "interval_seconds": self.interval
+            }
@@ -0,0 +1,89 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+
+class EmbeddingBackend:
+    """
+    An embedding model FaissMemory can encode with.
+
+    Subclasses set ``name`` and ``embedding_size`` and implement ``encode``,
+    which takes a batch of texts and returns a float32 array with one row per
+    text. Backends of the same model produce interchangeable vectors, so one
+    can be swapped for another over existing memory files.
+    """
+
+    name = "base"
+    embedding_size = 0
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Full-precision PyTorch SentenceTransformer on CPU (the default)"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str, **model_kwargs):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, **model_kwargs)
+        self.embedding_size = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=max(1, len(texts))), dtype='float32')
+
+
+class QuantizedTorchBackend(SentenceTransformerBackend):
+    """SentenceTransformer with its Linear layers dynamically quantized to int8"""
+
+    name = "torch-int8"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name, device="cpu")
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend(SentenceTransformerBackend):
+    """
+    The model's ONNX export run by ONNX Runtime, through sentence-transformers
+    (3.2+, installed with the ``onnx`` extra).
+
+    ``file_name`` picks an export from the model repository's ``onnx/``
+    folder; sentence-transformer models on the Hub ship int8-quantized ones
+    such as ``model_quint8_avx2.onnx`` or ``model_qint8_arm64.onnx``.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, file_name: Optional[str] = None):
+        model_kwargs = {"file_name": file_name} if file_name else {}
+        super().__init__(model_name, backend="onnx", model_kwargs=model_kwargs)
+        self.file_name = file_name
+
+
+class QuantizedOnnxBackend(OnnxBackend):
+    """ONNX Runtime with an int8-quantized export (AVX2 by default)"""
+
+    name = "onnx-int8"
+    DEFAULT_FILE_NAME = "model_quint8_avx2.onnx"
+
+    def __init__(self, model_name: str, file_name: Optional[str] = None):
+        super().__init__(model_name, file_name=file_name or self.DEFAULT_FILE_NAME)
+
+
+EMBEDDING_BACKENDS = {
+    backend.name: backend
+    for backend in (SentenceTransformerBackend, QuantizedTorchBackend, OnnxBackend, QuantizedOnnxBackend)
+}
+
+
+def load_embedding_backend(name: str, model_name: str, options: Optional[Dict[str, str]] = None) -> EmbeddingBackend:
+    """Create a backend by name ("torch", "torch-int8", "onnx" or "onnx-int8")"""
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend: {name} (expected one of {', '.join(EMBEDDING_BACKENDS)})"
+        )
+    return EMBEDDING_BACKENDS[name](model_name, **(options or {}))
+
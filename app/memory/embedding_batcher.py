@@ -0,0 +1,128 @@
+import asyncio
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching front end for an embedding model.
+
+    Callers submit single texts from any thread (or await them from the event
+    loop). A worker thread collects requests for up to ``max_wait_ms`` or until
+    ``max_batch_size`` are queued, encodes them in one forward pass and resolves
+    each caller's future with its own vector. With ``workers`` > 1 several
+    batches can be in flight at once, for encoders that run out of process.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        workers: int = 1
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stop = object()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        # Upper bucket bound (1, 2, 4, ...) -> number of batches
+        self.batch_size_histogram = {}
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"embedding-batcher-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding and return a future for its embedding"""
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        """Encode a single text, blocking until its batch has run"""
+        return self.submit(text).result()
+
+    async def aencode(self, text: str) -> np.ndarray:
+        """Encode a single text without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def close(self):
+        """Stop the workers once queued requests are done"""
+        for _ in self._threads:
+            self._queue.put(self._stop)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _collect(self, first) -> List:
+        """Gather more requests until the batch is full or the wait window closes"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is self._stop:
+                # Finish this batch, then let the main loop see the stop marker
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _record(self, size: int):
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        with self._stats_lock:
+            self.batches += 1
+            self.items += size
+            self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is self._stop:
+                return
+
+            batch = self._collect(first)
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = np.asarray(self.encode_fn(texts), dtype='float32')
+                # zip would leave the callers past a short result waiting forever
+                if embeddings.ndim == 0 or len(embeddings) != len(batch):
+                    raise ValueError(
+                        f"Encoder returned {len(embeddings) if embeddings.ndim else 0} "
+                        f"embeddings for {len(batch)} texts"
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+            self._record(len(batch))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report batch counts and the batch-size histogram"""
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.batch_size_histogram.items()))
+            }
@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class EmbeddingCache:
+    """
+    LRU cache of embeddings keyed by a hash of the text.
+
+    Repeated or templated messages skip the model entirely. Cached vectors are
+    marked read-only because the same array is handed to every caller.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # Content hash -> embedding
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for a text, or None"""
+        if self.max_entries <= 0:
+            return None
+
+        key = self._key(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, text: str, embedding: np.ndarray) -> np.ndarray:
+        """Cache an embedding and return the cached (read-only) copy"""
+        embedding = np.array(embedding, dtype='float32')
+        embedding.setflags(write=False)
+        if self.max_entries <= 0:
+            return embedding
+
+        key = self._key(text)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embedding
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report cache size and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,158 @@
+import queue
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+
+def _worker_main(conn, backend: str, model_name: str, options: Optional[Dict[str, str]], worker_index: int, rows: int):
+    """Embedding worker process: load the model once, then encode batches into shared memory"""
+    try:
+        from app.memory.embedding_backends import load_embedding_backend
+        model = load_embedding_backend(backend, model_name, options)
+        conn.send(("ready", model.embedding_size))
+    except Exception as e:
+        conn.send(("error", f"Failed to load {model_name} ({backend}): {str(e)}"))
+        return
+
+    # The parent allocates the shared buffer once it knows the embedding size
+    message = conn.recv()
+    if message is None:
+        return
+    _, shm_name, total_rows = message
+    shm = shared_memory.SharedMemory(name=shm_name)
+    dim = model.embedding_size
+    buffer = np.ndarray((total_rows, dim), dtype='float32', buffer=shm.buf)
+    region = buffer[rows * worker_index:rows * (worker_index + 1)]
+
+    try:
+        while True:
+            texts = conn.recv()
+            if texts is None:
+                break
+            try:
+                embeddings = model.encode(texts)
+                region[:len(texts)] = embeddings
+                conn.send(("ok", len(texts)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    finally:
+        del buffer, region
+        shm.close()
+
+
+class EmbeddingProcessPool:
+    """
+    Runs the embedding model in separate worker processes.
+
+    The API process only sends texts over a pipe; each worker writes its
+    float32 vectors into its own region of one shared-memory buffer, so no
+    vectors are pickled and the model (and torch) never load in the API
+    process. A batch occupies one worker, so up to ``workers`` batches can
+    be encoded in parallel from different threads.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        workers: int = 2,
+        max_batch_size: int = 32,
+        backend: str = "torch",
+        backend_options: Optional[Dict[str, str]] = None
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._shm = None
+
+        # Spawn rather than fork so workers don't inherit FAISS/torch state
+        context = multiprocessing.get_context("spawn")
+        self._conns = []
+        self._processes = []
+        for worker_index in range(self.workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(child_conn, backend, model_name, backend_options, worker_index, self.max_batch_size),
+                name=f"embedding-worker-{worker_index}",
+                daemon=True
+            )
+            process.start()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+        dims = set()
+        for conn in self._conns:
+            status, value = conn.recv()
+            if status != "ready":
+                self.close()
+                raise RuntimeError(value)
+            dims.add(value)
+        self.embedding_size = dims.pop()
+
+        self._shm = shared_memory.SharedMemory(
+            create=True,
+            size=self.workers * self.max_batch_size * self.embedding_size * 4
+        )
+        self._buffer = np.ndarray(
+            (self.workers * self.max_batch_size, self.embedding_size),
+            dtype='float32',
+            buffer=self._shm.buf
+        )
+        for conn in self._conns:
+            conn.send(("attach", self._shm.name, self.workers * self.max_batch_size))
+
+        # Workers that are not encoding a batch right now
+        self._idle = queue.Queue()
+        for worker_index in range(self.workers):
+            self._idle.put(worker_index)
+
+    def _encode_chunk(self, texts: List[str]) -> np.ndarray:
+        worker_index = self._idle.get()
+        try:
+            conn = self._conns[worker_index]
+            conn.send(list(texts))
+            status, value = conn.recv()
+            if status != "ok":
+                raise RuntimeError(f"Embedding worker {worker_index} failed: {value}")
+
+            start = worker_index * self.max_batch_size
+            return self._buffer[start:start + value].copy()
+        finally:
+            self._idle.put(worker_index)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts on the next idle worker, blocking until the vectors are back"""
+        chunks = [
+            self._encode_chunk(texts[i:i + self.max_batch_size])
+            for i in range(0, len(texts), self.max_batch_size)
+        ]
+        if not chunks:
+            return np.empty((0, self.embedding_size), dtype='float32')
+        return np.concatenate(chunks)
+
+    def close(self):
+        """Stop the workers and release the shared buffer"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        if self._shm is not None:
+            del self._buffer
+            self._shm.close()
+            self._shm.unlink()
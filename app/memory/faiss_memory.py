@@ -1,126 +1,708 @@
 import os
-import json
+import logging
 import faiss
 import numpy as np
-from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
 import time
+import threading
+from collections import OrderedDict
+
+from app.memory.memory_store import MemoryStore
+from app.memory.embedding_batcher import EmbeddingBatcher
+from app.memory.embedding_cache import EmbeddingCache
+from app.memory.embedding_pool import EmbeddingProcessPool
+from app.memory.embedding_backends import EmbeddingBackend, load_embedding_backend
+from app.memory.shared_index import SharedAnnIndex, flat_index
+from app.memory.user_memories import UserMemories
+from app.memory.rwlock import ReadWriteLock
+from app.memory.write_behind import WriteBehindQueue
+from app.monitoring.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SECONDS = REGISTRY.histogram(
+    "memory_operation_seconds", "Time spent in FaissMemory operations", ["operation"]
+)
 
 class FaissMemory:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
-        self.embedding_size = self.model.get_sentence_embedding_dimension()
-        self.indices = {}  # User ID -> FAISS index
-        self.memories = {}  # User ID -> list of memories
-        self.memory_dir = os.path.join(os.path.dirname(__file__), "memory_data")
+    """
+    Per-user conversation memory with FAISS similarity search.
+    
+    Safe to call from many threads. Each user has a reader/writer lock:
+    searches and get_recent share it, adds take it exclusively. A shared ANN
+    index has its own reader/writer lock, and ``_lock`` guards the
+    cross-user dicts and counters, held only briefly. Locks are taken in
+    that order (user, index, ``_lock``); evicting other users never waits
+    for their locks.
+    
+    Disk writes go through a write-behind queue, so add() returns once the
+    memory is searchable. Queued writes are flushed together by a background
+    thread, before a shared index rebuild reads the store, and on close().
+    
+    ``embedding_backend`` picks how the model runs (see embedding_backends)
+    and ``embedding_storage="float16"`` halves the size of the memory files
+    and indexes.
+    """
+    
+    # Rough per-record overhead of the Python dict holding a memory
+    RECORD_OVERHEAD_BYTES = 256
+    # Evicted turns listed in an extractive summary, and the characters kept of each
+    SUMMARY_MAX_ITEMS = 20
+    SUMMARY_QUERY_CHARS = 120
+    SUMMARY_RESPONSE_CHARS = 160
+    # Hybrid search: vector and lexical candidates fetched per requested result,
+    # and the share of the best BM25 score a lexical hit needs
+    HYBRID_CANDIDATES_FACTOR = 4
+    LEXICAL_MIN_RELATIVE_SCORE = 0.25
+    
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        segment_max_records: int = 1000,
+        compact_after_segments: int = 8,
+        memory_budget_mb: Optional[float] = None,
+        embedding_batch_size: int = 32,
+        embedding_batch_wait_ms: float = 5.0,
+        embedding_cache_size: int = 10000,
+        index_backend: str = "flat",
+        ann_options: Optional[Dict[str, Any]] = None,
+        embedding_workers: int = 0,
+        memory_dir: Optional[str] = None,
+        write_delay_ms: float = 50.0,
+        max_memories_per_user: Optional[int] = None,
+        retention_keep_recent: int = 20,
+        retention_half_life_hours: float = 168.0,
+        retention_hit_weight: float = 0.5,
+        summarize_evicted: bool = False,
+        summarizer: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+        embedding_backend: Union[str, EmbeddingBackend] = "torch",
+        embedding_backend_options: Optional[Dict[str, str]] = None,
+        embedding_storage: str = "float32",
+        hybrid_search: bool = True,
+        max_distance: Optional[float] = 1.4,
+        rrf_k: int = 60
+    ):
+        # With embedding_workers > 0 the model runs in a pool of worker
+        # processes and never loads in this one
+        self.model = None
+        self.embedding_pool = None
+        if isinstance(embedding_backend, EmbeddingBackend):
+            self.model = embedding_backend
+        elif embedding_workers > 0:
+            self.embedding_pool = EmbeddingProcessPool(
+                model_name,
+                workers=embedding_workers,
+                max_batch_size=embedding_batch_size,
+                backend=embedding_backend,
+                backend_options=embedding_backend_options
+            )
+        else:
+            self.model = load_embedding_backend(embedding_backend, model_name, embedding_backend_options)
+        if self.model is not None:
+            self.embedding_backend = self.model.name
+            self.embedding_size = self.model.embedding_size
+            encode_fn = self.model.encode
+        else:
+            self.embedding_backend = embedding_backend
+            self.embedding_size = self.embedding_pool.embedding_size
+            encode_fn = self.embedding_pool.encode
+        
+        # Concurrent encode calls are coalesced into batched forward passes
+        self.batcher = EmbeddingBatcher(
+            encode_fn,
+            max_batch_size=embedding_batch_size,
+            max_wait_ms=embedding_batch_wait_ms,
+            workers=max(1, embedding_workers) if self.embedding_pool is not None else 1
+        )
+        # Repeated messages reuse their embedding instead of hitting the model
+        self.embedding_cache = EmbeddingCache(max_entries=embedding_cache_size)
+        # Users are loaded on first access and kept in LRU order (coldest first)
+        self.indices = OrderedDict()  # User ID -> FAISS index keyed by memory ID (flat backend only)
+        self.memories = OrderedDict()  # User ID -> UserMemories
+        self.memory_dir = memory_dir or os.path.join(os.path.dirname(__file__), "memory_data")
+        self.embedding_storage = embedding_storage
+        self.embedding_bytes = self.embedding_size * np.dtype(embedding_storage).itemsize
+        
+        # Resident memory budget for loaded users (None means unlimited)
+        self.memory_budget_bytes = (
+            int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        )
+        self.resident_bytes = {}  # User ID -> estimated resident size
+        self._lock = threading.RLock()
+        self._user_locks = {}  # User ID -> ReadWriteLock
+        self._index_lock = ReadWriteLock()
+        self.stats = {
+            "loads": 0, "evictions": 0, "hits": 0, "misses": 0,
+            "memories_evicted": 0, "summaries_created": 0,
+            "search_dropped": 0, "search_lexical_only": 0
+        }
+        
+        # Per-user retention: once a user has more than max_memories_per_user
+        # memories, the lowest scoring ones (by access recency and retrieval
+        # count) are evicted, optionally folded into one summary memory
+        self.max_memories_per_user = max_memories_per_user
+        self.retention_keep_recent = retention_keep_recent
+        self.retention_half_life_hours = retention_half_life_hours
+        self.retention_hit_weight = retention_hit_weight
+        self.summarize_evicted = summarize_evicted
+        self.summarizer = summarizer or self._extractive_summary
+        
+        # Search fuses FAISS and per-user BM25 rankings (reciprocal rank fusion
+        # with constant rrf_k), so exact terms like order numbers or emails are
+        # found even when their embedding is not close. Vector hits farther than
+        # max_distance (squared L2; 1.4 is cosine similarity 0.3 for normalised
+        # embeddings) are dropped rather than padding the results; so are lexical
+        # hits that far away, unless they share an identifier or rare word with
+        # the query (LexicalIndex.distinctive_matches)
+        self.hybrid_search = hybrid_search
+        self.max_distance = max_distance
+        self.rrf_k = rrf_k
         
         # Create memory directory if it doesn't exist
         os.makedirs(self.memory_dir, exist_ok=True)
         
-        # Load existing memories
+        # Append-only storage for records and their embeddings
+        self.store = MemoryStore(
+            self.memory_dir,
+            self.embedding_size,
+            segment_max_records=segment_max_records,
+            compact_after_segments=compact_after_segments,
+            embedding_dtype=embedding_storage
+        )
+        self.writer = WriteBehindQueue(
+            self._write_batch, max_delay_ms=write_delay_ms, thread_name="memory-writer"
+        )
+        
+        # Find existing users; their memories are loaded lazily
+        self.known_users = set()
         self._load_memories()
+        
+        # "flat" keeps one exact index per user; "hnsw" and "ivfpq" share one
+        # approximate index across all users
+        self.index_backend = index_backend
+        self.shared_index = None
+        if index_backend != "flat":
+            self.shared_index = SharedAnnIndex(
+                self.embedding_size,
+                backend=index_backend,
+                storage=embedding_storage,
+                vector_source=self._iter_stored_embeddings,
+                **(ann_options or {})
+            )
+            self.shared_index.rebuild()
     
     def _get_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for text"""
-        return self.model.encode([text])[0]
+        embedding = self.embedding_cache.get(text)
+        if embedding is None:
+            with MEMORY_SECONDS.time(operation="embed"):
+                embedding = self.embedding_cache.put(text, self.batcher.encode(text))
+        return embedding
     
-    def _load_memories(self):
-        """Load memories from disk"""
-        if not os.path.exists(self.memory_dir):
-            return
-            
+    async def aembed(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for text without blocking the event loop
+        
+        The result can be passed to both search() and add() for the same message.
+        """
+        embedding = self.embedding_cache.get(text)
+        if embedding is None:
+            with MEMORY_SECONDS.time(operation="embed"):
+                embedding = self.embedding_cache.put(text, await self.batcher.aencode(text))
+        return embedding
+    
+    def warm_up(self):
+        """Run one encode so the first request doesn't pay for model initialisation"""
+        self.batcher.encode("warm up")
+    
+    def close(self):
+        """Flush queued writes and stop background workers"""
+        self.writer.close()
+        self.batcher.close()
+        if self.embedding_pool is not None:
+            self.embedding_pool.close()
+    
+    def _migrate_json_memories(self):
+        """Move legacy <user_id>.json files into the append-only store"""
         for filename in os.listdir(self.memory_dir):
             if filename.endswith(".json"):
-                user_id = filename.split(".")[0]
+                user_id = filename[:-len(".json")]
                 file_path = os.path.join(self.memory_dir, filename)
                 
                 try:
-                    with open(file_path, "r") as f:
-                        self.memories[user_id] = json.load(f)
-                        
-                    # Create FAISS index for this user
-                    if self.memories[user_id]:
-                        embeddings = np.array([
-                            memory["embedding"] for memory in self.memories[user_id]
-                        ]).astype('float32')
-                        
-                        index = faiss.IndexFlatL2(self.embedding_size)
-                        index.add(embeddings)
-                        self.indices[user_id] = index
+                    count = self.store.migrate_json(user_id, file_path)
+                    logger.info(f"Migrated {count} memories for {user_id} to the memory store")
                 except Exception as e:
-                    print(f"Error loading memories for {user_id}: {str(e)}")
+                    logger.error(f"Error migrating memories for {user_id}: {str(e)}")
+    
+    def _load_memories(self):
+        """Discover users with memories on disk"""
+        if not os.path.exists(self.memory_dir):
+            return
+        
+        self._migrate_json_memories()
+        self.known_users = set(self.store.user_ids())
+    
+    def _iter_stored_embeddings(self):
+        """Yield (user_id, memory IDs, embeddings) for every user in the store"""
+        # Queued adds must be on disk or the rebuilt index would miss them
+        self.writer.flush()
+        for user_id in self.store.user_ids():
+            records, embeddings = self.store.load(user_id)
+            yield user_id, [record["id"] for record in records], embeddings
+    
+    def _new_flat_index(self):
+        return faiss.IndexIDMap2(flat_index(self.embedding_size, self.embedding_storage))
+    
+    def _user_lock(self, user_id: str) -> ReadWriteLock:
+        with self._lock:
+            if user_id not in self._user_locks:
+                self._user_locks[user_id] = ReadWriteLock()
+            return self._user_locks[user_id]
+    
+    # The _index_* helpers expect the user's lock to be held
+    def _index_add(self, user_id: str, ids: List[int], embeddings: np.ndarray):
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32').reshape(len(ids), -1)
+        if self.shared_index is None:
+            self.indices[user_id].add_with_ids(embeddings, np.asarray(ids, dtype='int64'))
+        else:
+            with self._index_lock.write():
+                self.shared_index.add(user_id, ids, embeddings)
+    
+    def _index_remove(self, user_id: str, ids: List[int]):
+        if self.shared_index is None:
+            self.indices[user_id].remove_ids(np.asarray(ids, dtype='int64'))
+        else:
+            with self._index_lock.write():
+                self.shared_index.remove(user_id, ids)
+    
+    def _index_vectors(self, user_id: str, ids: List[int]) -> np.ndarray:
+        if self.shared_index is None:
+            return self.indices[user_id].reconstruct_batch(np.asarray(ids, dtype='int64'))
+        with self._index_lock.read():
+            return self.shared_index.reconstruct(user_id, ids)
+    
+    def _estimate_bytes(self, user_id: str) -> int:
+        """Estimate the resident size of a loaded user's index and records"""
+        index_bytes = 0
+        if user_id in self.indices:
+            index_bytes = self.indices[user_id].ntotal * self.embedding_bytes
+        record_bytes = sum(
+            len(memory.get("query", "")) + len(memory.get("response", "")) + self.RECORD_OVERHEAD_BYTES
+            for memory in self.memories[user_id].values()
+        )
+        return index_bytes + record_bytes
+    
+    def _evict(self, keep_user_id: str):
+        """Evict the coldest users until the resident size fits the budget (called with _lock held)"""
+        if self.memory_budget_bytes is None:
+            return
+        
+        resident = sum(self.resident_bytes.values())
+        for user_id in list(self.memories):
+            if resident <= self.memory_budget_bytes:
+                break
+            # Skip users in use or with writes still queued: their memories
+            # are not all on disk, so dropping them would lose data
+            if user_id == keep_user_id or self.writer.pending(user_id):
+                continue
+            lock = self._user_locks.get(user_id)
+            if lock is not None and not lock.acquire_write(blocking=False):
+                continue
+            try:
+                del self.memories[user_id]
+                self.indices.pop(user_id, None)
+                resident -= self.resident_bytes.pop(user_id, 0)
+                self.stats["evictions"] += 1
+            finally:
+                if lock is not None:
+                    lock.release_write()
     
-    def _save_memories(self, user_id: str):
-        """Save memories to disk"""
-        file_path = os.path.join(self.memory_dir, f"{user_id}.json")
+    def _ensure_loaded(self, user_id: str) -> bool:
+        """
+        Make sure a user's memories and index are resident (called with the user's lock held)
+        
+        Returns:
+            False if the user has no memories yet
+        """
+        with self._lock:
+            if user_id in self.memories:
+                self.memories.move_to_end(user_id)
+                self.stats["hits"] += 1
+                return True
+            
+            if user_id not in self.known_users:
+                return False
+            
+            self.stats["misses"] += 1
         
         try:
-            with open(file_path, "w") as f:
-                json.dump(self.memories[user_id], f)
+            records, embeddings = self.store.load(user_id)
         except Exception as e:
-            print(f"Error saving memories for {user_id}: {str(e)}")
+            logger.error(f"Error loading memories for {user_id}: {str(e)}")
+            return False
+        
+        user = UserMemories()
+        for record in records:
+            user.add({k: v for k, v in record.items() if k != "row"})
+        
+        # Create FAISS index for this user straight from the memory-mapped embeddings
+        index = None
+        if self.shared_index is None:
+            index = self._new_flat_index()
+            if len(records):
+                index.add_with_ids(
+                    np.ascontiguousarray(embeddings, dtype='float32'),
+                    np.array([record["id"] for record in records], dtype='int64')
+                )
+        
+        with self._lock:
+            # Concurrent readers of a cold user may both load it; keep the first
+            if user_id in self.memories:
+                return True
+            self.memories[user_id] = user
+            if index is not None:
+                self.indices[user_id] = index
+            self.stats["loads"] += 1
+            self.resident_bytes[user_id] = self._estimate_bytes(user_id)
+            self._evict(keep_user_id=user_id)
+        return True
     
-    def add(self, user_id: str, query: str, response: str):
-        """Add a new memory"""
-        # Initialize user memories if not exists
-        if user_id not in self.memories:
-            self.memories[user_id] = []
-            self.indices[user_id] = faiss.IndexFlatL2(self.embedding_size)
+    def get_stats(self) -> Dict[str, Any]:
+        """Report cache counters and resident size for sizing the memory budget"""
+        with self._lock:
+            stats = {
+                **self.stats,
+                "loaded_users": len(self.memories),
+                "known_users": len(self.known_users),
+                "resident_bytes": sum(self.resident_bytes.values())
+            }
+        with self._index_lock.read():
+            shared_index = self.shared_index.get_stats() if self.shared_index else None
+        return {
+            **stats,
+            "budget_bytes": self.memory_budget_bytes,
+            "max_memories_per_user": self.max_memories_per_user,
+            "embedding_backend": self.embedding_backend,
+            "embedding_storage": self.embedding_storage,
+            "embedding": self.batcher.get_stats(),
+            "embedding_cache": self.embedding_cache.get_stats(),
+            "index_backend": self.index_backend,
+            "shared_index": shared_index,
+            "writes": self.writer.get_stats()
+        }
+    
+    @MEMORY_SECONDS.time(operation="save")
+    def _write_batch(self, operations: List[tuple]) -> List[tuple]:
+        """
+        Write queued appends and deletes, with one append_many per run of a user's appends
+        
+        Returns:
+            The operations that could not be written, for the write-behind queue
+            to retry: from a user's first failure on, in order
+        """
+        appends = OrderedDict()  # User ID -> queued append operations
+        failed = OrderedDict()  # User ID -> operations not written
         
+        def write_appends(user_id: str):
+            queued = appends.pop(user_id, None)
+            if not queued:
+                return
+            try:
+                self.store.append_many(
+                    user_id,
+                    [memory for _, _, (memory, _) in queued],
+                    np.stack([embedding for _, _, (_, embedding) in queued])
+                )
+            except Exception as e:
+                logger.error(f"Error saving memories for {user_id}: {str(e)}")
+                failed[user_id] = queued
+        
+        for operation in operations:
+            kind, user_id, payload = operation
+            if user_id in failed:
+                failed[user_id].append(operation)
+                continue
+            if kind == "append":
+                appends.setdefault(user_id, []).append(operation)
+                continue
+            # Keep each user's operations in order
+            write_appends(user_id)
+            if user_id in failed:
+                failed[user_id].append(operation)
+                continue
+            try:
+                self.store.delete(user_id, payload)
+            except Exception as e:
+                logger.error(f"Error deleting memories for {user_id}: {str(e)}")
+                failed[user_id] = [operation]
+        
+        for user_id in list(appends):
+            write_appends(user_id)
+        return [operation for queued in failed.values() for operation in queued]
+    
+    def flush(self):
+        """Block until every queued write is on disk"""
+        self.writer.flush()
+    
+    @MEMORY_SECONDS.time(operation="add")
+    def add(
+        self,
+        user_id: str,
+        query: str,
+        response: str,
+        embedding: Optional[np.ndarray] = None
+    ):
+        """Add a new memory, optionally with a precomputed query embedding"""
         # Generate embedding for the query
-        embedding = self._get_embedding(query).tolist()
+        if embedding is None:
+            embedding = self._get_embedding(query)
+        embedding = np.asarray(embedding, dtype='float32').reshape(-1)
+        
+        with self._user_lock(user_id).write():
+            self._add_locked(user_id, query, response, embedding)
+    
+    def _add_locked(self, user_id: str, query: str, response: str, embedding: np.ndarray):
+        # Initialize user memories if not exists
+        if not self._ensure_loaded(user_id):
+            with self._lock:
+                self.memories[user_id] = UserMemories()
+                if self.shared_index is None:
+                    self.indices[user_id] = self._new_flat_index()
+                self.known_users.add(user_id)
+                self.resident_bytes[user_id] = 0
         
         # Create memory object
+        with self._lock:
+            user = self.memories[user_id]
         memory = {
+            "id": user.next_id,
             "query": query,
             "response": response,
-            "embedding": embedding,
             "timestamp": time.time()
         }
         
         # Add to memories
-        self.memories[user_id].append(memory)
+        user.add(memory)
+        
+        # Queue the disk write (before indexing, since a shared index rebuild
+        # flushes the queue and reads the store)
+        self.writer.put("append", user_id, (memory.copy(), embedding))
         
         # Add to FAISS index
-        self.indices[user_id].add(np.array([embedding]).astype('float32'))
+        self._index_add(user_id, [memory["id"]], embedding)
+        
+        retained = False
+        if self.max_memories_per_user and len(user) > self.max_memories_per_user:
+            self._apply_retention(user_id)
+            retained = True
         
-        # Save to disk
-        self._save_memories(user_id)
+        with self._lock:
+            if retained:
+                self.resident_bytes[user_id] = self._estimate_bytes(user_id)
+            else:
+                self.resident_bytes[user_id] += (
+                    self.embedding_bytes + len(query) + len(response) + self.RECORD_OVERHEAD_BYTES
+                )
+            self._evict(keep_user_id=user_id)
     
-    def search(self, query: str, user_id: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Search for relevant memories"""
-        if user_id not in self.memories or not self.memories[user_id]:
-            return []
+    def _retention_scores(self, user: UserMemories, ids: List[int]) -> np.ndarray:
+        """Score memories by access recency and retrieval count; the lowest are evicted first"""
+        usage = np.array([user.usage[memory_id] for memory_id in ids], dtype='float64')
+        age_hours = np.maximum(time.time() - usage[:, 1], 0.0) / 3600.0
+        recency = 0.5 ** (age_hours / self.retention_half_life_hours)
+        frequency = np.log1p(usage[:, 0])
+        if frequency.max() > 0:
+            frequency /= frequency.max()
+        return (1.0 - self.retention_hit_weight) * recency + self.retention_hit_weight * frequency
+    
+    def _extractive_summary(self, memories: List[Dict[str, Any]]) -> str:
+        """List the newest evicted turns, truncated, as bullet points"""
+        lines = []
+        for memory in memories:
+            if memory.get("summary"):
+                # Earlier summaries contribute their bullets rather than nesting
+                lines.extend(memory.get("response", "").splitlines())
+            else:
+                lines.append(
+                    f"- {' '.join(memory.get('query', '').split())[:self.SUMMARY_QUERY_CHARS]}: "
+                    f"{' '.join(memory.get('response', '').split())[:self.SUMMARY_RESPONSE_CHARS]}"
+                )
+        return "\n".join(lines[-self.SUMMARY_MAX_ITEMS:])
+    
+    def _apply_retention(self, user_id: str):
+        """
+        Evict a user's lowest scoring memories once they exceed max_memories_per_user
+        
+        Called with the user's write lock held. Evicts down to about 10% below
+        the cap, so removals from the index are
+        amortised over many adds. The newest retention_keep_recent memories are
+        never evicted. With summarize_evicted, the evicted turns are replaced by
+        one summary memory whose embedding is the mean of theirs.
+        """
+        with self._lock:
+            user = self.memories[user_id]
+        cap = self.max_memories_per_user
+        target = max(0, cap - max(1, cap // 10) - (1 if self.summarize_evicted else 0))
+        protected = set(user.newest_ids(self.retention_keep_recent))
+        candidates = [memory_id for memory_id in user.by_id if memory_id not in protected]
+        count = min(len(user) - target, len(candidates))
+        if count <= 0:
+            return
+        
+        scores = self._retention_scores(user, candidates)
+        evicted_ids = [candidates[i] for i in np.argsort(scores, kind="stable")[:count]]
+        
+        summary = None
+        if self.summarize_evicted and count > 1:
+            evicted = sorted((user.by_id[memory_id] for memory_id in evicted_ids), key=lambda x: x.get("timestamp", 0))
+            vectors = self._index_vectors(user_id, evicted_ids)
+            summary_embedding = vectors.mean(axis=0)
+            norm = np.linalg.norm(summary_embedding)
+            if norm > 0:
+                # Keep the typical length of the originals so L2 distances stay comparable
+                summary_embedding *= np.linalg.norm(vectors, axis=1).mean() / norm
+            summarized_count = sum(memory.get("summarized_count", 1) for memory in evicted)
+            summary = {
+                "id": user.next_id,
+                "query": f"Summary of {summarized_count} earlier conversations",
+                "response": self.summarizer(evicted),
+                "timestamp": evicted[-1].get("timestamp", time.time()),
+                "summary": True,
+                "summarized_count": summarized_count
+            }
+        
+        # The queue writes in order, so the summary is durable before the
+        # originals are deleted and a crash in between leaves both
+        if summary is not None:
+            self.writer.put("append", user_id, (summary.copy(), summary_embedding.astype('float32')))
+        self.writer.put("delete", user_id, evicted_ids)
+        
+        user.remove(evicted_ids)
+        if summary is not None:
+            user.add(summary)
+            self._index_add(user_id, [summary["id"]], summary_embedding)
+        self._index_remove(user_id, evicted_ids)
+        with self._lock:
+            self.stats["memories_evicted"] += count
+            if summary is not None:
+                self.stats["summaries_created"] += 1
+    
+    @MEMORY_SECONDS.time(operation="search")
+    def search(
+        self,
+        query: str,
+        user_id: str,
+        limit: int = 5,
+        embedding: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for relevant memories, optionally with a precomputed query embedding
         
+        Returns up to ``limit`` memories, best first, each with its squared L2
+        ``distance`` to the query; fewer when nothing else is relevant.
+        """
         # Generate embedding for the query
-        query_embedding = self._get_embedding(query).astype('float32').reshape(1, -1)
-        
-        # Search in FAISS index
-        distances, indices = self.indices[user_id].search(query_embedding, limit)
-        
-        # Get the memories
-        results = []
-        for idx in indices[0]:
-            if idx < len(self.memories[user_id]):
-                memory = self.memories[user_id][idx].copy()
-                # Remove embedding from result
-                memory.pop("embedding", None)
+        if embedding is None:
+            embedding = self._get_embedding(query)
+        query_embedding = np.asarray(embedding, dtype='float32').reshape(1, -1)
+        
+        with self._user_lock(user_id).read():
+            if not self._ensure_loaded(user_id):
+                return []
+            with self._lock:
+                user = self.memories[user_id]
+                index = self.indices.get(user_id)
+            if not user:
+                return []
+            
+            # Search in FAISS index, with more candidates when they are fused with lexical hits
+            fetch = limit * self.HYBRID_CANDIDATES_FACTOR if self.hybrid_search else limit
+            if self.shared_index is None:
+                distances, indices = index.search(query_embedding, fetch)
+                hits = zip(indices[0], distances[0])
+            else:
+                with self._index_lock.read():
+                    hits = self.shared_index.search(user_id, query_embedding, fetch)
+            distances = {
+                int(memory_id): float(distance)
+                for memory_id, distance in hits if int(memory_id) in user.by_id
+            }
+            vector_ids = [
+                memory_id for memory_id in distances
+                if self.max_distance is None or distances[memory_id] <= self.max_distance
+            ]
+            dropped = len(distances) - len(vector_ids)
+            
+            if self.hybrid_search:
+                ranked = self._fuse(user, query, vector_ids, fetch)
+                # Lexical-only hits get their real distance, for the cutoff and prompt ranking
+                missing = [memory_id for memory_id in ranked if memory_id not in distances]
+                if missing:
+                    vectors = self._index_vectors(user_id, missing)
+                    for memory_id, vector in zip(missing, vectors):
+                        distances[memory_id] = float(((vector - query_embedding[0]) ** 2).sum())
+                if self.max_distance is not None:
+                    distinctive = user.lexical.distinctive_matches(query)
+                    ranked = [
+                        memory_id for memory_id in ranked
+                        if distances[memory_id] <= self.max_distance or memory_id in distinctive
+                    ]
+                    # Vector hits past the cutoff are counted already
+                    dropped += len(set(missing) - set(ranked))
+                ranked = ranked[:limit]
+            else:
+                ranked = vector_ids[:limit]
+            
+            # Get the memories, counting the retrieval for retention scoring
+            # (concurrent searches may race on the counters, which only skews scores)
+            now = time.time()
+            results = []
+            for memory_id in ranked:
+                user.touch(memory_id, now)
+                memory = user.by_id[memory_id].copy()
+                # Squared L2 distance to the query, used to rank prompt context
+                memory["distance"] = distances[memory_id]
                 results.append(memory)
         
+        with self._lock:
+            self.stats["search_dropped"] += dropped
+            self.stats["search_lexical_only"] += len(set(ranked) - set(vector_ids))
         return results
     
-    def get_recent(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get most recent memories"""
-        if user_id not in self.memories:
-            return []
-        
-        # Sort by timestamp (newest first) and take the top 'limit'
-        recent_memories = sorted(
-            self.memories[user_id], 
-            key=lambda x: x.get("timestamp", 0), 
-            reverse=True
-        )[:limit]
-        
-        # Remove embeddings from results
-        return [{k: v for k, v in memory.items() if k != "embedding"} 
-                for memory in recent_memories]
\ No newline at end of file
+    def _fuse(self, user: UserMemories, query: str, vector_ids: List[int], fetch: int) -> List[int]:
+        """
+        Merge vector and BM25 rankings by reciprocal rank fusion
+        
+        Lexical hits scoring under LEXICAL_MIN_RELATIVE_SCORE of the best one
+        are left out, so a shared common word doesn't pull in unrelated memories.
+        
+        Returns:
+            Memory IDs, best first
+        """
+        lexical = user.lexical.search(query, fetch)
+        if lexical:
+            cutoff = lexical[0][1] * self.LEXICAL_MIN_RELATIVE_SCORE
+            lexical = [memory_id for memory_id, score in lexical if score >= cutoff]
+        
+        scores = {}
+        for ranking in (vector_ids, lexical):
+            for rank, memory_id in enumerate(ranking):
+                scores[memory_id] = scores.get(memory_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        return sorted(scores, key=lambda memory_id: scores[memory_id], reverse=True)
+    
+    def get_recent(
+        self,
+        user_id: str,
+        limit: int = 10,
+        before: Optional[Tuple[float, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get most recent memories, or the next page older than a (timestamp, id) cursor"""
+        with self._user_lock(user_id).read():
+            if not self._ensure_loaded(user_id):
+                return []
+            
+            # Read the newest off the end of the time-ordered timeline
+            with self._lock:
+                user = self.memories[user_id]
+            return [user.by_id[memory_id].copy() for memory_id in user.newest_ids(limit, before)]
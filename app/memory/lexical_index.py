@@ -0,0 +1,131 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Words and compound tokens such as order numbers (ORD-1234), emails and version strings
+TOKEN = re.compile(r"\w+(?:[-@.+/:]\w+)*")
+WORD = re.compile(r"[^\W_]+")
+
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be been before but by can could did do does
+for from had has have he her his how i if in into is it its just me more my no not of on or
+our out she so some than that the their them then there these they this to up us was we were
+what when where which while who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms for lexical matching, without stopwords
+
+    Compound tokens are kept whole and also split into their parts, so
+    "ORD-1234" matches both "ORD-1234" and "1234", and "bob@acme.com"
+    matches "bob@acme.com" and "acme".
+    """
+    terms = []
+    for match in TOKEN.finditer(text.lower()):
+        token = match.group()
+        parts = WORD.findall(token)
+        if parts != [token]:
+            terms.append(token)
+        terms.extend(part for part in parts if part not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over one user's memories, updated incrementally.
+
+    Postings map each term to the memories containing it and the term's
+    count there; document lengths and the total length are kept alongside,
+    so adds and removals are proportional to the memory's own length.
+    """
+
+    # IDF a plain word needs to be distinctive on its own: log(1 + 19.5 / 1.5),
+    # i.e. one memory in 20 has it
+    DISTINCTIVE_MIN_IDF = math.log(14.0)
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # Term -> {memory ID: term frequency}
+        self.lengths = {}  # Memory ID -> number of terms
+        self.terms = {}  # Memory ID -> its distinct terms, to find its postings on removal
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, memory_id: int, text: str):
+        if memory_id in self.lengths:
+            self.remove([memory_id])
+        terms = Counter(tokenize(text))
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[memory_id] = count
+        length = sum(terms.values())
+        self.lengths[memory_id] = length
+        self.total_length += length
+        self.terms[memory_id] = tuple(terms)
+
+    def remove(self, ids: Iterable[int]):
+        for memory_id in ids:
+            length = self.lengths.pop(memory_id, None)
+            if length is None:
+                continue
+            self.total_length -= length
+            for term in self.terms.pop(memory_id, ()):
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(memory_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Rank memories by BM25 score for the query's terms
+
+        Returns:
+            (memory ID, score) pairs, best first
+        """
+        if not self.lengths:
+            return []
+
+        count = len(self.lengths)
+        average_length = self.total_length / count or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for memory_id, frequency in postings.items():
+                norm = self.k1 * (1.0 - self.b + self.b * self.lengths[memory_id] / average_length)
+                scores[memory_id] = scores.get(memory_id, 0.0) + idf * frequency * (self.k1 + 1.0) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def _idf(self, term: str) -> float:
+        count, matches = len(self.lengths), len(self.postings.get(term, ()))
+        return math.log(1.0 + (count - matches + 0.5) / (matches + 0.5))
+
+    def distinctive_matches(self, query: str) -> Set[int]:
+        """
+        Memories sharing a distinctive term with the query: an identifier (a
+        term with a digit, or a compound such as ORD-1234 or an email) or a
+        rare word. Such a match means something even when the embeddings
+        disagree; a shared common word doesn't.
+        """
+        matches = set()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            identifier = any(c.isdigit() for c in term) or WORD.fullmatch(term) is None
+            if identifier or self._idf(term) >= self.DISTINCTIVE_MIN_IDF:
+                matches.update(postings)
+        return matches
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"documents": len(self.lengths), "terms": len(self.postings)}
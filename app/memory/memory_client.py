@@ -0,0 +1,139 @@
+import asyncio
+import itertools
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.memory.memory_protocol import encode_frame, read_frame
+
+
+class MemoryServerError(RuntimeError):
+    """A memory call failed on the memory server"""
+
+
+class MemoryClient:
+    """
+    FaissMemory's interface, served by a MemoryServer over a Unix socket.
+
+    The methods are coroutines. One connection is opened lazily per event
+    loop and multiplexes concurrent calls; it is reopened on the next call
+    if the server goes away.
+    """
+
+    def __init__(self, socket_path: str, connect_timeout: float = 10.0, request_timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._connect_lock = None
+        self._pending = {}  # Request ID -> Future
+        self._ids = itertools.count()
+
+    async def _connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.socket_path), self.connect_timeout
+            )
+            self._read_task = asyncio.create_task(self._read_loop(self._reader, self._writer))
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        error = ConnectionError("Memory server closed the connection")
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                response, blob = frame
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(MemoryServerError(response["error"]))
+                else:
+                    future.set_result((response.get("result"), blob))
+        except Exception as e:
+            error = ConnectionError(f"Memory server connection failed: {str(e)}")
+        finally:
+            # Fail everything still waiting; the next call reconnects
+            writer.close()
+            if self._writer is not writer:
+                return
+            self._writer = None
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    async def _request(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        embedding: Optional[np.ndarray] = None
+    ) -> Tuple[Any, bytes]:
+        await self._connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        blob = np.asarray(embedding, dtype='float32').tobytes() if embedding is not None else b""
+        try:
+            self._writer.write(encode_frame({"id": request_id, "method": method, "params": params}, blob))
+            await self._writer.drain()
+            return await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def aembed(self, text: str) -> np.ndarray:
+        """Embed text with the server's model (and its batching and cache)"""
+        _, blob = await self._request("embed", {"text": text})
+        return np.frombuffer(blob, dtype='float32').copy()
+
+    async def search(
+        self,
+        query: str,
+        user_id: str,
+        limit: int = 5,
+        embedding: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        result, _ = await self._request("search", {"query": query, "user_id": user_id, "limit": limit}, embedding)
+        return result
+
+    async def add(
+        self,
+        user_id: str,
+        query: str,
+        response: str,
+        embedding: Optional[np.ndarray] = None
+    ):
+        await self._request("add", {"user_id": user_id, "query": query, "response": response}, embedding)
+
+    async def get_recent(
+        self,
+        user_id: str,
+        limit: int = 10,
+        before: Optional[Tuple[float, int]] = None
+    ) -> List[Dict[str, Any]]:
+        result, _ = await self._request("get_recent", {"user_id": user_id, "limit": limit, "before": before})
+        return result
+
+    async def put_job(self, job: Dict[str, Any]):
+        """Publish a job's status for other workers to serve"""
+        await self._request("put_job", {"job": job})
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        result, _ = await self._request("get_job", {"job_id": job_id})
+        return result
+
+    async def get_stats(self) -> Dict[str, Any]:
+        result, _ = await self._request("get_stats", {})
+        return result
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            await asyncio.gather(self._read_task, return_exceptions=True)
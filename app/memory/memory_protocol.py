@@ -0,0 +1,32 @@
+import json
+import struct
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+# Frame: big-endian JSON length and blob length, the JSON header, then the blob
+# (raw float32 embedding bytes, or nothing)
+FRAME_HEADER = struct.Struct(">II")
+
+
+def _json_default(value: Any):
+    # numpy scalars in stats and results
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def encode_frame(message: Dict[str, Any], blob: bytes = b"") -> bytes:
+    body = json.dumps(message, default=_json_default).encode()
+    return FRAME_HEADER.pack(len(body), len(blob)) + body + blob
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """Read one frame, or None when the peer has closed the connection"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    body_size, blob_size = FRAME_HEADER.unpack(header)
+    body = await reader.readexactly(body_size)
+    blob = await reader.readexactly(blob_size) if blob_size else b""
+    return json.loads(body), blob
@@ -0,0 +1,246 @@
+"""
+Local memory service: one process owns FaissMemory and serves it over a Unix socket.
+
+Used when the API runs with several worker processes (see main.py), so all
+workers share one set of indexes and one writer of the memory files instead
+of each loading a diverging copy. Workers talk to it with MemoryClient.
+
+    python -m app.memory.memory_server --socket /tmp/assistant-memory.sock
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+from app.memory.faiss_memory import FaissMemory
+from app.memory.memory_protocol import encode_frame, read_frame
+
+
+def memory_from_env() -> FaissMemory:
+    """Build FaissMemory from the environment settings documented in the README"""
+    memory_budget_mb = os.getenv("MEMORY_BUDGET_MB")
+    memory_max_per_user = os.getenv("MEMORY_MAX_PER_USER")
+    embedding_backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    onnx_file = os.getenv("EMBEDDING_ONNX_FILE")
+    max_distance = os.getenv("MEMORY_MAX_DISTANCE", "1.4")
+    return FaissMemory(
+        embedding_backend=embedding_backend,
+        embedding_backend_options={"file_name": onnx_file} if onnx_file and embedding_backend.startswith("onnx") else None,
+        embedding_storage=os.getenv("MEMORY_EMBEDDING_STORAGE", "float32"),
+        memory_budget_mb=float(memory_budget_mb) if memory_budget_mb else None,
+        embedding_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+        embedding_batch_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5")),
+        embedding_cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+        embedding_workers=int(os.getenv("EMBEDDING_WORKERS", "0")),
+        memory_dir=os.getenv("MEMORY_DIR"),
+        write_delay_ms=float(os.getenv("MEMORY_WRITE_DELAY_MS", "50")),
+        max_memories_per_user=int(memory_max_per_user) if memory_max_per_user else None,
+        retention_keep_recent=int(os.getenv("MEMORY_KEEP_RECENT", "20")),
+        retention_half_life_hours=float(os.getenv("MEMORY_RETENTION_HALF_LIFE_HOURS", "168")),
+        retention_hit_weight=float(os.getenv("MEMORY_RETENTION_HIT_WEIGHT", "0.5")),
+        summarize_evicted=os.getenv("MEMORY_SUMMARIZE_EVICTED", "false").lower() in ("1", "true", "yes"),
+        hybrid_search=os.getenv("MEMORY_HYBRID_SEARCH", "true").lower() in ("1", "true", "yes"),
+        max_distance=float(max_distance) if max_distance else None,
+        rrf_k=int(os.getenv("MEMORY_RRF_K", "60")),
+        index_backend=os.getenv("MEMORY_INDEX_BACKEND", "flat"),
+        ann_options={
+            "train_threshold": int(os.getenv("MEMORY_ANN_TRAIN_THRESHOLD", "10000")),
+            "rebuild_factor": float(os.getenv("MEMORY_ANN_REBUILD_FACTOR", "4")),
+            "nprobe": int(os.getenv("MEMORY_ANN_NPROBE", "16")),
+            "ef_search": int(os.getenv("MEMORY_ANN_EF_SEARCH", "128")),
+            "exact_search_max": int(os.getenv("MEMORY_ANN_EXACT_SEARCH_MAX", "4096"))
+        }
+    )
+
+
+class MemoryServer:
+    """
+    Serves FaissMemory calls from MemoryClient connections.
+
+    Each connection can have many requests in flight; responses carry the
+    request's ``id`` and may come back out of order. FaissMemory calls run on
+    a thread pool, since FaissMemory locks per user.
+
+    It also keeps the latest status of calendar jobs published by the API
+    workers, so a poll can be answered by a worker other than the one
+    running the job.
+    """
+
+    # Job statuses only move forward; updates arriving out of order are ignored
+    JOB_STATUS_ORDER = {"queued": 0, "running": 1, "succeeded": 2, "failed": 2}
+
+    def __init__(self, memory: FaissMemory, socket_path: str, workers: int = 4, max_jobs: int = 10000):
+        self.memory = memory
+        self.socket_path = socket_path
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()  # Job ID -> latest published job, oldest first
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memory")
+        self.server = None
+        self.connections = set()
+        self.stats = {"connections": 0, "requests": 0, "errors": 0}
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def _call(self, method: str, params: Dict[str, Any], blob: bytes) -> Tuple[Any, bytes]:
+        """Dispatch one request; returns the JSON result and an optional binary payload"""
+        embedding = np.frombuffer(blob, dtype='float32').copy() if blob else None
+        if method == "embed":
+            vector = await self.memory.aembed(params["text"])
+            return None, np.asarray(vector, dtype='float32').tobytes()
+        if method == "search":
+            return await self._run(
+                self.memory.search, params["query"], params["user_id"], params["limit"], embedding=embedding
+            ), b""
+        if method == "add":
+            await self._run(
+                self.memory.add, params["user_id"], params["query"], params["response"], embedding=embedding
+            )
+            return None, b""
+        if method == "get_recent":
+            before = params.get("before")
+            return await self._run(
+                self.memory.get_recent, params["user_id"], params["limit"], tuple(before) if before else None
+            ), b""
+        if method == "put_job":
+            self._put_job(params["job"])
+            return None, b""
+        if method == "get_job":
+            return self.jobs.get(params["job_id"]), b""
+        if method == "get_stats":
+            stats = await self._run(self.memory.get_stats)
+            return {**stats, "server": {**self.stats, "jobs": len(self.jobs)}}, b""
+        raise ValueError(f"Unknown memory method: {method}")
+
+    def _put_job(self, job: Dict[str, Any]):
+        current = self.jobs.get(job["job_id"])
+        if current is not None and (
+            self.JOB_STATUS_ORDER[current["status"]] > self.JOB_STATUS_ORDER[job["status"]]
+        ):
+            return
+        self.jobs[job["job_id"]] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+
+    async def _respond(self, request: Dict[str, Any], blob: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        self.stats["requests"] += 1
+        try:
+            result, payload = await self._call(request["method"], request.get("params", {}), blob)
+            frame = encode_frame({"id": request["id"], "result": result}, payload)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Error serving memory {request.get('method')}: {str(e)}")
+            frame = encode_frame({"id": request["id"], "error": f"{type(e).__name__}: {str(e)}"})
+
+        async with lock:
+            writer.write(frame)
+            await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        self.connections.add(writer)
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                task = asyncio.create_task(self._respond(*frame, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def serve(self, stop: Optional[asyncio.Event] = None):
+        """Serve until ``stop`` is set (or forever)"""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        print(f"Memory server listening on {self.socket_path}")
+        try:
+            await (stop.wait() if stop is not None else asyncio.Event().wait())
+        finally:
+            self.server.close()
+            for writer in list(self.connections):
+                writer.close()
+            await self.server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def close(self):
+        """Finish in-flight calls, then flush memory writes"""
+        self.executor.shutdown(wait=True)
+        self.memory.close()
+
+
+def wait_for_socket(socket_path: str, process: subprocess.Popen, timeout: float):
+    """Block until a server accepts connections on socket_path"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Memory server exited during startup with code {process.returncode}")
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+                return
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Memory server did not start within {timeout:.0f}s")
+
+
+def spawn(socket_path: str, env: Optional[Dict[str, str]] = None, timeout: float = 300.0, log_file=None) -> subprocess.Popen:
+    """Start a memory server in a subprocess and wait until it is ready"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.memory.memory_server", "--socket", socket_path],
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT if log_file else None
+    )
+    wait_for_socket(socket_path, process, timeout)
+    return process
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve FaissMemory over a Unix socket")
+    parser.add_argument("--socket", default=os.getenv("MEMORY_SERVER_SOCKET", "/tmp/assistant-memory.sock"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MEMORY_WORKERS", "4")))
+    args = parser.parse_args()
+
+    memory = memory_from_env()
+    memory.warm_up()
+    server = MemoryServer(memory, args.socket, workers=args.workers)
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        await server.serve(stop)
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import functools
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# User IDs that are used as directory names as they are
+SAFE_USER_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def _fsync_dir(path: str):
+    """Flush a directory entry so renames and new files survive a crash"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_durable(path: str, data: bytes):
+    """Write a file under a temporary name, fsync it and rename it into place"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _truncate(path: str, size: int):
+    """Cut a file back to size and fsync it (nothing to do if it doesn't exist)"""
+    if os.path.exists(path):
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            os.fsync(f.fileno())
+
+
+def _complete_length(path: str) -> int:
+    """Length of a segment up to and including its last newline"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return data.rfind(b"\n") + 1
+
+
+def _synchronized(method):
+    """Serialise a MemoryStore method with the store's lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class MemoryStore:
+    """
+    Append-only on-disk storage for user memories.
+
+    Every user gets a directory under ``base_dir`` holding one generation of files:
+      - ``CURRENT``: the live generation number
+      - ``segment_<gen>_<n>.jsonl``: memory records (without embeddings), one JSON object per line
+      - ``embeddings_<gen>.f32`` (or ``.f16``): raw float32 (or float16) embeddings, one row of
+        ``embedding_size`` per record
+
+    Each record stores the ``row`` of its embedding and a stable ``id``
+    (records written before IDs existed use their row). Deleting appends a
+    ``{"deleted": [ids]}`` tombstone line; deleted records are skipped on
+    load and dropped by the next compaction. Embeddings are fsynced
+    before the record that points at them, so a torn last line or a
+    half-written embedding row is all a crash can leave behind; both are
+    ignored on load and cut off before the next append. An append that
+    fails partway is rolled back to the files' previous lengths. Compaction writes a complete new generation and switches
+    ``CURRENT`` atomically before deleting the old files.
+
+    Embeddings are written in ``embedding_dtype`` and always loaded as
+    float32. Files from an earlier setting are still read, and a user's
+    files are converted by a compaction before the next write to them.
+
+    Public methods are serialised by one lock, so loads never see a
+    compaction half done.
+
+    A user's files live in a directory named after the user ID when it is
+    made of letters, digits, ``_`` and ``-`` only. Any other ID (empty,
+    ``..``, containing ``/``) gets a directory named ``~`` plus its sha256,
+    with the ID itself recorded in a ``USER_ID`` file there, so no ID can
+    reach outside ``base_dir``.
+    """
+
+    CURRENT_FILE = "CURRENT"
+    USER_ID_FILE = "USER_ID"
+    HASHED_PREFIX = "~"
+    # Embedding dtype -> file extension
+    EMBEDDING_EXTENSIONS = {"float32": "f32", "float16": "f16"}
+
+    def __init__(
+        self,
+        base_dir: str,
+        embedding_size: int,
+        segment_max_records: int = 1000,
+        compact_after_segments: int = 8,
+        compact_deleted_fraction: float = 0.5,
+        embedding_dtype: str = "float32"
+    ):
+        if embedding_dtype not in self.EMBEDDING_EXTENSIONS:
+            raise ValueError(f"Unsupported embedding dtype: {embedding_dtype}")
+
+        self.base_dir = base_dir
+        self.embedding_size = embedding_size
+        self.segment_max_records = segment_max_records
+        self.compact_after_segments = compact_after_segments
+        self.compact_deleted_fraction = compact_deleted_fraction
+        self.embedding_dtype = np.dtype(embedding_dtype)
+        self.row_bytes = embedding_size * self.embedding_dtype.itemsize
+        self._lock = threading.RLock()
+        self._state = {}  # User ID -> {"generation", "segment", "count", "rows", "segments", "deleted"}
+
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def _user_dir(self, user_id: str) -> str:
+        if SAFE_USER_ID.fullmatch(user_id):
+            return os.path.join(self.base_dir, user_id)
+        digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.base_dir, self.HASHED_PREFIX + digest)
+
+    def _create_user_dir(self, user_id: str) -> str:
+        """Create a user's directory, recording the user ID if the name is a hash"""
+        user_dir = self._user_dir(user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        if os.path.basename(user_dir).startswith(self.HASHED_PREFIX):
+            id_path = os.path.join(user_dir, self.USER_ID_FILE)
+            if not os.path.exists(id_path):
+                _write_durable(id_path, user_id.encode("utf-8"))
+                _fsync_dir(user_dir)
+        return user_dir
+
+    def _segment_path(self, user_id: str, generation: int, segment: int) -> str:
+        return os.path.join(self._user_dir(user_id), f"segment_{generation}_{segment:06d}.jsonl")
+
+    def _embeddings_path(self, user_id: str, generation: int, dtype: Optional[np.dtype] = None) -> str:
+        extension = self.EMBEDDING_EXTENSIONS[(dtype or self.embedding_dtype).name]
+        return os.path.join(self._user_dir(user_id), f"embeddings_{generation}.{extension}")
+
+    def _stored_dtype(self, user_id: str, generation: int) -> np.dtype:
+        """The dtype a generation's embeddings were written in (the configured one if there are none)"""
+        for name in self.EMBEDDING_EXTENSIONS:
+            if os.path.exists(self._embeddings_path(user_id, generation, np.dtype(name))):
+                return np.dtype(name)
+        return self.embedding_dtype
+
+    def _generation(self, user_id: str) -> int:
+        """Read the live generation for a user (-1 if the user has none)"""
+        path = os.path.join(self._user_dir(user_id), self.CURRENT_FILE)
+        if not os.path.exists(path):
+            return -1
+        with open(path, "r") as f:
+            return int(f.read().strip())
+
+    def _set_generation(self, user_id: str, generation: int):
+        user_dir = self._user_dir(user_id)
+        _write_durable(os.path.join(user_dir, self.CURRENT_FILE), str(generation).encode())
+        _fsync_dir(user_dir)
+
+    def _segments(self, user_id: str, generation: int) -> List[int]:
+        """List segment numbers of a generation in ascending order"""
+        prefix = f"segment_{generation}_"
+        segments = []
+        for filename in os.listdir(self._user_dir(user_id)):
+            if filename.startswith(prefix) and filename.endswith(".jsonl"):
+                segments.append(int(filename[len(prefix):-len(".jsonl")]))
+        return sorted(segments)
+
+    def _embedding_rows(self, user_id: str, generation: int) -> int:
+        """Number of complete embedding rows in a generation"""
+        dtype = self._stored_dtype(user_id, generation)
+        path = self._embeddings_path(user_id, generation, dtype)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (self.embedding_size * dtype.itemsize)
+
+    def _remove_stale(self, user_id: str, generation: int):
+        """Delete files left over from other generations or interrupted writes"""
+        user_dir = self._user_dir(user_id)
+        live = (f"segment_{generation}_", f"embeddings_{generation}.")
+        for filename in os.listdir(user_dir):
+            if filename in (self.CURRENT_FILE, self.USER_ID_FILE):
+                continue
+            if filename.endswith(".tmp") or not filename.startswith(live):
+                os.remove(os.path.join(user_dir, filename))
+
+    def _get_state(self, user_id: str) -> Dict[str, int]:
+        """Work out where the next append goes for a user"""
+        if user_id in self._state:
+            return self._state[user_id]
+
+        user_dir = self._user_dir(user_id)
+        generation = self._generation(user_id)
+        if generation < 0:
+            self._create_user_dir(user_id)
+            generation = 0
+            self._set_generation(user_id, generation)
+            _fsync_dir(self.base_dir)
+        elif self._stored_dtype(user_id, generation) != self.embedding_dtype:
+            # Convert files written with another embedding_dtype before appending to them
+            self.compact(user_id)
+            return self._state[user_id]
+
+        segments = self._segments(user_id, generation)
+        segment = segments[-1] if segments else 0
+        count = 0
+        if segments:
+            segment_path = self._segment_path(user_id, generation, segment)
+            complete = _complete_length(segment_path)
+            if complete != os.path.getsize(segment_path):
+                # Drop a torn last line so the next record doesn't start on the same line
+                _truncate(segment_path, complete)
+            with open(segment_path, "rb") as f:
+                count = sum(1 for _ in f)
+
+        rows = self._embedding_rows(user_id, generation)
+        path = self._embeddings_path(user_id, generation)
+        if os.path.exists(path) and os.path.getsize(path) != rows * self.row_bytes:
+            # Drop a partially written trailing row before appending after it
+            _truncate(path, rows * self.row_bytes)
+
+        self._state[user_id] = {
+            "generation": generation,
+            "segment": segment,
+            "count": count,
+            "rows": rows,
+            "segments": max(len(segments), 1),
+            # Deleted rows since the last compaction (not counting tombstones from before a restart)
+            "deleted": 0
+        }
+        return self._state[user_id]
+
+    @_synchronized
+    def user_ids(self) -> List[str]:
+        """List users that have stored memories"""
+        user_ids = []
+        for name in os.listdir(self.base_dir):
+            user_dir = os.path.join(self.base_dir, name)
+            if not os.path.exists(os.path.join(user_dir, self.CURRENT_FILE)):
+                continue
+            if name.startswith(self.HASHED_PREFIX):
+                try:
+                    with open(os.path.join(user_dir, self.USER_ID_FILE), "rb") as f:
+                        name = f.read().decode("utf-8")
+                except OSError as e:
+                    logger.warning(f"Skipping memory directory {name} without a readable user ID: {str(e)}")
+                    continue
+            user_ids.append(name)
+        return user_ids
+
+    def append(self, user_id: str, memory: Dict[str, Any], embedding: np.ndarray):
+        """Durably append one memory record and its embedding"""
+        self.append_many(user_id, [memory], np.asarray(embedding, dtype='float32').reshape(1, -1))
+
+    def _rollback(self, user_id: str, lengths: Dict[str, int]):
+        """
+        Undo a failed write: cut the files it touched back to their previous
+        lengths and forget the cached state, which the failed write may have
+        advanced, so the next call works it out from disk again
+        """
+        self._state.pop(user_id, None)
+        for path, length in lengths.items():
+            try:
+                _truncate(path, length)
+            except OSError:
+                # Recovery on the next _get_state cuts torn rows and lines instead
+                logger.exception(f"Error rolling back {path}")
+
+    @staticmethod
+    def _remember_length(lengths: Dict[str, int], path: str):
+        if path not in lengths:
+            lengths[path] = os.path.getsize(path) if os.path.exists(path) else 0
+
+    @_synchronized
+    def append_many(self, user_id: str, memories: List[Dict[str, Any]], embeddings: np.ndarray):
+        """Durably append memory records and their embeddings, with one fsync per file touched"""
+        if not memories:
+            return
+
+        state = self._get_state(user_id)
+        generation = state["generation"]
+        lengths = {}  # Path -> length before this append, to roll back to on failure
+
+        try:
+            # Write the embeddings first so a record never points past the end of the file
+            vectors = np.ascontiguousarray(embeddings, dtype=self.embedding_dtype).reshape(len(memories), self.embedding_size)
+            embeddings_path = self._embeddings_path(user_id, generation)
+            self._remember_length(lengths, embeddings_path)
+            with open(embeddings_path, "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            created_segment = False
+            rows, segment, count, segments = state["rows"], state["segment"], state["count"], state["segments"]
+            position = 0
+            while position < len(memories):
+                # Rotate to a new segment once the current one is full
+                if count >= self.segment_max_records:
+                    segment += 1
+                    count = 0
+                    segments += 1
+
+                segment_path = self._segment_path(user_id, generation, segment)
+                created_segment = created_segment or not os.path.exists(segment_path)
+                self._remember_length(lengths, segment_path)
+
+                take = min(len(memories) - position, self.segment_max_records - count)
+                lines = []
+                for offset, memory in enumerate(memories[position:position + take]):
+                    record = dict(memory)
+                    record["row"] = rows + offset
+                    lines.append(json.dumps(record) + "\n")
+                with open(segment_path, "a") as f:
+                    f.write("".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                rows += take
+                count += take
+                position += take
+
+            if created_segment:
+                _fsync_dir(self._user_dir(user_id))
+        except BaseException:
+            self._rollback(user_id, lengths)
+            raise
+
+        state.update(rows=rows, segment=segment, count=count, segments=segments)
+
+        if state["segments"] > self.compact_after_segments:
+            self.compact(user_id)
+
+    @_synchronized
+    def delete(self, user_id: str, ids: List[int]):
+        """Durably delete memory records by ID with a tombstone line"""
+        if not ids:
+            return
+
+        state = self._get_state(user_id)
+        if state["count"] >= self.segment_max_records:
+            state["segment"] += 1
+            state["count"] = 0
+            state["segments"] += 1
+
+        segment_path = self._segment_path(user_id, state["generation"], state["segment"])
+        created_segment = not os.path.exists(segment_path)
+        lengths = {}
+        self._remember_length(lengths, segment_path)
+        try:
+            with open(segment_path, "a") as f:
+                f.write(json.dumps({"deleted": [int(memory_id) for memory_id in ids]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if created_segment:
+                _fsync_dir(self._user_dir(user_id))
+        except BaseException:
+            self._rollback(user_id, lengths)
+            raise
+
+        state["count"] += 1
+        state["deleted"] += len(ids)
+        # Reclaim the space once deleted rows make up enough of the file
+        if (state["segments"] > self.compact_after_segments
+                or state["deleted"] >= state["rows"] * self.compact_deleted_fraction):
+            self.compact(user_id)
+
+    def _read_records(self, user_id: str, generation: int, rows: int) -> List[Dict[str, Any]]:
+        """Read all valid, undeleted records of a generation in append order"""
+        records = []
+        deleted = set()
+        for segment in self._segments(user_id, generation):
+            with open(self._segment_path(user_id, generation, segment), "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write at the end of a segment
+                        logger.warning(f"Skipping corrupt memory record for {user_id} in segment {segment}")
+                        continue
+                    if "deleted" in record:
+                        deleted.update(record["deleted"])
+                    elif 0 <= record.get("row", -1) < rows:
+                        record.setdefault("id", record["row"])
+                        records.append(record)
+        if deleted:
+            records = [record for record in records if record["id"] not in deleted]
+        return records
+
+    @_synchronized
+    def load(self, user_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        Load a user's memories
+
+        Returns:
+            The memory records (with their ``row`` and ``id``) and a float32 array of their
+            embeddings in the same order. The array is memory-mapped when the
+            embeddings are stored as float32 and the records map onto the
+            embedding file one-to-one.
+        """
+        generation = self._generation(user_id)
+        rows = self._embedding_rows(user_id, generation) if generation >= 0 else 0
+        if rows == 0:
+            return [], np.empty((0, self.embedding_size), dtype='float32')
+
+        records = self._read_records(user_id, generation, rows)
+        dtype = self._stored_dtype(user_id, generation)
+        embeddings = np.memmap(
+            self._embeddings_path(user_id, generation, dtype),
+            dtype=dtype,
+            mode='r',
+            shape=(rows, self.embedding_size)
+        )
+        record_rows = [record["row"] for record in records]
+        if record_rows == list(range(len(records))):
+            embeddings = embeddings[:len(records)]
+        else:
+            embeddings = embeddings[record_rows]
+        return records, np.asarray(embeddings, dtype='float32')
+
+    def _write_generation(self, user_id: str, records: List[Dict[str, Any]], embeddings: np.ndarray):
+        """Write records and embeddings as a fresh generation and make it live"""
+        generation = self._generation(user_id) + 1
+        embeddings = np.ascontiguousarray(embeddings, dtype=self.embedding_dtype)
+
+        _write_durable(self._embeddings_path(user_id, generation), embeddings.tobytes())
+
+        lines = []
+        for row, record in enumerate(records):
+            record = dict(record)
+            record["row"] = row
+            lines.append(json.dumps(record) + "\n")
+        _write_durable(self._segment_path(user_id, generation, 0), "".join(lines).encode())
+
+        # Switching CURRENT is the commit point
+        _fsync_dir(self._user_dir(user_id))
+        self._set_generation(user_id, generation)
+        self._remove_stale(user_id, generation)
+
+        self._state[user_id] = {
+            "generation": generation,
+            "segment": 0,
+            "count": len(records),
+            "rows": len(records),
+            "segments": 1,
+            "deleted": 0
+        }
+
+    @_synchronized
+    def compact(self, user_id: str):
+        """Rewrite a user's segments and embeddings into a single dense generation"""
+        records, embeddings = self.load(user_id)
+        self._write_generation(user_id, records, np.array(embeddings))
+
+    @_synchronized
+    def migrate_json(self, user_id: str, json_path: str) -> int:
+        """
+        One-shot migration of a legacy ``<user_id>.json`` memory file
+
+        The JSON file is renamed to ``<user_id>.json.migrated`` once its records
+        are live in the store, so it is never imported twice.
+
+        Returns:
+            The number of migrated records
+        """
+        if self._generation(user_id) >= 0:
+            # A previous migration committed but crashed before the rename
+            os.replace(json_path, json_path + ".migrated")
+            return 0
+
+        with open(json_path, "r") as f:
+            legacy_memories = json.load(f)
+
+        self._create_user_dir(user_id)
+        records = [
+            {k: v for k, v in memory.items() if k != "embedding"}
+            for memory in legacy_memories
+        ]
+        embeddings = np.array(
+            [memory["embedding"] for memory in legacy_memories], dtype='float32'
+        ).reshape(-1, self.embedding_size)
+        self._write_generation(user_id, records, embeddings)
+        _fsync_dir(self.base_dir)
+
+        os.replace(json_path, json_path + ".migrated")
+        _fsync_dir(os.path.dirname(json_path))
+        return len(records)
@@ -0,0 +1,247 @@
+import faiss
+import numpy as np
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+
+def flat_index(embedding_size: int, storage: str = "float32") -> faiss.Index:
+    """An exact L2 index storing float32 vectors, or float16 ones at half the size"""
+    if storage == "float16":
+        return faiss.IndexScalarQuantizer(embedding_size, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    return faiss.IndexFlatL2(embedding_size)
+
+
+class SharedAnnIndex:
+    """
+    One approximate nearest neighbour index shared by all users.
+
+    Vector IDs pack a per-user slot into the high 32 bits and the memory's
+    ID (unique per user) into the low 32 bits, so all of a user's vectors
+    form one contiguous ID range and searches are filtered with an
+    ``IDSelectorRange`` instead of a per-query ID list.
+
+    Filtered ANN search recalls poorly when a user owns a tiny fraction of
+    the index, so users with at most ``exact_search_max`` vectors are instead
+    brute-forced over their vectors as reconstructed from the index. That is
+    exact for the flat and HNSW indexes (up to float16 rounding); once IVF-PQ
+    is trained it ranks the PQ-approximated vectors, though every one of the
+    user's vectors is still compared.
+
+    Backends:
+      - ``hnsw``: ``IndexHNSWFlat`` wrapped in an ``IndexIDMap2``; no training.
+      - ``ivfpq``: ``IndexIVFPQ``; vectors are kept in an exact staging index
+        until ``train_threshold`` vectors exist, then the index is trained.
+        It is retrained from ``vector_source`` whenever it has grown by
+        ``rebuild_factor`` since the last training.
+
+    With ``storage="float16"`` the HNSW and staging indexes keep vectors as
+    float16, halving their RAM (IVF-PQ already stores compact PQ codes).
+
+    Removed vectors are deleted from the flat and IVF-PQ indexes. HNSW
+    graphs can't delete, so removed HNSW vectors are filtered out of
+    results and the index is rebuilt once they make up half of it.
+    """
+
+    POSITION_BITS = 32
+
+    def __init__(
+        self,
+        embedding_size: int,
+        backend: str = "hnsw",
+        train_threshold: int = 10000,
+        rebuild_factor: float = 4.0,
+        nlist: int = 1024,
+        pq_m: int = 48,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_search: int = 128,
+        exact_search_max: int = 4096,
+        storage: str = "float32",
+        vector_source: Optional[Callable[[], Iterable[Tuple[str, np.ndarray, np.ndarray]]]] = None
+    ):
+        if backend not in ("hnsw", "ivfpq"):
+            raise ValueError(f"Unknown shared index backend: {backend}")
+        if storage not in ("float32", "float16"):
+            raise ValueError(f"Unsupported index storage: {storage}")
+
+        self.embedding_size = embedding_size
+        self.backend = backend
+        self.train_threshold = train_threshold
+        self.rebuild_factor = rebuild_factor
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.exact_search_max = exact_search_max
+        self.storage = storage
+        self.vector_source = vector_source
+
+        self.user_slots = {}  # User ID -> slot in the high ID bits
+        self.user_members = {}  # User ID -> live memory IDs, in insertion order
+        self.deleted = set()  # Vector IDs removed from HNSW but still in the graph
+        self.trained_size = 0
+        self.rebuilds = 0
+        self.index = self._new_index()
+
+    def _new_index(self, training_vectors: Optional[np.ndarray] = None):
+        """Create an empty index, training it when IVF-PQ has enough data"""
+        if self.backend == "hnsw":
+            if self.storage == "float16":
+                hnsw = faiss.IndexHNSWSQ(self.embedding_size, faiss.ScalarQuantizer.QT_fp16, self.hnsw_m)
+            else:
+                hnsw = faiss.IndexHNSWFlat(self.embedding_size, self.hnsw_m)
+            hnsw.hnsw.efSearch = self.ef_search
+            return faiss.IndexIDMap2(hnsw)
+
+        if training_vectors is None or len(training_vectors) < self.train_threshold:
+            # Exact staging index until there is enough data to train on
+            return faiss.IndexIDMap2(flat_index(self.embedding_size, self.storage))
+
+        # Keep at least ~39 training points per list and per PQ centroid, as FAISS recommends
+        nlist = max(1, min(self.nlist, len(training_vectors) // 39))
+        pq_bits = int(min(8, max(4, np.log2(max(len(training_vectors), 1) / 39))))
+        quantizer = faiss.IndexFlatL2(self.embedding_size)
+        index = faiss.IndexIVFPQ(quantizer, self.embedding_size, nlist, self.pq_m, pq_bits)
+        index.train(np.ascontiguousarray(training_vectors, dtype='float32'))
+        index.nprobe = self.nprobe
+        # Allow reconstruct() by ID for exact scans of small users
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        self.trained_size = len(training_vectors)
+        return index
+
+    @property
+    def is_trained_ann(self) -> bool:
+        return self.backend == "hnsw" or isinstance(self.index, faiss.IndexIVFPQ)
+
+    def _slot(self, user_id: str) -> int:
+        if user_id not in self.user_slots:
+            self.user_slots[user_id] = len(self.user_slots)
+        return self.user_slots[user_id]
+
+    def _ids(self, user_id: str, memory_ids) -> np.ndarray:
+        memory_ids = np.asarray(memory_ids, dtype='int64')
+        return (np.int64(self._slot(user_id)) << self.POSITION_BITS) + memory_ids
+
+    def add(self, user_id: str, memory_ids, embeddings: np.ndarray):
+        """Add a user's embeddings under the given memory IDs"""
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32').reshape(-1, self.embedding_size)
+        if not len(embeddings):
+            return
+
+        vector_ids = self._ids(user_id, memory_ids)
+        self.deleted.difference_update(vector_ids.tolist())
+        self.index.add_with_ids(embeddings, vector_ids)
+        self.user_members.setdefault(user_id, []).extend(int(memory_id) for memory_id in memory_ids)
+        self._maybe_rebuild()
+
+    def remove(self, user_id: str, memory_ids):
+        """Remove a user's vectors by memory ID"""
+        if user_id not in self.user_members or not len(memory_ids):
+            return
+
+        removed = {int(memory_id) for memory_id in memory_ids}
+        self.user_members[user_id] = [
+            memory_id for memory_id in self.user_members[user_id] if memory_id not in removed
+        ]
+        vector_ids = self._ids(user_id, sorted(removed))
+        if self.backend == "hnsw":
+            self.deleted.update(vector_ids.tolist())
+            if self.vector_source is not None and len(self.deleted) * 2 >= self.index.ntotal:
+                self.rebuild()
+        else:
+            # IVF-PQ's hashtable direct map only removes through an ID array
+            self.index.remove_ids(faiss.IDSelectorArray(vector_ids))
+
+    def _maybe_rebuild(self):
+        if self.backend != "ivfpq" or self.vector_source is None:
+            return
+
+        if not self.is_trained_ann:
+            if self.index.ntotal >= self.train_threshold:
+                self.rebuild()
+        elif self.index.ntotal >= self.trained_size * self.rebuild_factor:
+            self.rebuild()
+
+    def rebuild(self):
+        """Retrain (IVF-PQ) or rebuild the index from the vector source"""
+        users = []
+        for user_id, memory_ids, embeddings in self.vector_source():
+            users.append((user_id, np.asarray(memory_ids, dtype='int64'), np.asarray(embeddings, dtype='float32')))
+
+        matrices = [embeddings for _, _, embeddings in users if len(embeddings)]
+        training_vectors = (
+            np.concatenate(matrices) if matrices
+            else np.empty((0, self.embedding_size), dtype='float32')
+        )
+
+        self.index = self._new_index(training_vectors)
+        self.user_members = {}
+        self.deleted = set()
+        for user_id, memory_ids, embeddings in users:
+            self.user_members[user_id] = memory_ids.tolist()
+            if len(embeddings):
+                self.index.add_with_ids(
+                    np.ascontiguousarray(embeddings, dtype='float32'),
+                    self._ids(user_id, memory_ids)
+                )
+        self.rebuilds += 1
+
+    def search(self, user_id: str, embedding: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        """
+        Search one user's vectors
+
+        Returns:
+            (memory ID, distance) pairs, nearest first
+        """
+        members = self.user_members.get(user_id)
+        if not members:
+            return []
+
+        query = np.asarray(embedding, dtype='float32').reshape(1, -1)
+        if len(members) <= self.exact_search_max:
+            return self._exact_search(user_id, members, query, limit)
+
+        slot = self.user_slots[user_id]
+        selector = faiss.IDSelectorRange(
+            slot << self.POSITION_BITS, (slot + 1) << self.POSITION_BITS
+        )
+        if isinstance(self.index, faiss.IndexIVFPQ):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        elif self.backend == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+
+        # Over-fetch when removed HNSW vectors may take some of the places
+        fetch = limit * 2 if self.deleted else limit
+        distances, ids = self.index.search(query, fetch, params=params)
+
+        mask = (1 << self.POSITION_BITS) - 1
+        return [
+            (int(vector_id) & mask, float(distance))
+            for vector_id, distance in zip(ids[0], distances[0])
+            if vector_id >= 0 and int(vector_id) not in self.deleted
+        ][:limit]
+
+    def _exact_search(self, user_id: str, members: List[int], query: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        """Brute-force a small user's vectors as reconstructed from the shared index (approximate for IVF-PQ)"""
+        vectors = self.index.reconstruct_batch(self._ids(user_id, members))
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        nearest = np.argsort(distances)[:limit]
+        return [(members[position], float(distances[position])) for position in nearest]
+
+    def reconstruct(self, user_id: str, memory_ids) -> np.ndarray:
+        """Get stored vectors by memory ID (approximate for IVF-PQ)"""
+        return self.index.reconstruct_batch(self._ids(user_id, memory_ids))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "storage": self.storage,
+            "trained": self.is_trained_ann,
+            "vectors": self.index.ntotal,
+            "users": len(self.user_slots),
+            "deleted_pending": len(self.deleted),
+            "trained_size": self.trained_size,
+            "rebuilds": self.rebuilds
+        }
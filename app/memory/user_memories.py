@@ -0,0 +1,80 @@
+import bisect
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from app.memory.lexical_index import LexicalIndex
+
+
+class UserMemories:
+    """
+    One user's resident memories, by ID and in time order.
+
+    ``timeline`` holds (timestamp, id) pairs oldest first, so the newest
+    memories are read off its end instead of sorting the whole history.
+    Removed memories are dropped from ``timeline`` lazily and the list is
+    compacted once they outnumber the live ones.
+
+    ``usage`` tracks how often and how recently each memory was retrieved,
+    for retention scoring. It lives only in memory and starts from the
+    memory's own timestamp when a user is loaded.
+
+    ``lexical`` is a BM25 index of each memory's query and response, kept in
+    step with adds and removals.
+    """
+
+    def __init__(self):
+        self.by_id = {}  # Memory ID -> record
+        self.usage = {}  # Memory ID -> [hits, last accessed]
+        self.timeline = []  # (timestamp, memory ID), oldest first
+        self.stale = 0  # Timeline entries whose memory was removed
+        self.next_id = 0
+        self.lexical = LexicalIndex()
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def values(self) -> Iterable[Dict[str, Any]]:
+        return self.by_id.values()
+
+    def add(self, memory: Dict[str, Any]):
+        """Add a record that already carries its ``id``"""
+        memory_id = memory["id"]
+        timestamp = memory.get("timestamp", 0)
+        self.by_id[memory_id] = memory
+        self.usage[memory_id] = [0, timestamp]
+        self.next_id = max(self.next_id, memory_id + 1)
+        self.lexical.add(memory_id, f"{memory.get('query', '')}\n{memory.get('response', '')}")
+
+        entry = (timestamp, memory_id)
+        if not self.timeline or entry >= self.timeline[-1]:
+            self.timeline.append(entry)
+        else:
+            bisect.insort(self.timeline, entry)
+
+    def remove(self, ids: Iterable[int]):
+        for memory_id in ids:
+            if self.by_id.pop(memory_id, None) is not None:
+                self.usage.pop(memory_id, None)
+                self.lexical.remove([memory_id])
+                self.stale += 1
+
+        if self.stale > len(self.by_id):
+            self.timeline = [entry for entry in self.timeline if entry[1] in self.by_id]
+            self.stale = 0
+
+    def touch(self, memory_id: int, now: float):
+        """Count a retrieval of a memory"""
+        usage = self.usage[memory_id]
+        usage[0] += 1
+        usage[1] = now
+
+    def newest_ids(self, limit: int, before: Optional[Tuple[float, int]] = None) -> List[int]:
+        """IDs of the newest memories, newest first, optionally only those older than a (timestamp, id) cursor"""
+        end = len(self.timeline) if before is None else bisect.bisect_left(self.timeline, tuple(before))
+        ids = []
+        for position in range(end - 1, -1, -1):
+            if len(ids) >= limit:
+                break
+            memory_id = self.timeline[position][1]
+            if memory_id in self.by_id:
+                ids.append(memory_id)
+        return ids
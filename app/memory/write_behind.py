@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (kind, user ID, payload) as queued by put()
+Operation = Tuple[str, str, Any]
+
+
+class WriteBehindQueue:
+    """
+    Runs writes on a background thread so callers don't wait for the disk.
+
+    Operations queued while the thread is busy, or within ``max_delay_ms`` of
+    the first one, are handed to ``write_fn`` together in queue order, so
+    bursts of adds become one write (and one fsync) per file. ``flush()``
+    blocks until everything queued so far has been tried; ``close()``
+    flushes and stops the thread.
+
+    ``write_fn`` returns the operations it could not write (or raises if
+    none were written). They stay pending and are retried after
+    ``retry_delay_ms``, with the user's later operations held behind them
+    to keep their order. Whatever still fails on close() is dropped.
+    """
+
+    def __init__(
+        self,
+        write_fn: Callable[[List[Operation]], Optional[List[Operation]]],
+        max_delay_ms: float = 50.0,
+        max_batch_size: int = 256,
+        retry_delay_ms: float = 1000.0,
+        thread_name: str = "write-behind"
+    ):
+        self.write_fn = write_fn
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.retry_delay = retry_delay_ms / 1000.0
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._held = []  # Failed operations, and later ones of the same users, waiting for a retry
+        self._retry_at = 0.0
+        self._pending = Counter()  # User ID -> queued or held operations
+        self._queued = 0
+        self._written = 0  # Operations written or held, i.e. tried at least once
+        self._flush_requested = False
+        self._closed = False
+        self.stats = {
+            "batches": 0, "operations": 0, "largest_batch": 0,
+            "errors": 0, "retries": 0, "dropped": 0
+        }
+
+        self._thread = threading.Thread(target=self._run, name=thread_name, daemon=True)
+        self._thread.start()
+
+    def put(self, kind: str, user_id: str, payload: Any):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            self._queue.append((kind, user_id, payload))
+            self._pending[user_id] += 1
+            self._queued += 1
+            self._cond.notify_all()
+
+    def pending(self, user_id: str) -> int:
+        """Operations for a user that are not on disk yet, including failed ones"""
+        with self._cond:
+            return self._pending[user_id]
+
+    def flush(self):
+        """Block until everything queued so far has been written, or has failed and is held for a retry"""
+        with self._cond:
+            target = self._queued
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._written < target and self._thread.is_alive():
+                self._cond.wait()
+
+    def close(self):
+        """Write everything still queued and stop the thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _next_batch(self) -> Tuple[Optional[List[Operation]], int]:
+        """(operations to write, how many of them are retries), or (None, 0) once closed and drained"""
+        with self._cond:
+            while not self._queue and not self._closed:
+                if not self._held:
+                    self._cond.wait()
+                    continue
+                remaining = self._retry_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if not self._queue and not self._held:
+                return None, 0
+
+            # Give concurrent writers a moment to join the batch
+            deadline = time.monotonic() + self.max_delay
+            while (self._queue and not self._closed and not self._flush_requested
+                   and len(self._queue) < self.max_batch_size):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, self._queue = self._queue, []
+            self._flush_requested = False
+            retried = 0
+            if self._held:
+                if self._closed or time.monotonic() >= self._retry_at:
+                    retried = len(self._held)
+                    batch, self._held = self._held + batch, []
+                    self.stats["retries"] += 1
+                else:
+                    # Users with failed writes wait for the retry, so their operations stay in order
+                    held_users = {user_id for _, user_id, _ in self._held}
+                    held = [operation for operation in batch if operation[1] in held_users]
+                    batch = [operation for operation in batch if operation[1] not in held_users]
+                    self._held.extend(held)
+                    self._written += len(held)
+                    self._cond.notify_all()
+            return batch, retried
+
+    def _run(self):
+        while True:
+            batch, retried = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+
+            try:
+                failed = self.write_fn(batch) or []
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} queued memory operations: {str(e)}")
+                failed = batch
+
+            with self._cond:
+                failed_ids = {id(operation) for operation in failed}
+                done = [operation for operation in batch if id(operation) not in failed_ids]
+                if failed:
+                    self.stats["errors"] += 1
+                    if self._closed:
+                        logger.error(f"Dropping {len(failed)} memory operations that could not be written")
+                        self.stats["dropped"] += len(failed)
+                        done = batch
+                    else:
+                        logger.warning(f"Retrying {len(failed)} memory operations in {self.retry_delay:.1f}s")
+                        self._held.extend(failed)
+                        self._retry_at = time.monotonic() + self.retry_delay
+
+                self._written += len(batch) - retried
+                for _, user_id, _ in done:
+                    self._pending[user_id] -= 1
+                    if not self._pending[user_id]:
+                        del self._pending[user_id]
+                self.stats["batches"] += 1
+                self.stats["operations"] += len(done)
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+                self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {**self.stats, "queued": len(self._queue), "held": len(self._held)}
@@ -1,22 +1,46 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import json
 from datetime import datetime, timedelta
 import pytz  # Fixed: changed from 'pytzs' to 'pytz'
 import uuid
 import os
+import time
 
 # API endpoint
 API_URL = "http://127.0.0.1:8010"  # Changed from localhost to 127.0.0.1
 
-# Add a function to check if the API is available
-def is_api_available():
+# How long to wait for a scheduling job (covers a first-time Google sign-in)
+MEETING_JOB_TIMEOUT = 120
+
+# Past conversations shown per sidebar page
+MEMORY_PAGE_SIZE = 10
+
+# Streamlit reruns this script on every interaction, so API calls the sidebar
+# makes are cached (and cleared after a send) rather than repeated each time
+HEALTH_CACHE_SECONDS = 15
+MEMORIES_CACHE_SECONDS = 60
+
+@st.cache_resource
+def get_session():
+    """One pooled HTTP session shared by all reruns, so connections are reused"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Check whether the API can serve requests: "ready", "starting" while it loads
+# memory and calendar, "failed" if startup failed, or "unavailable"
+@st.cache_data(ttl=HEALTH_CACHE_SECONDS, show_spinner=False)
+def get_api_status():
     try:
-        response = requests.get(f"{API_URL}/health", timeout=5)
-        return response.status_code == 200
+        response = get_session().get(f"{API_URL}/health/ready", timeout=2)
+        return response.json().get("status", "unavailable")
     except Exception as e:
         print(f"API connection error: {str(e)}")
-        return False
+        return "unavailable"
 
 # Set page config
 st.set_page_config(
@@ -33,24 +57,37 @@ if "user_id" not in st.session_state:
     # Generate a unique user ID or load from cookies
     st.session_state.user_id = str(uuid.uuid4())
 
+if "memory_cursors" not in st.session_state:
+    # Cursors of the past-conversation pages visited so far (None is the newest page)
+    st.session_state.memory_cursors = [None]
+
 # Helper functions
-def send_message(message):
-    """Send a message to the API and get a response"""
+def stream_message(message):
+    """Send a message to the streaming API and yield response tokens as they arrive"""
     try:
-        response = requests.post(
-            f"{API_URL}/chat",
+        with get_session().post(
+            f"{API_URL}/chat/stream",
             json={
                 "message": message,
                 "user_id": st.session_state.user_id
-            }
-        )
-        
-        if response.status_code == 200:
-            return response.json()["response"]
-        else:
-            return f"Error: {response.status_code} - {response.text}"
+            },
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                yield f"Error: {response.status_code} - {response.text}"
+                return
+            
+            # Server-sent events: "data: {...}" lines, with a final "event: done"
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    event = None
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event is None:
+                    yield json.loads(line[len("data:"):])["token"]
     except Exception as e:
-        return f"Error connecting to the API: {str(e)}"
+        yield f"Error connecting to the API: {str(e)}"
 
 def schedule_meeting(summary, description, start_time, end_time, attendees):
     """Schedule a meeting via the API"""
@@ -58,7 +95,7 @@ def schedule_meeting(summary, description, start_time, end_time, attendees):
         # Print debug information
         print(f"Attempting to connect to {API_URL}/schedule-meeting")
         
-        response = requests.post(
+        response = get_session().post(
             f"{API_URL}/schedule-meeting",
             json={
                 "summary": summary,
@@ -71,8 +108,22 @@ def schedule_meeting(summary, description, start_time, end_time, attendees):
             timeout=10  # Increase timeout to 10 seconds
         )
         
-        if response.status_code == 200:
-            return response.json()["meeting_link"], True
+        if response.status_code == 202:
+            # The API schedules in the background; poll the job until it finishes
+            job_id = response.json()["job_id"]
+            deadline = time.time() + MEETING_JOB_TIMEOUT
+            while time.time() < deadline:
+                job = get_session().get(f"{API_URL}/jobs/{job_id}", timeout=10).json()
+                if job["status"] == "succeeded":
+                    return job["result"]["meeting_link"], True
+                if job["status"] == "failed":
+                    response_error = job["error"] or "Unknown error"
+                    print(f"Scheduling job failed: {response_error}")
+                    if "access_denied" in response_error or "verification" in response_error:
+                        return "Google API access denied. Please check: 1) Your app is in testing mode, 2) Your email is added as a test user, and 3) The scope 'https://www.googleapis.com/auth/calendar' is added in the OAuth consent screen.", False
+                    return f"Error: {response_error}", False
+                time.sleep(0.5)
+            return "Scheduling is taking longer than expected. Please check your calendar shortly.", False
         else:
             error_text = response.text
             print(f"API error: {response.status_code} - {error_text}")
@@ -90,42 +141,40 @@ def schedule_meeting(summary, description, start_time, end_time, attendees):
             return "Google API access denied. Please check: 1) Your app is in testing mode, 2) Your email is added as a test user, and 3) The scope 'https://www.googleapis.com/auth/calendar' is added in the OAuth consent screen.", False
         return f"Error connecting to the API: {error_msg}", False
 
-def get_memories():
-    """Get recent memories from the API"""
-    try:
-        response = requests.get(
-            f"{API_URL}/memories/{st.session_state.user_id}"
-        )
-        
-        if response.status_code == 200:
-            return response.json()["memories"]
-        else:
-            return []
-    except Exception as e:
-        print(f"Error fetching memories: {str(e)}")
-        return []
+@st.cache_data(ttl=MEMORIES_CACHE_SECONDS, show_spinner=False)
+def get_memories(user_id, cursor=None):
+    """
+    Get a page of past conversations from the API, newest first, and the cursor of the next page
+
+    Raises on failure, so an error (e.g. a 503 while the API warms up) is never cached.
+    """
+    params = {"limit": MEMORY_PAGE_SIZE}
+    if cursor:
+        params["cursor"] = cursor
+    response = get_session().get(f"{API_URL}/memories/{user_id}", params=params, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+    return data["memories"], data.get("next_cursor")
 
-def get_memories():
-    """Get recent memories from the API"""
+def load_memories(user_id, cursor=None):
+    """get_memories, or None if they couldn't be fetched"""
     try:
-        response = requests.get(
-            f"{API_URL}/memories/{st.session_state.user_id}"
-        )
-        
-        if response.status_code == 200:
-            return response.json()["memories"]
-        else:
-            return []
+        return get_memories(user_id, cursor)
     except Exception as e:
         print(f"Error fetching memories: {str(e)}")
-        return []
+        return None
 
 # Main UI
 st.title("💼 AI Business Assistant")
 
 # Check API connection
-api_available = is_api_available()
-if not api_available:
+api_status = get_api_status()
+api_available = api_status == "ready"
+if api_status == "starting":
+    st.info("⏳ The API server is warming up (loading memories and calendar). Try again in a few seconds.")
+elif api_status == "failed":
+    st.error("⚠️ The API server failed to start. Check its logs at " + API_URL)
+elif not api_available:
     st.error("⚠️ API server is not available. Please make sure it's running at " + API_URL)
 
 # Sidebar
@@ -135,6 +184,8 @@ with st.sidebar:
     # API status indicator
     if api_available:
         st.success("API Server: Connected")
+    elif api_status == "starting":
+        st.warning("API Server: Warming up")
     else:
         st.error("API Server: Not Connected")
     
@@ -164,13 +215,14 @@ with st.sidebar:
             end_time = start_time + timedelta(minutes=meeting_duration)
             
             # Schedule the meeting
-            result, success = schedule_meeting(
-                meeting_title, 
-                meeting_desc, 
-                start_time, 
-                end_time, 
-                meeting_attendees
-            )
+            with st.spinner("Scheduling meeting..."):
+                result, success = schedule_meeting(
+                    meeting_title, 
+                    meeting_desc, 
+                    start_time, 
+                    end_time, 
+                    meeting_attendees
+                )
             
             if success:
                 st.success("Meeting scheduled successfully!")
@@ -180,15 +232,31 @@ with st.sidebar:
     
     # Past conversations
     st.subheader("Past Conversations")
-    memories = get_memories()
+    cursors = st.session_state.memory_cursors
+    page = load_memories(st.session_state.user_id, cursors[-1]) if api_available else None
+    memories, next_cursor = page or ([], None)
     
-    if memories:
+    if not api_available:
+        st.info("Past conversations will show once the API server is ready")
+    elif page is None:
+        st.warning("Couldn't load past conversations")
+    elif memories:
         for memory in memories:
             with st.expander(f"{memory['query'][:30]}..."):
                 st.write("**You:** " + memory["query"])
                 st.write("**Assistant:** " + memory["response"])
     else:
         st.info("No past conversations found")
+    
+    newer_col, older_col = st.columns(2)
+    with newer_col:
+        if len(cursors) > 1 and st.button("← Newer"):
+            cursors.pop()
+            st.rerun()
+    with older_col:
+        if next_cursor and st.button("Older →"):
+            cursors.append(next_cursor)
+            st.rerun()
 
 # Chat interface
 st.header("Chat with your AI Assistant")
@@ -207,11 +275,14 @@ if user_input:
     with st.chat_message("user"):
         st.write(user_input)
     
-    # Get AI response
-    with st.spinner("Thinking..."):
-        ai_response = send_message(user_input)
+    # Render the AI response as it streams in
+    with st.chat_message("assistant"):
+        ai_response = st.write_stream(stream_message(user_input))
     
     # Add AI response to chat
     st.session_state.messages.append({"role": "assistant", "content": ai_response})
-    with st.chat_message("assistant"):
-        st.write(ai_response)
\ No newline at end of file
+    
+    # The new conversation goes on the first page of the sidebar
+    get_memories.clear()
+    st.session_state.memory_cursors = [None]
+    st.rerun()
\ No newline at end of file
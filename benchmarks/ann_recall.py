@@ -0,0 +1,141 @@
+"""
+Recall vs. latency of the shared ANN memory index against per-user flat search.
+
+Builds synthetic, clustered, L2-normalised embeddings (like all-MiniLM-L6-v2
+output) for many users, then compares each shared backend with the exact
+per-user IndexFlatL2 that FaissMemory uses by default. Every backend is run
+both with the small-user exact scan (the default) and with pure filtered ANN
+search (exact_search_max=0), which is what large users get.
+
+    python -m benchmarks.ann_recall --users 2000 --per-user 50 --json ann.json
+"""
+import argparse
+import json
+import time
+import faiss
+import numpy as np
+
+from app.memory.shared_index import SharedAnnIndex
+
+
+def make_embeddings(rng, users: int, per_user: int, dim: int, topics: int = 256) -> np.ndarray:
+    """Clustered unit vectors: each memory is a noisy copy of a random topic"""
+    centers = rng.standard_normal((topics, dim)).astype('float32')
+    labels = rng.integers(0, topics, size=users * per_user)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((users * per_user, dim)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.reshape(users, per_user, dim)
+
+
+def percentile(values, q: float) -> float:
+    return float(np.percentile(np.array(values) * 1000.0, q))
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    data = make_embeddings(rng, args.users, args.per_user, args.dim)
+    query_users = rng.integers(0, args.users, size=args.queries)
+    queries = data[query_users, rng.integers(0, args.per_user, size=args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype('float32')
+
+    # Exact baseline: one flat index per user, as FaissMemory does by default
+    flat = []
+    for user in range(args.users):
+        index = faiss.IndexFlatL2(args.dim)
+        index.add(data[user])
+        flat.append(index)
+
+    truth, flat_times = [], []
+    for user, query in zip(query_users, queries):
+        started = time.perf_counter()
+        _, ids = flat[user].search(query.reshape(1, -1), args.k)
+        flat_times.append(time.perf_counter() - started)
+        truth.append(set(ids[0].tolist()))
+
+    results = [{
+        "backend": "flat",
+        "params": {},
+        "recall": 1.0,
+        "p50_ms": percentile(flat_times, 50),
+        "p95_ms": percentile(flat_times, 95),
+        "build_s": 0.0
+    }]
+
+    def source():
+        for user in range(args.users):
+            yield str(user), np.arange(args.per_user), data[user]
+
+    configs = [("hnsw", {"exact_search_max": 4096})]
+    configs += [("hnsw", {"ef_search": ef, "exact_search_max": 0}) for ef in (16, 128, 512)]
+    configs += [("ivfpq", {"exact_search_max": 4096})]
+    configs += [("ivfpq", {"nprobe": nprobe, "exact_search_max": 0}) for nprobe in (16, 64, 256)]
+
+    for backend, params in configs:
+        started = time.perf_counter()
+        shared = SharedAnnIndex(
+            args.dim,
+            backend=backend,
+            train_threshold=min(10000, args.users * args.per_user),
+            nlist=args.nlist,
+            vector_source=source,
+            **params
+        )
+        shared.rebuild()
+        build_s = time.perf_counter() - started
+
+        hits, times = 0, []
+        for user, query, expected in zip(query_users, queries, truth):
+            started = time.perf_counter()
+            found = shared.search(str(user), query, args.k)
+            times.append(time.perf_counter() - started)
+            hits += len(expected & {memory_id for memory_id, _ in found})
+
+        results.append({
+            "backend": backend,
+            "params": params,
+            "recall": hits / (args.k * args.queries),
+            "p50_ms": percentile(times, 50),
+            "p95_ms": percentile(times, 95),
+            "build_s": build_s
+        })
+
+    return {
+        "config": {
+            "users": args.users,
+            "per_user": args.per_user,
+            "dim": args.dim,
+            "queries": args.queries,
+            "k": args.k
+        },
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--per-user", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"{'backend':<8} {'params':<34} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for row in report["results"]:
+        params = ",".join(f"{k}={v}" for k, v in row["params"].items())
+        print(
+            f"{row['backend']:<8} {params:<34} {row['recall']:>9.3f} "
+            f"{row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['build_s']:>8.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput of batched vs. one-by-one meeting scheduling against the local
+stand-in Calendar API.
+
+    python -m benchmarks.calendar_batch --meetings 200 --latency-ms 40 --json batch.json
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fake_calendar import FakeCalendarServer, StandInCalendar
+
+
+def make_meetings(count: int):
+    start = datetime(2030, 1, 7, 9, 0)
+    meetings = []
+    for i in range(count):
+        begin = start + timedelta(minutes=30 * i)
+        meetings.append({
+            "summary": f"Onboarding session {i + 1}",
+            "description": "Benchmark meeting",
+            "start_time": begin.isoformat(),
+            "end_time": (begin + timedelta(minutes=30)).isoformat(),
+            "attendees": ["customer@example.com"]
+        })
+    return meetings
+
+
+def run(args) -> dict:
+    meetings = make_meetings(args.meetings)
+    results = {}
+
+    with FakeCalendarServer(latency_ms=args.latency_ms) as server:
+        calendar = StandInCalendar(api_root_url=server.url)
+
+        started = time.perf_counter()
+        for meeting in meetings:
+            calendar.create_event(user_id="bench-single", **meeting)
+        single_s = time.perf_counter() - started
+        single_requests = server.state.http_requests
+
+        started = time.perf_counter()
+        batch_results = calendar.create_events("bench-batch", meetings)
+        batch_s = time.perf_counter() - started
+        batch_requests = server.state.http_requests - single_requests
+
+        errors = [result for result in batch_results if "error" in result]
+        results["single"] = {
+            "seconds": single_s,
+            "events_per_s": len(meetings) / single_s,
+            "http_requests": single_requests
+        }
+        results["batch"] = {
+            "seconds": batch_s,
+            "events_per_s": len(meetings) / batch_s,
+            "http_requests": batch_requests,
+            "errors": len(errors)
+        }
+
+    return {
+        "config": {"meetings": args.meetings, "latency_ms": args.latency_ms},
+        "results": results,
+        "speedup": results["batch"]["events_per_s"] / results["single"]["events_per_s"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--meetings", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=40.0,
+                        help="Simulated round trip per HTTP request to the Calendar API")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    for mode, row in report["results"].items():
+        print(
+            f"{mode:<7} {row['seconds']:>7.2f} s  {row['events_per_s']:>8.1f} events/s  "
+            f"{row['http_requests']:>4} HTTP requests"
+        )
+    print(f"speedup: {report['speedup']:.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Incremental (sync token) vs. full calendar sync against the local stand-in
+Calendar API, recovery from expired sync tokens, and upcoming-event reads
+from the local event cache vs. listing them from the API.
+
+After every sync the cached events are compared with the stand-in's; the
+benchmark exits with status 1 if they ever differ.
+
+    python -m benchmarks.calendar_sync --events 2000 --changes 50 --latency-ms 40 --json sync.json
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import latency_summary, format_summary, write_report
+from benchmarks.fake_calendar import FakeCalendarServer, StandInCalendar, _parse_time
+
+USER_ID = "bench-sync"
+CALENDAR_ID = "primary"
+
+
+def event_body(rng: random.Random, index: int, now: datetime) -> dict:
+    """A half-hour to two-hour meeting between a day ago and a month ahead"""
+    start = now + timedelta(minutes=30 * rng.randrange(-48, 30 * 48))
+    end = start + timedelta(minutes=30 * rng.randint(1, 4))
+    return {
+        "summary": f"Customer call {index}",
+        "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+        "end": {"dateTime": end.isoformat(), "timeZone": "UTC"},
+        "attendees": [{"email": f"customer{index % 50}@example.com"}]
+    }
+
+
+def cache_mismatches(calendar: StandInCalendar, server: FakeCalendarServer) -> int:
+    """Events that differ between the local cache and the stand-in (missing, extra or changed)"""
+    expected = {
+        event["id"]: (
+            event["summary"],
+            _parse_time(event["start"]["dateTime"]).timestamp(),
+            _parse_time(event["end"]["dateTime"]).timestamp()
+        )
+        for event in server.state.live_events(CALENDAR_ID)
+    }
+    cached = {
+        event["id"]: (
+            event["summary"],
+            datetime.fromisoformat(event["start"]).timestamp(),
+            datetime.fromisoformat(event["end"]).timestamp()
+        )
+        for event in calendar.events.upcoming(USER_ID, 0, float("inf"), limit=len(expected) + 1000)
+    }
+    return len(expected.keys() ^ cached.keys()) + sum(
+        1 for event_id in expected.keys() & cached.keys() if expected[event_id] != cached[event_id]
+    )
+
+
+def apply_changes(server: FakeCalendarServer, rng: random.Random, count: int, now: datetime) -> dict:
+    """Insert, move or rename, and delete count events each"""
+    live = [event["id"] for event in server.state.live_events(CALENDAR_ID)]
+    changed = rng.sample(live, min(len(live), 2 * count))
+    for event_id in changed[:count]:
+        body = event_body(rng, rng.randrange(10 ** 6), now)
+        server.state.update(CALENDAR_ID, event_id, {
+            "summary": f"Rescheduled: {body['summary']}", "start": body["start"], "end": body["end"]
+        })
+    for event_id in changed[count:]:
+        server.state.delete(CALENDAR_ID, event_id)
+    for i in range(count):
+        server.state.insert(CALENDAR_ID, event_body(rng, len(live) + i, now))
+    return {"inserted": count, "updated": len(changed[:count]), "deleted": len(changed[count:])}
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    results = {}
+    mismatches = {}
+
+    with FakeCalendarServer(latency_ms=args.latency_ms) as server:
+        for i in range(args.events):
+            server.state.insert(CALENDAR_ID, event_body(rng, i, now))
+        calendar = StandInCalendar(api_root_url=server.url)
+
+        def timed_sync(name: str):
+            requests_before = server.state.http_requests
+            started = time.perf_counter()
+            outcome = calendar.sync_events(USER_ID, CALENDAR_ID)
+            results[name] = {
+                "seconds": time.perf_counter() - started,
+                "http_requests": server.state.http_requests - requests_before,
+                "full": outcome["full"],
+                "events_fetched": outcome["changes"]
+            }
+            mismatches[name] = cache_mismatches(calendar, server)
+
+        timed_sync("full")
+        changes = apply_changes(server, rng, args.changes, now)
+        timed_sync("incremental")
+        timed_sync("unchanged")
+
+        # Google expires sync tokens now and then; the next sync must fall back to a full one
+        server.state.expire_sync_tokens()
+        apply_changes(server, rng, args.changes, now)
+        timed_sync("expired_token")
+
+        # What chat context needs: the next few meetings, from SQLite or from the API
+        cache_latencies = []
+        for _ in range(args.reads):
+            started = time.perf_counter()
+            calendar.upcoming_events(USER_ID, hours=48, limit=5)
+            cache_latencies.append(time.perf_counter() - started)
+
+        api_latencies = []
+        for _ in range(args.api_reads):
+            started = time.perf_counter()
+            with calendar._service(USER_ID) as service:
+                service.events().list(
+                    calendarId=CALENDAR_ID,
+                    timeMin=datetime.now(timezone.utc).isoformat(),
+                    timeMax=(datetime.now(timezone.utc) + timedelta(hours=48)).isoformat(),
+                    singleEvents=True,
+                    maxResults=250
+                ).execute()
+            api_latencies.append(time.perf_counter() - started)
+
+        stats = calendar.get_stats()["sync"]
+        calendar.close()
+
+    return {
+        "config": {
+            "events": args.events,
+            "changes": args.changes,
+            "latency_ms": args.latency_ms,
+            "seed": args.seed
+        },
+        "changes": changes,
+        "syncs": results,
+        "mismatches": mismatches,
+        "sync_stats": stats,
+        "upcoming": {
+            "cache": latency_summary(cache_latencies),
+            "api": latency_summary(api_latencies)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--changes", type=int, default=50,
+                        help="Events inserted, updated and deleted (each) between syncs")
+    parser.add_argument("--latency-ms", type=float, default=40.0,
+                        help="Simulated round trip per HTTP request to the Calendar API")
+    parser.add_argument("--reads", type=int, default=2000, help="Upcoming-event reads from the cache")
+    parser.add_argument("--api-reads", type=int, default=50, help="Upcoming-event listings from the API")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    for name, row in report["syncs"].items():
+        print(
+            f"{name:<14} {'full' if row['full'] else 'delta':<5} {row['seconds']:>7.3f} s  "
+            f"{row['http_requests']:>4} HTTP requests  {row['events_fetched']:>6} events  "
+            f"{report['mismatches'][name]} mismatches"
+        )
+    print(format_summary("upcoming (cache)", report["upcoming"]["cache"]))
+    print(format_summary("upcoming (api)", report["upcoming"]["api"]))
+
+    if args.json:
+        write_report(args.json, report)
+
+    failures = []
+    if any(report["mismatches"].values()):
+        failures.append("event cache differs from the calendar")
+    if not report["syncs"]["full"]["full"] or report["syncs"]["incremental"]["full"]:
+        failures.append("sync tokens were not used")
+    if not report["syncs"]["expired_token"]["full"]:
+        failures.append("expired sync token did not trigger a full sync")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Helpers shared by the benchmarks: latency summaries and JSON reports."""
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import List, Dict, Any
+
+import numpy as np
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99 in milliseconds"""
+    if not seconds:
+        return {"count": 0}
+    values = np.asarray(seconds) * 1000.0
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99))
+    }
+
+
+def format_summary(name: str, summary: Dict[str, float]) -> str:
+    if not summary.get("count"):
+        return f"{name:<24} (no samples)"
+    return (
+        f"{name:<24} n={summary['count']:<6} p50 {summary['p50_ms']:>9.3f} ms  "
+        f"p95 {summary['p95_ms']:>9.3f} ms  p99 {summary['p99_ms']:>9.3f} ms"
+    )
+
+
+def environment() -> Dict[str, Any]:
+    """Where and on what code a benchmark ran, for comparing results over time"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def write_report(path: str, report: Dict[str, Any]):
+    """Write a machine-readable report, tagged with the environment"""
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), **report}, f, indent=2)
@@ -0,0 +1,193 @@
+"""
+Parity and throughput of the embedding backends, and of float16 storage.
+
+Every backend embeds the same synthetic corpus of assistant messages and a
+set of paraphrased queries. Parity is measured against a reference backend
+(full-precision torch by default): the cosine similarity of each text's two
+vectors, and the overlap of each query's top-k memories found by exact L2
+search. float16 storage is checked the same way, on the reference vectors.
+Backends that can't load here (e.g. ONNX Runtime not installed) are
+reported as skipped.
+
+Exits with status 1 when a backend or the float16 storage falls below
+--min-overlap (or a backend below --min-cosine), so it can gate a change.
+
+    python -m benchmarks.embedding_backends --backends torch torch-int8 onnx onnx-int8 --json embed.json
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.memory.embedding_backends import EMBEDDING_BACKENDS, load_embedding_backend
+from app.memory.shared_index import flat_index
+from benchmarks.common import latency_summary, format_summary, write_report
+
+SUBJECTS = (
+    "the quarterly budget review", "my dentist appointment", "the product launch",
+    "the design sync with Priya", "our flight to Berlin", "the server migration",
+    "the customer onboarding call", "the hiring committee", "my gym session",
+    "the board presentation", "the invoice from Acme", "the team offsite"
+)
+REQUESTS = (
+    "Can you move {subject} to {when}?",
+    "What did we decide about {subject}?",
+    "Remind me to prepare for {subject} {when}.",
+    "Schedule {subject} for {when} with the usual people.",
+    "Cancel {subject}, something came up {when}."
+)
+PARAPHRASES = (
+    "Please reschedule {subject} to {when}.",
+    "Remind me what was agreed on {subject}.",
+    "I need to get ready for {subject} {when}."
+)
+WHEN = ("tomorrow morning", "next Tuesday", "Friday afternoon", "the end of the month", "after lunch")
+
+
+def make_texts(rng: np.random.Generator, count: int, templates) -> list:
+    return [
+        templates[rng.integers(len(templates))].format(
+            subject=SUBJECTS[rng.integers(len(SUBJECTS))], when=WHEN[rng.integers(len(WHEN))]
+        )
+        for _ in range(count)
+    ]
+
+
+def encode_all(backend, texts: list, batch_size: int) -> np.ndarray:
+    return np.concatenate([backend.encode(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int, storage: str = "float32") -> np.ndarray:
+    index = flat_index(corpus.shape[1], storage)
+    index.add(np.ascontiguousarray(corpus, dtype='float32'))
+    _, ids = index.search(np.ascontiguousarray(queries, dtype='float32'), k)
+    return ids
+
+
+def overlap(ids: np.ndarray, reference_ids: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(ids, reference_ids)]))
+
+
+def cosine(vectors: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    return (vectors * reference).sum(axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+    )
+
+
+def bench_throughput(backend, texts: list, args) -> dict:
+    # One message at a time, as a lone request sees it
+    single = []
+    for text in texts[:args.samples]:
+        started = time.perf_counter()
+        backend.encode([text])
+        single.append(time.perf_counter() - started)
+
+    throughput = {}
+    for batch_size in args.batch_sizes:
+        batch = texts[:batch_size]
+        backend.encode(batch)
+        rounds = max(1, args.samples // batch_size)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            backend.encode(batch)
+        throughput[str(batch_size)] = rounds * len(batch) / (time.perf_counter() - started)
+    return {"single": latency_summary(single), "batch_texts_per_s": throughput}
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    corpus = make_texts(rng, args.corpus, REQUESTS)
+    queries = make_texts(rng, args.queries, PARAPHRASES)
+
+    reference = load_embedding_backend(args.reference, args.model)
+    reference_corpus = encode_all(reference, corpus, 32)
+    reference_queries = encode_all(reference, queries, 32)
+    reference_ids = top_k(reference_corpus, reference_queries, args.k)
+
+    results = {}
+    for name in args.backends:
+        started = time.perf_counter()
+        try:
+            backend = reference if name == args.reference else load_embedding_backend(name, args.model)
+        except Exception as e:
+            results[name] = {"skipped": f"{type(e).__name__}: {str(e)}"}
+            continue
+        load_s = time.perf_counter() - started
+
+        corpus_vectors = encode_all(backend, corpus, 32)
+        query_vectors = encode_all(backend, queries, 32)
+        similarity = cosine(np.concatenate([corpus_vectors, query_vectors]),
+                            np.concatenate([reference_corpus, reference_queries]))
+        results[name] = {
+            "load_s": load_s,
+            "cosine_mean": float(similarity.mean()),
+            "cosine_min": float(similarity.min()),
+            f"overlap@{args.k}": overlap(top_k(corpus_vectors, query_vectors, args.k), reference_ids),
+            **bench_throughput(backend, corpus, args)
+        }
+
+    storage = {
+        "float16": {
+            f"overlap@{args.k}": overlap(
+                top_k(reference_corpus, reference_queries, args.k, "float16"), reference_ids
+            ),
+            "bytes_per_vector": reference_corpus.shape[1] * 2
+        },
+        "float32": {f"overlap@{args.k}": 1.0, "bytes_per_vector": reference_corpus.shape[1] * 4}
+    }
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "backends": results,
+        "storage": storage
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--reference", default="torch", choices=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--corpus", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--min-overlap", type=float, default=0.8)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    failed = []
+    overlap_key = f"overlap@{args.k}"
+    for name, result in report["backends"].items():
+        if "skipped" in result:
+            print(f"{name:<12} skipped: {result['skipped']}")
+            continue
+        passed = result[overlap_key] >= args.min_overlap and result["cosine_min"] >= args.min_cosine
+        if not passed:
+            failed.append(name)
+        throughput = "  ".join(f"b{size}: {rate:,.0f}/s" for size, rate in result["batch_texts_per_s"].items())
+        print(
+            f"{name:<12} {'ok' if passed else 'FAIL':<4} cosine mean {result['cosine_mean']:.4f} "
+            f"min {result['cosine_min']:.4f}  {overlap_key} {result[overlap_key]:.3f}  {throughput}"
+        )
+        print(format_summary("  single encode", result["single"]))
+    for name, result in report["storage"].items():
+        if result[overlap_key] < args.min_overlap:
+            failed.append(f"{name} storage")
+        print(f"storage {name:<8} {overlap_key} {result[overlap_key]:.3f}  {result['bytes_per_vector']} bytes/vector")
+
+    if args.json:
+        write_report(args.json, report)
+    if failed:
+        print(f"Below parity tolerance: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Local stand-in for the Google Calendar API, for benchmarks.
+
+Serves the endpoints GoogleCalendar uses, including multipart batch
+requests and events.list with sync tokens, with an optional fixed latency
+per HTTP request to model the round trip to Google. Events can be changed
+and deleted (over HTTP or through ``FakeCalendarState``) and sync tokens
+expired, to exercise incremental sync. Point GoogleCalendar at it with
+``api_root_url=server.url`` (or GOOGLE_CALENDAR_API_ROOT).
+
+    python -m benchmarks.fake_calendar --port 8765 --latency-ms 40
+"""
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from google.oauth2.credentials import Credentials
+
+from app.calendar.google_calendar import GoogleCalendar
+
+EVENTS_PATH = re.compile(r"^/calendar/v3/calendars/(?P<calendar>[^/]+)/events$")
+EVENT_PATH = re.compile(r"^/calendar/v3/calendars/(?P<calendar>[^/]+)/events/(?P<event>[^/]+)$")
+FREEBUSY_PATH = "/calendar/v3/freeBusy"
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class FakeCalendarState:
+    """Events per calendar, shared by all request handlers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = {}  # Calendar ID -> list of events, including cancelled ones
+        self.ids = itertools.count(1)
+        self.busy = {}  # Calendar ID -> extra busy (start, end) datetimes, seeded by benchmarks
+        self.http_requests = 0
+        # Every insert, change and delete gets the next change number; a sync
+        # token is "<epoch>-<change number>", and expiring tokens starts a new epoch
+        self.changes = 0
+        self.versions = {}  # Event ID -> change number of its last change
+        self.token_epoch = 0
+
+    def _touch(self, event: dict):
+        """Record a change to an event (called with the lock held)"""
+        self.changes += 1
+        self.versions[event["id"]] = self.changes
+        event["updated"] = datetime.now(timezone.utc).isoformat()
+
+    def _find(self, calendar_id: str, event_id: str):
+        for event in self.events.get(calendar_id, []):
+            if event["id"] == event_id and event["status"] != "cancelled":
+                return event
+        return None
+
+    def insert(self, calendar_id: str, body: dict) -> dict:
+        with self.lock:
+            event_id = f"evt{next(self.ids)}"
+            event = dict(body, id=event_id, status="confirmed")
+            event["htmlLink"] = f"https://calendar.example/event?eid={event_id}"
+            self.events.setdefault(calendar_id, []).append(event)
+            self._touch(event)
+            return dict(event)
+
+    def update(self, calendar_id: str, event_id: str, changes: dict):
+        """Patch an event; returns it, or None if there is no such event"""
+        with self.lock:
+            event = self._find(calendar_id, event_id)
+            if event is not None:
+                event.update(changes)
+                self._touch(event)
+                return dict(event)
+            return None
+
+    def delete(self, calendar_id: str, event_id: str) -> bool:
+        """Cancel an event, which incremental syncs then report as cancelled"""
+        with self.lock:
+            event = self._find(calendar_id, event_id)
+            if event is not None:
+                event["status"] = "cancelled"
+                self._touch(event)
+            return event is not None
+
+    def expire_sync_tokens(self):
+        """Make every issued sync token invalid, as Google does from time to time (HTTP 410)"""
+        with self.lock:
+            self.token_epoch += 1
+
+    def live_events(self, calendar_id: str) -> list:
+        with self.lock:
+            return [dict(event) for event in self.events.get(calendar_id, []) if event["status"] != "cancelled"]
+
+    def list_events(self, calendar_id: str, query: dict):
+        """
+        events.list: a full listing (within timeMin/timeMax), or the changes since a syncToken
+
+        Returns (status, payload). Pages are cut from a snapshot of the change
+        number taken on the first page, which the last page returns as its
+        nextSyncToken.
+        """
+        with self.lock:
+            if "pageToken" in query:
+                offset, snapshot = (int(part) for part in query["pageToken"].split(":"))
+            else:
+                offset, snapshot = 0, self.changes
+
+            events = [
+                event for event in self.events.get(calendar_id, [])
+                if self.versions[event["id"]] <= snapshot
+            ]
+            if "syncToken" in query:
+                epoch, _, since = query["syncToken"].partition("-")
+                if epoch != str(self.token_epoch) or not since.isdigit():
+                    return 410, {"error": {
+                        "code": 410,
+                        "message": "Sync token is no longer valid, a full sync is required.",
+                        "errors": [{"domain": "calendar", "reason": "fullSyncRequired"}]
+                    }}
+                events = [event for event in events if self.versions[event["id"]] > int(since)]
+            else:
+                events = [event for event in events if event["status"] != "cancelled"]
+                if "timeMin" in query:
+                    time_min = _parse_time(query["timeMin"])
+                    events = [
+                        event for event in events
+                        if _parse_time(event["end"].get("dateTime") or event["end"]["date"]) > time_min
+                    ]
+                if "timeMax" in query:
+                    time_max = _parse_time(query["timeMax"])
+                    events = [
+                        event for event in events
+                        if _parse_time(event["start"].get("dateTime") or event["start"]["date"]) < time_max
+                    ]
+
+            events.sort(key=lambda event: self.versions[event["id"]])
+            max_results = int(query.get("maxResults", 250))
+            page = events[offset:offset + max_results]
+            items = [
+                {"id": event["id"], "status": "cancelled"} if event["status"] == "cancelled" else dict(event)
+                for event in page
+            ]
+            payload = {"kind": "calendar#events", "items": items}
+            if offset + max_results < len(events):
+                payload["nextPageToken"] = f"{offset + max_results}:{snapshot}"
+            else:
+                payload["nextSyncToken"] = f"{self.token_epoch}-{snapshot}"
+            return 200, payload
+
+    def freebusy(self, body: dict) -> dict:
+        """Busy times per requested calendar, from seeded busy time and created events"""
+        time_min, time_max = _parse_time(body["timeMin"]), _parse_time(body["timeMax"])
+        calendars = {}
+        with self.lock:
+            for item in body.get("items", []):
+                calendar_id = item["id"]
+                intervals = list(self.busy.get(calendar_id, []))
+                for owner, events in self.events.items():
+                    for event in events:
+                        if event["status"] == "cancelled":
+                            continue
+                        attendees = {attendee["email"] for attendee in event.get("attendees", [])}
+                        if owner == calendar_id or calendar_id in attendees:
+                            intervals.append((
+                                _parse_time(event["start"]["dateTime"]),
+                                _parse_time(event["end"]["dateTime"])
+                            ))
+                calendars[calendar_id] = {"busy": [
+                    {"start": start.isoformat(), "end": end.isoformat()}
+                    for start, end in sorted(intervals)
+                    if start < time_max and end > time_min
+                ]}
+        return {"kind": "calendar#freeBusy", "timeMin": body["timeMin"],
+                "timeMax": body["timeMax"], "calendars": calendars}
+
+
+class FakeCalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> FakeCalendarState:
+        return self.server.state
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        if status == 204:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload).encode())
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _handle(self, method: str, path: str, body: bytes):
+        """Route one API call; returns (status, payload)"""
+        url = urlsplit(path)
+        match = EVENTS_PATH.match(url.path)
+        if match and method == "POST":
+            return 200, self.state.insert(match.group("calendar"), json.loads(body or b"{}"))
+        if match and method == "GET":
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            return self.state.list_events(match.group("calendar"), query)
+        match = EVENT_PATH.match(url.path)
+        if match and method == "PATCH":
+            event = self.state.update(match.group("calendar"), match.group("event"), json.loads(body or b"{}"))
+            return (200, event) if event else (404, {"error": {"code": 404, "message": "Not Found"}})
+        if match and method == "DELETE":
+            deleted = self.state.delete(match.group("calendar"), match.group("event"))
+            return (204, None) if deleted else (410, {"error": {"code": 410, "message": "Resource has been deleted"}})
+        if path.split("?")[0] == FREEBUSY_PATH and method == "POST":
+            return 200, self.state.freebusy(json.loads(body or b"{}"))
+        return 404, {"error": {"code": 404, "message": f"No route for {method} {path}"}}
+
+    def _handle_batch(self, body: bytes):
+        """Answer a multipart/mixed batch with one application/http part per call"""
+        content_type = self.headers.get("Content-Type")
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+
+        boundary = "batch_fake_calendar"
+        parts = []
+        for part in message.iter_parts():
+            content_id = part.get("Content-ID", "").strip("<>")
+            request = part.get_payload(decode=True)
+            head, _, inner_body = request.partition(b"\r\n\r\n")
+            if not inner_body and b"\n\n" in request:
+                head, _, inner_body = request.partition(b"\n\n")
+            method, path, _ = head.split(b"\r\n")[0].decode().split(" ", 2)
+            # Inner paths may be absolute URLs
+            path = re.sub(r"^https?://[^/]+", "", path)
+
+            status, payload = self._handle(method, path, inner_body)
+            payload_bytes = json.dumps(payload).encode()
+            parts.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload_bytes)}\r\n\r\n".encode()
+                + payload_bytes + b"\r\n"
+            )
+
+        self._send(200, b"".join(parts) + f"--{boundary}--\r\n".encode(),
+                   content_type=f"multipart/mixed; boundary={boundary}")
+
+    def _dispatch(self, method: str):
+        body = self._read_body()
+        with self.state.lock:
+            self.state.http_requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path.startswith("/batch/"):
+            self._handle_batch(body)
+        else:
+            status, payload = self._handle(method, self.path, body)
+            self._send_json(status, payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class FakeCalendarServer:
+    """Runs the stand-in API on a background thread"""
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), FakeCalendarHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = FakeCalendarState()
+        self.httpd.latency = latency_ms / 1000.0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def state(self) -> FakeCalendarState:
+        return self.httpd.state
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StandInCalendar(GoogleCalendar):
+    """GoogleCalendar with static credentials, for use against the stand-in server"""
+
+    def __init__(self, *args, **kwargs):
+        # Benchmarks keep their synced events in memory unless they pass a file
+        kwargs.setdefault("event_cache_path", ":memory:")
+        super().__init__(*args, **kwargs)
+
+    def _get_credentials(self, user_id: str, interactive: bool = True) -> Credentials:
+        return Credentials(token=f"token-{user_id}", expiry=datetime.utcnow() + timedelta(hours=1))
+
+    def has_credentials(self, user_id: str) -> bool:
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google Calendar API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with FakeCalendarServer(args.port, args.latency_ms) as server:
+        print(f"Fake Calendar API at {server.url} (GOOGLE_CALENDAR_API_ROOT={server.url})")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
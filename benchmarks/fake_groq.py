@@ -0,0 +1,240 @@
+"""
+Local stand-in for the Groq OpenAI-compatible chat completions API, for benchmarks.
+
+Answers POST /openai/v1/chat/completions, streamed or not, after a fixed
+time to first token plus a per-token delay, and reports usage like Groq.
+Point GroqClient at it with ``base_url=server.url`` (or GROQ_API_BASE_URL).
+
+Faults can be injected: a share of requests failing with an HTTP status
+(with Retry-After if set), a dropped connection or a malformed 200
+response, a share answered slowly, or an exact sequence of failures queued with ``fail_next``.
+
+    python -m benchmarks.fake_groq --port 8766 --first-token-ms 300 --token-ms 5
+    python -m benchmarks.fake_groq --error-rate 0.2 --error-status 429 --retry-after 1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+REPLY_WORDS = (
+    "Thanks for reaching out. I have checked the details of your request and "
+    "everything looks in order. Let me know if you would like me to schedule "
+    "a follow-up meeting or send a summary to your team."
+).split()
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_fault(self, status: int, stream: bool = False):
+        """Fail the request like Groq does, drop the connection for status 0, or send a cut-off body for 200"""
+        if status == 0:
+            self.close_connection = True
+            return
+        if status == 200:
+            body = b'data: {"choices": [{"delta": {"cont\n\n' if stream else b'{"choices": [{"message": {"cont'
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream" if stream else "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        headers = {}
+        if self.server.retry_after is not None and status in (429, 503):
+            headers["Retry-After"] = f"{self.server.retry_after:g}"
+        error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+        self._send_json(status, {"error": {"message": f"Injected {status}", "type": error_type}}, headers)
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self._complete()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on this request, e.g. a hedged request that lost
+            self.close_connection = True
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _complete(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        if self.path != COMPLETIONS_PATH:
+            self._send_json(404, {"error": {"message": f"No route for {self.path}"}})
+            return
+
+        fault, slow = server.next_fault()
+        if fault is not None:
+            self._send_fault(fault, bool(request.get("stream")))
+            return
+        if slow:
+            time.sleep(server.slow_delay)
+
+        prompt_chars = sum(len(message.get("content", "")) for message in request.get("messages", []))
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(server.tokens)]
+        usage = {
+            "prompt_tokens": max(1, prompt_chars // 4),
+            "completion_tokens": len(words),
+            "total_tokens": max(1, prompt_chars // 4) + len(words)
+        }
+        time.sleep(server.first_token)
+
+        if not request.get("stream"):
+            time.sleep(server.token_delay * len(words))
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "model": request.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(server.token_delay)
+            chunk = {"choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+        self._write_chunk(f"data: {json.dumps(final)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class FakeGroqServer:
+    """Runs the stand-in API on a background thread"""
+
+    def __init__(
+        self,
+        port: int = 0,
+        first_token_ms: float = 300.0,
+        token_ms: float = 5.0,
+        tokens: int = 40,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        retry_after: float = None,
+        slow_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        seed: int = 0
+    ):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.first_token = first_token_ms / 1000.0
+        self.httpd.token_delay = token_ms / 1000.0
+        self.httpd.tokens = tokens
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.httpd.in_flight = 0
+        self.httpd.max_in_flight = 0
+        self.httpd.faults = 0
+        self.httpd.retry_after = retry_after
+        self.httpd.slow_delay = slow_ms / 1000.0
+        self.httpd.next_fault = self._next_fault
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self._queued = deque()  # Statuses for the next requests, from fail_next()
+        self._random = random.Random(seed)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def fail_next(self, *statuses: int):
+        """Fail the next requests with these statuses in order (0 drops the connection, 200 is malformed)"""
+        with self.httpd.lock:
+            self._queued.extend(statuses)
+
+    def _next_fault(self):
+        """(status to fail with or None, whether to answer slowly) for a new request"""
+        with self.httpd.lock:
+            if self._queued:
+                status = self._queued.popleft()
+            elif self._random.random() < self.error_rate:
+                status = self.error_status
+            else:
+                return None, self._random.random() < self.slow_rate
+            self.httpd.faults += 1
+            return status, False
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/openai/v1"
+
+    @property
+    def requests(self) -> int:
+        return self.httpd.requests
+
+    @property
+    def faults(self) -> int:
+        return self.httpd.faults
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.httpd.max_in_flight
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Groq chat completions API")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="Status of failed requests (0 drops the connection, 200 sends a malformed body)")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with 429 and 503 responses")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests answered slowly")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="Extra delay for slow requests")
+    args = parser.parse_args()
+
+    with FakeGroqServer(
+        args.port, args.first_token_ms, args.token_ms, args.tokens,
+        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after,
+        slow_rate=args.slow_rate, slow_ms=args.slow_ms
+    ) as server:
+        print(f"Fake Groq API at {server.url} (GROQ_API_BASE_URL={server.url})")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
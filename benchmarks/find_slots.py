@@ -0,0 +1,104 @@
+"""
+Latency of GoogleCalendar.find_slots against the local stand-in Calendar API,
+for the first (free/busy fetch) and repeated (cached) queries.
+
+    python -m benchmarks.find_slots --attendees 5 --busy-per-day 6 --queries 2000 --json slots.json
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from benchmarks.fake_calendar import FakeCalendarServer, StandInCalendar
+
+WINDOW_START = datetime(2030, 1, 7, tzinfo=timezone.utc)
+
+
+def seed_busy(server: FakeCalendarServer, calendars, days: int, per_day: int, rng: random.Random):
+    """Give every calendar random half-hour-aligned busy blocks during working hours"""
+    for calendar_id in calendars:
+        blocks = []
+        for day in range(days):
+            for _ in range(per_day):
+                start = WINDOW_START + timedelta(days=day, hours=9, minutes=30 * rng.randrange(16))
+                blocks.append((start, start + timedelta(minutes=30 * rng.randint(1, 3))))
+        server.state.busy[calendar_id] = blocks
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    attendees = [f"attendee{i}@example.com" for i in range(args.attendees)]
+
+    with FakeCalendarServer(latency_ms=args.latency_ms) as server:
+        seed_busy(server, ["primary"] + attendees, args.days, args.busy_per_day, rng)
+        calendar = StandInCalendar(api_root_url=server.url)
+
+        def query(offset_hours: int, days: int):
+            start = WINDOW_START + timedelta(hours=offset_hours)
+            return calendar.find_slots(
+                "bench",
+                duration_minutes=args.duration,
+                window_start=start.isoformat(),
+                window_end=(start + timedelta(days=days)).isoformat(),
+                attendees=attendees
+            )
+
+        # The first query spans everything, so the rest are served from the cache
+        started = time.perf_counter()
+        first = query(0, args.days)
+        first_ms = (time.perf_counter() - started) * 1000
+
+        max_offset = max(1, (args.days - args.query_days) * 24)
+        latencies = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            query(rng.randrange(max_offset), args.query_days)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        requests_made = server.state.http_requests
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "first_query_ms": first_ms,
+        "first_query_slots": len(first["slots"]),
+        "cached_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99))
+        },
+        "http_requests": requests_made,
+        "cache": calendar.get_stats()["freebusy"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--attendees", type=int, default=5)
+    parser.add_argument("--days", type=int, default=14, help="Span of seeded busy time")
+    parser.add_argument("--busy-per-day", type=int, default=6)
+    parser.add_argument("--query-days", type=int, default=3, help="Length of each query window")
+    parser.add_argument("--duration", type=int, default=30, help="Meeting length in minutes")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"first query (fetches free/busy): {report['first_query_ms']:.1f} ms, "
+          f"{report['first_query_slots']} slots")
+    cached = report["cached_ms"]
+    print(f"cached queries: p50 {cached['p50']:.3f} ms  p95 {cached['p95']:.3f} ms  "
+          f"p99 {cached['p99']:.3f} ms")
+    print(f"HTTP requests: {report['http_requests']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+GroqClient under injected faults from the local stand-in Groq API: retries
+(with and without Retry-After), hedged requests against slow responses,
+the circuit breaker during an outage and against malformed responses, and
+the concurrency limit.
+
+Exits with status 1 if any scenario doesn't behave as configured.
+
+    python -m benchmarks.groq_resilience --calls 200 --json resilience.json
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.common import latency_summary, format_summary, write_report
+from benchmarks.fake_groq import FakeGroqServer
+from app.api.groq_client import GroqClient, GroqError
+
+MESSAGE = "Can you confirm the delivery date for order ORD-1042?"
+
+
+async def timed_calls(client: GroqClient, calls: int, concurrency: int, stream: bool = False) -> dict:
+    """Make calls, concurrency at a time; latency of successes and count of failures by outcome"""
+    latencies, failures = [], {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if stream:
+                    tokens = [token async for token in client.astream_response(MESSAGE)]
+                    assert tokens
+                else:
+                    await client.agenerate_response(MESSAGE)
+                latencies.append(time.perf_counter() - started)
+            except GroqError as e:
+                failures[e.outcome] = failures.get(e.outcome, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return {"succeeded": len(latencies), "failures": failures, "latency": latency_summary(latencies)}
+
+
+async def with_client(server: FakeGroqServer, func, **options):
+    client = GroqClient(api_key="bench", base_url=server.url, **options)
+    await client.start()
+    try:
+        result = await func(client)
+        result["client"] = client.get_stats()
+        return result
+    finally:
+        await client.close()
+
+
+async def scenarios(args) -> dict:
+    results = {}
+    fast = {"first_token_ms": args.first_token_ms, "token_ms": 0.0, "tokens": 10, "seed": args.seed}
+    # Breaker off where failures are expected to be retried through
+    no_breaker = {"breaker_failures": 0, "backoff_seconds": 0.02, "max_backoff_seconds": 0.2}
+
+    # A rate limit with Retry-After: the retry waits at least that long, then succeeds
+    with FakeGroqServer(retry_after=args.retry_after, **fast) as server:
+        server.fail_next(429)
+
+        async def once(client):
+            started = time.perf_counter()
+            await client.agenerate_response(MESSAGE)
+            return {"seconds": time.perf_counter() - started, "requests": server.requests}
+        results["retry_after"] = await with_client(
+            server, once, **{**no_breaker, "max_backoff_seconds": 2 * args.retry_after}
+        )
+
+    # Random 503s and dropped connections: success rate without and with retries
+    for status in (503, 0):
+        with FakeGroqServer(error_rate=args.error_rate, error_status=status, **fast) as server:
+            name = "dropped_connections" if status == 0 else f"http_{status}"
+            results[name] = {
+                "no_retries": await with_client(
+                    server, lambda client: timed_calls(client, args.calls, args.concurrency),
+                    max_retries=0, **no_breaker
+                ),
+                "retries": await with_client(
+                    server, lambda client: timed_calls(client, args.calls, args.concurrency),
+                    max_retries=args.retries, **no_breaker
+                )
+            }
+
+    # Streams that fail before their first token are retried too
+    with FakeGroqServer(error_rate=args.error_rate, error_status=503, **fast) as server:
+        results["stream_retries"] = await with_client(
+            server, lambda client: timed_calls(client, args.calls, args.concurrency, stream=True),
+            max_retries=args.retries, **no_breaker
+        )
+
+    # A slow tail: latency without and with hedging
+    with FakeGroqServer(slow_rate=args.slow_rate, slow_ms=args.slow_ms, **fast) as server:
+        results["tail"] = {
+            "no_hedging": await with_client(
+                server, lambda client: timed_calls(client, args.calls, args.concurrency)
+            ),
+            "hedging": await with_client(
+                server, lambda client: timed_calls(client, args.calls, args.concurrency),
+                hedge_after_seconds=args.hedge_after_ms / 1000.0
+            )
+        }
+
+    # An outage: the breaker opens after a few failures and fails the rest fast,
+    # then closes again once Groq recovers
+    with FakeGroqServer(error_rate=1.0, error_status=503, **fast) as server:
+        async def outage(client):
+            during = await timed_calls(client, args.calls, 1)
+            requests_during = server.requests
+            started = time.perf_counter()
+            for _ in range(args.calls):
+                try:
+                    await client.agenerate_response(MESSAGE)
+                except GroqError:
+                    pass
+            fast_fail_ms = (time.perf_counter() - started) / args.calls * 1000.0
+            server.error_rate = 0.0
+            await asyncio.sleep(args.breaker_reset_ms / 1000.0)
+            recovered = await timed_calls(client, 10, 1)
+            return {
+                "during": during,
+                "requests_reaching_groq": requests_during,
+                "fast_fail_ms": fast_fail_ms,
+                "recovered": recovered,
+                "breaker_state": client.breaker.state
+            }
+        results["outage"] = await with_client(
+            server, outage, max_retries=0, breaker_failures=args.breaker_failures,
+            breaker_reset_seconds=args.breaker_reset_ms / 1000.0
+        )
+
+    # Malformed 200 responses are failures too: they open the breaker like an
+    # outage and a trial call after recovery closes it again
+    with FakeGroqServer(error_rate=1.0, error_status=200, **fast) as server:
+        for name, stream in (("malformed", False), ("malformed_stream", True)):
+            async def malformed(client):
+                server.error_rate = 1.0
+                during = await timed_calls(client, args.breaker_failures * 2, 1, stream=stream)
+                server.error_rate = 0.0
+                await asyncio.sleep(args.breaker_reset_ms / 1000.0)
+                recovered = await timed_calls(client, 10, 1, stream=stream)
+                return {"during": during, "recovered": recovered, "breaker_state": client.breaker.state}
+            results[name] = await with_client(
+                server, malformed, max_retries=0, breaker_failures=args.breaker_failures,
+                breaker_reset_seconds=args.breaker_reset_ms / 1000.0
+            )
+
+    # Outbound load shaping: never more than max_concurrency requests at Groq
+    with FakeGroqServer(**fast) as server:
+        async def limited(client):
+            result = await timed_calls(client, args.calls, args.calls)
+            result["max_in_flight"] = server.max_in_flight
+            return result
+        results["concurrency_limit"] = await with_client(
+            server, limited, max_concurrency=args.max_concurrency
+        )
+
+    return results
+
+
+def check(results: dict, args) -> list:
+    failures = []
+    if results["retry_after"]["seconds"] < args.retry_after:
+        failures.append("retry did not wait for Retry-After")
+    for name in ("http_503", "dropped_connections"):
+        if results[name]["retries"]["succeeded"] <= results[name]["no_retries"]["succeeded"]:
+            failures.append(f"retries did not help with {name}")
+    if results["stream_retries"]["succeeded"] <= args.calls * (1 - args.error_rate):
+        failures.append("streams were not retried")
+    tail = results["tail"]
+    if tail["hedging"]["latency"]["p99_ms"] >= tail["no_hedging"]["latency"]["p99_ms"]:
+        failures.append("hedging did not cut p99 latency")
+    outage = results["outage"]
+    if outage["requests_reaching_groq"] > args.calls / 2:
+        failures.append("circuit breaker did not stop requests during the outage")
+    if outage["recovered"]["succeeded"] != 10 or outage["breaker_state"] != "closed":
+        failures.append("circuit breaker did not close after recovery")
+    for name in ("malformed", "malformed_stream"):
+        malformed = results[name]
+        if set(malformed["during"]["failures"]) != {"bad_response", "circuit_open"}:
+            failures.append(f"{name} responses did not fail as bad_response and open the breaker")
+        if malformed["recovered"]["succeeded"] != 10 or malformed["breaker_state"] != "closed":
+            failures.append(f"circuit breaker did not close after {name} responses")
+    limited = results["concurrency_limit"]
+    if limited["max_in_flight"] > args.max_concurrency or limited["succeeded"] != args.calls:
+        failures.append("concurrency limit was not respected")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200, help="Calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=1000.0)
+    parser.add_argument("--hedge-after-ms", type=float, default=200.0)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-reset-ms", type=float, default=500.0)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(scenarios(args))
+
+    print(f"retry after 429: {results['retry_after']['seconds']:.2f} s (Retry-After {args.retry_after:g} s)")
+    for name in ("http_503", "dropped_connections"):
+        for mode, row in results[name].items():
+            print(f"{name:<20} {mode:<11} {row['succeeded']:>5}/{args.calls} succeeded  failures {row['failures']}")
+    row = results["stream_retries"]
+    print(f"{'stream http_503':<20} {'retries':<11} {row['succeeded']:>5}/{args.calls} succeeded  failures {row['failures']}")
+    for mode, row in results["tail"].items():
+        print(format_summary(f"tail ({mode})", row["latency"]))
+    outage = results["outage"]
+    print(
+        f"outage: {outage['requests_reaching_groq']} of {args.calls} calls reached Groq, "
+        f"fast fail {outage['fast_fail_ms']:.3f} ms, breaker {outage['breaker_state']} after recovery"
+    )
+    for name in ("malformed", "malformed_stream"):
+        malformed = results[name]
+        print(
+            f"{name}: failures {malformed['during']['failures']}, "
+            f"breaker {malformed['breaker_state']} after recovery"
+        )
+    limited = results["concurrency_limit"]
+    print(f"concurrency limit {args.max_concurrency}: max {limited['max_in_flight']} in flight at Groq")
+
+    report = {"config": {key: value for key, value in vars(args).items() if key != "json"}, "results": results}
+    if args.json:
+        write_report(args.json, report)
+
+    failures = check(results, args)
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
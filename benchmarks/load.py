@@ -0,0 +1,326 @@
+"""
+End-to-end load test of the API against local stand-ins for Groq and Google Calendar.
+
+Starts the fake Groq and Calendar servers, then the API under uvicorn in a
+subprocess pointed at them (with a throwaway memory and credentials
+directory), and drives it with concurrent clients running a weighted mix of
+chat, streaming chat, memory listing, meeting scheduling and slot finding.
+With --workers > 1 the API runs multiple uvicorn workers sharing one memory
+server, as main.py does with API_WORKERS. Use --url to target an API that
+is already running instead.
+
+    python -m benchmarks.load --concurrency 32 --requests 2000 --json load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.memory import memory_server
+from benchmarks.common import latency_summary, format_summary, write_report
+from benchmarks.fake_calendar import FakeCalendarServer
+from benchmarks.fake_groq import FakeGroqServer
+
+QUESTIONS = [
+    "What is the status of order {n}?",
+    "Can you summarise my last conversation about invoice {n}?",
+    "Please draft a reply to the customer asking about shipment {n}.",
+    "When is my next meeting with account {n}?",
+    "What did we agree on pricing for contract {n}?",
+    "Remind me what the customer said about ticket {n}."
+]
+DEFAULT_MIX = "chat=60,stream=15,memories=15,schedule=5,slots=5"
+METRIC_LINE = re.compile(r'^(\w+)_(sum|count)\{(.*)\} (\S+)$')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_tokens(credentials_dir: str, users: int):
+    """Authorized-user tokens that stay valid, so the API never starts an OAuth flow"""
+    for i in range(users):
+        with open(os.path.join(credentials_dir, f"load-user-{i}_token.json"), "w") as f:
+            json.dump({
+                "token": f"token-{i}",
+                "refresh_token": "unused",
+                "client_id": "load-test",
+                "client_secret": "load-test",
+                "expiry": "2099-01-01T00:00:00Z"
+            }, f)
+
+
+def start_api(port: int, env: dict, timeout: float, log_file=None, workers: int = 1) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.api:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+         "--workers", str(workers)],
+        env=env,
+        stdout=log_file or subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited during startup with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health/ready", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"API did not become ready within {timeout:.0f}s")
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies = defaultdict(list)  # Operation -> seconds
+        self.errors = defaultdict(lambda: defaultdict(int))  # Operation -> status -> count
+        self.asked = []
+        operations = dict(item.split("=") for item in args.mix.split(","))
+        self.operations = list(operations)
+        self.weights = [float(operations[name]) for name in self.operations]
+
+    def _user(self) -> str:
+        return f"load-user-{self.rng.randrange(self.args.users)}"
+
+    def _message(self) -> str:
+        # Some questions repeat, like real traffic, which exercises the caches
+        if self.asked and self.rng.random() < self.args.repeat_fraction:
+            return self.rng.choice(self.asked)
+        message = self.rng.choice(QUESTIONS).format(n=self.rng.randrange(100000))
+        self.asked.append(message)
+        return message
+
+    def _meeting(self, user_id: str) -> dict:
+        start = datetime(2030, 1, 7, 9) + timedelta(days=self.rng.randrange(30), minutes=30 * self.rng.randrange(16))
+        return {
+            "summary": "Load test meeting",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=30)).isoformat(),
+            "attendees": ["customer@example.com"],
+            "user_id": user_id
+        }
+
+    async def chat(self):
+        response = await self.client.post("/chat", json={"message": self._message(), "user_id": self._user()})
+        # Groq failures are answered with an apology flagged in the context
+        if response.status_code == 200 and response.json()["context"].get("error"):
+            return "fallback"
+        return response.status_code
+
+    async def stream(self):
+        started = time.perf_counter()
+        first = True
+        done = False
+        failed = False
+        async with self.client.stream(
+            "POST", "/chat/stream", json={"message": self._message(), "user_id": self._user()}
+        ) as response:
+            async for line in response.aiter_lines():
+                if first and line.startswith("data:"):
+                    self.latencies["stream_first_token"].append(time.perf_counter() - started)
+                    first = False
+                if done and line.startswith("data:"):
+                    failed = bool(json.loads(line[len("data:"):])["context"].get("error"))
+                done = line == "event: done"
+            return "fallback" if failed else response.status_code
+
+    async def memories(self):
+        response = await self.client.get(f"/memories/{self._user()}")
+        return response.status_code
+
+    async def schedule(self):
+        # Scheduling is asynchronous; measure until the job has finished
+        user_id = self._user()
+        response = await self.client.post("/schedule-meeting", json=self._meeting(user_id))
+        if response.status_code != 202:
+            return response.status_code
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await self.client.get(f"/jobs/{job_id}")).json()
+            if job["status"] in ("succeeded", "failed"):
+                return 200 if job["status"] == "succeeded" else "job_failed"
+            await asyncio.sleep(0.05)
+
+    async def slots(self):
+        response = await self.client.post("/find-slots", json={
+            "user_id": self._user(),
+            "duration_minutes": 30,
+            "window_start": "2030-01-07T00:00:00",
+            "window_end": "2030-01-14T00:00:00",
+            "attendees": ["customer@example.com"]
+        })
+        return response.status_code
+
+    async def _one(self, operation: str):
+        started = time.perf_counter()
+        try:
+            status = await getattr(self, operation)()
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        if status == 200:
+            self.latencies[operation].append(time.perf_counter() - started)
+        else:
+            self.errors[operation][str(status)] += 1
+
+    async def run(self, total: int, concurrency: int):
+        queue = asyncio.Queue()
+        for operation in self.rng.choices(self.operations, weights=self.weights, k=total):
+            queue.put_nowait(operation)
+
+        async def worker():
+            while not queue.empty():
+                await self._one(queue.get_nowait())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def server_stages(metrics_text: str) -> dict:
+    """Mean server-side time per instrumented stage, from /metrics"""
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        match = METRIC_LINE.match(line)
+        if not match or not match.group(1).endswith("_seconds"):
+            continue
+        key = f"{match.group(1)}{{{match.group(3)}}}"
+        (sums if match.group(2) == "sum" else counts)[key] = float(match.group(4))
+    return {key: sums[key] / counts[key] * 1000.0 for key in sums if counts.get(key)}
+
+
+async def drive(url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        if args.warmup:
+            await LoadGenerator(client, argparse.Namespace(**{**vars(args), "seed": args.seed + 1})).run(
+                args.warmup, args.concurrency
+            )
+
+        generator = LoadGenerator(client, args)
+        started = time.perf_counter()
+        await generator.run(args.requests, args.concurrency)
+        elapsed = time.perf_counter() - started
+
+        metrics = await client.get("/metrics")
+
+    completed = sum(len(values) for name, values in generator.latencies.items() if name != "stream_first_token")
+    return {
+        "elapsed_s": elapsed,
+        "throughput_rps": completed / elapsed,
+        "operations": {name: latency_summary(values) for name, values in sorted(generator.latencies.items())},
+        "errors": {name: dict(counts) for name, counts in generator.errors.items()},
+        "server_stage_mean_ms": server_stages(metrics.text) if metrics.status_code == 200 else {}
+    }
+
+
+def run(args) -> dict:
+    config = {key: value for key, value in vars(args).items() if key != "json"}
+    if args.url:
+        return {"config": config, **asyncio.run(drive(args.url, args))}
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    credentials_dir = os.path.join(workdir, "credentials")
+    os.makedirs(credentials_dir)
+    write_tokens(credentials_dir, args.users)
+
+    with FakeGroqServer(
+        first_token_ms=args.groq_first_token_ms,
+        token_ms=args.groq_token_ms,
+        error_rate=args.groq_error_rate,
+        error_status=args.groq_error_status,
+        retry_after=args.groq_retry_after,
+        seed=args.seed
+    ) as groq, \
+            FakeCalendarServer(latency_ms=args.calendar_latency_ms) as calendar:
+        env = {
+            **os.environ,
+            "GROQ_API_KEY": "load-test",
+            "GROQ_API_BASE_URL": groq.url,
+            "GOOGLE_CALENDAR_API_ROOT": calendar.url,
+            "GOOGLE_CREDENTIALS_DIR": credentials_dir,
+            "CALENDAR_EVENT_CACHE_PATH": os.path.join(workdir, "event_cache.sqlite3"),
+            "MEMORY_DIR": os.path.join(workdir, "memory")
+        }
+        port = free_port()
+        log_file = open(args.server_log, "w") if args.server_log else None
+        memory_process = None
+        if args.workers > 1:
+            env["MEMORY_SERVER_SOCKET"] = os.path.join(workdir, "memory.sock")
+            memory_process = memory_server.spawn(
+                env["MEMORY_SERVER_SOCKET"], env, args.startup_timeout, log_file or subprocess.DEVNULL
+            )
+        try:
+            process = start_api(port, env, args.startup_timeout, log_file, args.workers)
+            try:
+                report = asyncio.run(drive(f"http://127.0.0.1:{port}", args))
+                report["upstream_requests"] = {"groq": groq.requests, "calendar": calendar.state.http_requests}
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        finally:
+            if memory_process is not None:
+                memory_process.terminate()
+                memory_process.wait(timeout=60)
+            if log_file:
+                log_file.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {"config": config, **report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Target a running API instead of starting one")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes (>1 adds a memory server)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--repeat-fraction", type=float, default=0.2)
+    parser.add_argument("--groq-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--groq-token-ms", type=float, default=5.0)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0,
+                        help="Share of Groq requests the stand-in fails, to exercise retries and the breaker")
+    parser.add_argument("--groq-error-status", type=int, default=429)
+    parser.add_argument("--groq-retry-after", type=float, help="Retry-After seconds on injected 429/503s")
+    parser.add_argument("--calendar-latency-ms", type=float, default=40.0)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--server-log", help="Write the API's output to this file (discarded by default)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    for name, summary in report["operations"].items():
+        print(format_summary(name, summary))
+    print(f"throughput: {report['throughput_rps']:.1f} requests/s over {report['elapsed_s']:.1f} s")
+    if report["errors"]:
+        print(f"errors: {json.dumps(report['errors'])}")
+    for stage, mean_ms in sorted(report["server_stage_mean_ms"].items()):
+        print(f"  {stage}: {mean_ms:.2f} ms mean")
+
+    if args.json:
+        write_report(args.json, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Microbenchmarks for the memory path: embedding, search at growing history
+sizes, and add/save.
+
+Runs against a throwaway memory directory, with the configured embedding
+model. Histories are seeded straight into the store with random unit
+vectors, since search cost does not depend on the text.
+
+    python -m benchmarks.memory_micro --history-sizes 100 1000 10000 --json memory.json
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.memory.faiss_memory import FaissMemory
+from app.memory.memory_store import MemoryStore
+from benchmarks.common import latency_summary, format_summary, write_report
+
+
+def bench_embedding(memory: FaissMemory, args) -> dict:
+    results = {}
+
+    # One message at a time through the batcher, as a lone request sees it
+    times = []
+    for i in range(args.embed_samples):
+        started = time.perf_counter()
+        memory.batcher.encode(f"Can you move my meeting with customer {i} to next week?")
+        times.append(time.perf_counter() - started)
+    results["single"] = latency_summary(times)
+
+    # Direct batched encodes, to show what micro-batching can gain
+    if memory.model is not None:
+        throughput = {}
+        for batch_size in args.embed_batch_sizes:
+            texts = [f"Invoice {i} for order {i * 7} is overdue" for i in range(batch_size)]
+            memory.model.encode(texts)
+            rounds = max(1, args.embed_samples // batch_size)
+            started = time.perf_counter()
+            for _ in range(rounds):
+                memory.model.encode(texts)
+            throughput[str(batch_size)] = rounds * batch_size / (time.perf_counter() - started)
+        results["batch_texts_per_s"] = throughput
+    return results
+
+
+def seed_history(store: MemoryStore, user_id: str, size: int, rng: np.random.Generator):
+    vectors = rng.standard_normal((size, store.embedding_size)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    now = time.time()
+    records = [
+        {"query": f"Question {i} about order {i * 13}", "response": f"Answer {i}", "timestamp": now - size + i}
+        for i in range(size)
+    ]
+    store.append_many(user_id, records, vectors)
+
+
+def bench_search(memory: FaissMemory, args, rng: np.random.Generator) -> dict:
+    results = {}
+    for size in args.history_sizes:
+        user_id = f"history-{size}"
+        queries = rng.standard_normal((args.search_samples, memory.embedding_size)).astype('float32')
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        # The first access loads the user from disk
+        started = time.perf_counter()
+        memory.search("warm up", user_id, args.limit, embedding=queries[0])
+        load_s = time.perf_counter() - started
+
+        times = []
+        for query in queries:
+            started = time.perf_counter()
+            memory.search("benchmark", user_id, args.limit, embedding=query)
+            times.append(time.perf_counter() - started)
+        results[str(size)] = {**latency_summary(times), "load_ms": load_s * 1000.0}
+    return results
+
+
+def bench_add(memory: FaissMemory, args, rng: np.random.Generator) -> dict:
+    vectors = rng.standard_normal((args.add_samples, memory.embedding_size)).astype('float32')
+
+    add_times = []
+    for i, vector in enumerate(vectors):
+        started = time.perf_counter()
+        memory.add("add-bench", f"Question {i}", f"Answer {i}", embedding=vector)
+        add_times.append(time.perf_counter() - started)
+
+    save_times = []
+    for i, vector in enumerate(vectors):
+        started = time.perf_counter()
+        memory.store.append("save-bench", {"query": f"Question {i}", "response": "", "timestamp": time.time()}, vector)
+        save_times.append(time.perf_counter() - started)
+
+    return {"add": latency_summary(add_times), "store_append": latency_summary(save_times)}
+
+
+def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    memory_dir = tempfile.mkdtemp(prefix="memory-bench-")
+    try:
+        memory = FaissMemory(memory_dir=memory_dir, embedding_cache_size=0, index_backend=args.index_backend)
+        try:
+            embedding = bench_embedding(memory, args)
+            embedding_size = memory.embedding_size
+        finally:
+            memory.close()
+
+        # Seed histories first so the next instance discovers the users on disk
+        store = MemoryStore(memory_dir, embedding_size)
+        for size in args.history_sizes:
+            seed_history(store, f"history-{size}", size, rng)
+
+        memory = FaissMemory(memory_dir=memory_dir, embedding_cache_size=0, index_backend=args.index_backend)
+        try:
+            search = bench_search(memory, args, rng)
+            add = bench_add(memory, args, rng)
+        finally:
+            memory.close()
+    finally:
+        shutil.rmtree(memory_dir, ignore_errors=True)
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "embedding": embedding,
+        "search": search,
+        "add": add
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--index-backend", default="flat", choices=["flat", "hnsw", "ivfpq"])
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--embed-samples", type=int, default=200)
+    parser.add_argument("--embed-batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--search-samples", type=int, default=500)
+    parser.add_argument("--add-samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(format_summary("embed (single)", report["embedding"]["single"]))
+    for batch_size, rate in report["embedding"].get("batch_texts_per_s", {}).items():
+        print(f"{'embed batch ' + batch_size:<24} {rate:>10.1f} texts/s")
+    for size, summary in report["search"].items():
+        print(format_summary(f"search ({size})", summary) + f"  load {summary['load_ms']:.1f} ms")
+    print(format_summary("add", report["add"]["add"]))
+    print(format_summary("store append", report["add"]["store_append"]))
+
+    if args.json:
+        write_report(args.json, report)
+
+
+if __name__ == "__main__":
+    main()
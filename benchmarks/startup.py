@@ -0,0 +1,125 @@
+"""
+Cold-start benchmark: how long importing the API takes and how long a fresh
+server takes to answer /health/live and to become ready.
+
+Each run is a new process with a throwaway memory directory, so nothing is
+warm except the OS file cache. Per-stage startup times come from the
+server's /health/ready report.
+
+    python -m benchmarks.startup --runs 5 --json startup.json
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import latency_summary, format_summary, write_report
+from benchmarks.load import free_port
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.api.api; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_start(env: dict, timeout: float) -> dict:
+    """Seconds from spawning uvicorn until /health/live and /health/ready answer 200"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.api:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+    result = {}
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"API exited during startup with code {process.returncode}")
+            try:
+                if "live_s" not in result:
+                    if httpx.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code == 200:
+                        result["live_s"] = time.perf_counter() - started
+                else:
+                    response = httpx.get(f"http://127.0.0.1:{port}/health/ready", timeout=1)
+                    if response.status_code == 200:
+                        result["ready_s"] = time.perf_counter() - started
+                        result["stages_s"] = response.json()["startup_seconds"]
+                        return result
+                    if response.json()["status"] == "failed":
+                        raise RuntimeError(f"API failed to start: {response.json()['error']}")
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError(f"API did not become ready within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def run(args) -> dict:
+    imports, live, ready, stages = [], [], [], {}
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix="startup-bench-")
+        env = {
+            **os.environ,
+            "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "startup-bench"),
+            "MEMORY_DIR": os.path.join(workdir, "memory"),
+            "GOOGLE_CREDENTIALS_DIR": os.path.join(workdir, "credentials"),
+            "CALENDAR_EVENT_CACHE_PATH": os.path.join(workdir, "event_cache.sqlite3")
+        }
+        os.makedirs(env["GOOGLE_CREDENTIALS_DIR"])
+        try:
+            imports.append(measure_import(env))
+            result = measure_start(env, args.timeout)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        live.append(result["live_s"])
+        ready.append(result["ready_s"])
+        for stage, seconds in result["stages_s"].items():
+            stages.setdefault(stage, []).append(seconds)
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "import": latency_summary(imports),
+        "time_to_live": latency_summary(live),
+        "time_to_ready": latency_summary(ready),
+        "stages": {stage: latency_summary(values) for stage, values in stages.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(format_summary("import app.api.api", report["import"]))
+    print(format_summary("time to /health/live", report["time_to_live"]))
+    print(format_summary("time to /health/ready", report["time_to_ready"]))
+    for stage, summary in report["stages"].items():
+        print(format_summary(f"  stage {stage}", summary))
+
+    if args.json:
+        write_report(args.json, report)
+
+
+if __name__ == "__main__":
+    main()
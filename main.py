@@ -1,6 +1,6 @@
 import uvicorn
-from app.api.api import app
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,12 +9,37 @@ load_dotenv(override=True)  # Add override=True
 # Get configuration from environment variables
 host = os.getenv("API_HOST", "127.0.0.1")
 port = int(os.getenv("API_PORT", "8010"))  # Hardcoded default
+# More than one worker moves FaissMemory into a shared memory server process
+workers = int(os.getenv("API_WORKERS", "1"))
 
 if __name__ == "__main__":
     print(f"Starting API server at http://{host}:{port} (ENV: {os.getenv('API_PORT')})")
-    uvicorn.run(
-        "app.api.api:app",
-        host=host,
-        port=port,
-        reload=False  # Disable auto-reload to prevent port conflicts
-    )
\ No newline at end of file
+    if workers <= 1:
+        uvicorn.run(
+            "app.api.api:app",
+            host=host,
+            port=port,
+            reload=False  # Disable auto-reload to prevent port conflicts
+        )
+    else:
+        from app.memory import memory_server
+
+        # Workers inherit MEMORY_SERVER_SOCKET and connect to the server instead of loading memory
+        socket_path = os.getenv("MEMORY_SERVER_SOCKET") or os.path.join(
+            tempfile.gettempdir(), f"assistant-memory-{port}.sock"
+        )
+        os.environ["MEMORY_SERVER_SOCKET"] = socket_path
+        print(f"Starting memory server at {socket_path} for {workers} workers")
+        server = memory_server.spawn(socket_path)
+        try:
+            uvicorn.run(
+                "app.api.api:app",
+                host=host,
+                port=port,
+                workers=workers,
+                reload=False
+            )
+        finally:
+            # The memory server flushes queued writes on SIGTERM
+            server.terminate()
+            server.wait(timeout=60)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from app.memory.embedding_batcher import EmbeddingBatcher
+
+
+def test_texts_get_their_own_vectors():
+    batcher = EmbeddingBatcher(lambda texts: np.array([[len(text)] for text in texts]), max_wait_ms=20)
+    try:
+        futures = [batcher.submit("a" * i) for i in range(1, 6)]
+        assert [future.result(timeout=5)[0] for future in futures] == [1, 2, 3, 4, 5]
+    finally:
+        batcher.close()
+
+
+def test_short_encoder_result_fails_the_whole_batch():
+    batcher = EmbeddingBatcher(lambda texts: np.zeros((len(texts) - 1, 4)), max_wait_ms=20)
+    try:
+        futures = [batcher.submit(f"text {i}") for i in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+        assert batcher.get_stats()["batches"] == 0
+    finally:
+        batcher.close()
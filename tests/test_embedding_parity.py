@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.memory.embedding_backends import load_embedding_backend
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+K = 5
+# Same tolerances as the benchmarks.embedding_backends defaults
+MIN_COSINE = 0.98
+MIN_OVERLAP = 0.8
+
+SUBJECTS = (
+    "the quarterly budget review", "my dentist appointment", "the product launch",
+    "the design sync with Priya", "our flight to Berlin", "the server migration",
+    "the customer onboarding call", "the hiring committee", "the invoice from Acme",
+    "the team offsite"
+)
+CORPUS = [
+    template.format(subject=subject)
+    for subject in SUBJECTS
+    for template in (
+        "Can you move {subject} to next Tuesday?",
+        "What did we decide about {subject}?",
+        "Remind me to prepare for {subject} tomorrow morning."
+    )
+]
+QUERIES = [
+    "Please reschedule the budget review to Friday.",
+    "Remind me what was agreed on the server migration.",
+    "I need to get ready for the product launch.",
+    "When is my flight to Berlin?",
+    "Did Acme send their invoice?",
+    "Push the onboarding call with the customer to next week."
+]
+
+
+def load(name: str):
+    try:
+        return load_embedding_backend(name, MODEL)
+    except Exception as e:
+        pytest.skip(f"{name} backend unavailable: {type(e).__name__}: {e}")
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    distances = ((queries[:, None, :] - corpus[None, :, :]) ** 2).sum(axis=2)
+    return np.argsort(distances, axis=1, kind="stable")[:, :K]
+
+
+@pytest.fixture(scope="module")
+def reference():
+    pytest.importorskip("sentence_transformers")
+    backend = load("torch")
+    return backend.encode(CORPUS), backend.encode(QUERIES)
+
+
+@pytest.mark.parametrize("name", ["torch-int8", "onnx", "onnx-int8"])
+def test_backend_matches_torch(name, reference):
+    if name.startswith("onnx"):
+        pytest.importorskip("onnxruntime")
+    reference_corpus, reference_queries = reference
+    backend = load(name)
+    corpus, queries = backend.encode(CORPUS), backend.encode(QUERIES)
+
+    vectors = np.concatenate([corpus, queries])
+    expected = np.concatenate([reference_corpus, reference_queries])
+    cosine = (vectors * expected).sum(axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(expected, axis=1)
+    )
+    assert cosine.min() >= MIN_COSINE
+
+    overlap = np.mean([
+        len(set(found) & set(wanted)) / K
+        for found, wanted in zip(top_k(corpus, queries), top_k(reference_corpus, reference_queries))
+    ])
+    assert overlap >= MIN_OVERLAP
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.api.jobs import JobLimitExceeded, JobManager
+
+
+def test_queries_are_not_tracked_and_not_blocked_by_jobs():
+    manager = JobManager(max_workers=4)
+    release = threading.Event()
+    try:
+        manager.submit("schedule_meeting", "u1", release.wait, 5)
+        with pytest.raises(JobLimitExceeded):
+            manager.submit("schedule_meeting", "u1", release.wait, 5)
+
+        # The user's pending job doesn't take their query slot
+        assert asyncio.run(manager.run("find_slots", "u1", lambda: "slots")) == "slots"
+        stats = manager.get_stats()
+        assert stats["tracked"] == 1 and stats["queries"] == 1 and stats["active_queries"] == 0
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_queries_have_their_own_per_user_limit():
+    manager = JobManager(max_workers=4, max_queries_per_user=1)
+    release = threading.Event()
+
+    async def two_queries():
+        first = asyncio.ensure_future(manager.run("find_slots", "u1", release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(JobLimitExceeded):
+            await manager.run("find_slots", "u1", release.wait, 5)
+        other_user = await manager.run("find_slots", "u2", lambda: "ok")
+        release.set()
+        return await first, other_user
+
+    try:
+        assert asyncio.run(two_queries()) == (True, "ok")
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_finished_jobs_beyond_the_cap_are_forgotten_oldest_first():
+    manager = JobManager(max_workers=2, max_jobs_per_user=100, max_tracked=3)
+    try:
+        jobs = [manager.submit("schedule_meeting", "u1", lambda i=i: i) for i in range(5)]
+        while manager.get_stats()["succeeded"] < len(jobs):
+            time.sleep(0.01)
+        manager.submit("schedule_meeting", "u1", lambda: None)
+
+        assert manager.get_stats()["tracked"] == 3
+        assert manager.get(jobs[0]["job_id"]) is None
+        assert manager.get(jobs[-1]["job_id"])["result"] == 4
+    finally:
+        manager.shutdown()
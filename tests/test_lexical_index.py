@@ -0,0 +1,32 @@
+from app.memory.lexical_index import LexicalIndex
+
+
+def index_with(*texts: str) -> LexicalIndex:
+    index = LexicalIndex()
+    for memory_id, text in enumerate(texts):
+        index.add(memory_id, text)
+    return index
+
+
+def test_identifiers_are_distinctive():
+    index = index_with(
+        "Where is order ORD-1042?",
+        "Please email bob@acme.com the agenda",
+        "The meeting moved to 14:30",
+        "Thanks for the update on the meeting"
+    )
+    assert index.distinctive_matches("status of ORD-1042") == {0}
+    assert index.distinctive_matches("what did I send to bob@acme.com") == {1}
+    assert index.distinctive_matches("anything at 14:30?") == {2}
+
+
+def test_common_words_are_not_distinctive():
+    index = index_with(*(f"Notes from the weekly meeting number {i}" for i in range(30)), "Budget review")
+    assert index.distinctive_matches("weekly meeting notes") == set()
+    # One memory in 31 has it: rare enough to count on its own
+    assert index.distinctive_matches("the budget") == {30}
+
+
+def test_few_memories_need_an_identifier():
+    index = index_with("Budget review", "Team offsite")
+    assert index.distinctive_matches("budget") == set()
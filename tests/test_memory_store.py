@@ -0,0 +1,139 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from app.memory import memory_store
+from app.memory.memory_store import MemoryStore
+
+SIZE = 4
+USER = "user-1"
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(SIZE, value, dtype='float32')
+
+
+def add(store: MemoryStore, *values: int):
+    store.append_many(
+        USER,
+        [{"id": value, "query": f"question {value}", "response": f"answer {value}"} for value in values],
+        np.stack([vector(value) for value in values])
+    )
+
+
+def assert_memories(store: MemoryStore, *values: int):
+    records, embeddings = store.load(USER)
+    assert [record["id"] for record in records] == list(values)
+    for record, embedding in zip(records, embeddings):
+        np.testing.assert_array_equal(embedding, vector(record["id"]))
+
+
+def only_file(store: MemoryStore, pattern: str) -> str:
+    (path,) = glob.glob(os.path.join(store.base_dir, USER, pattern))
+    return path
+
+
+def test_torn_embedding_row_is_cut_before_next_append(tmp_path):
+    store = MemoryStore(str(tmp_path), SIZE)
+    add(store, 1, 2, 3)
+    with open(only_file(store, "embeddings_*"), "ab") as f:
+        f.write(vector(99).tobytes()[:5])
+
+    reopened = MemoryStore(str(tmp_path), SIZE)
+    assert_memories(reopened, 1, 2, 3)
+    add(reopened, 4)
+    assert_memories(MemoryStore(str(tmp_path), SIZE), 1, 2, 3, 4)
+
+
+def test_torn_segment_line_is_cut_before_next_append(tmp_path):
+    store = MemoryStore(str(tmp_path), SIZE)
+    add(store, 1, 2)
+    with open(only_file(store, "segment_*"), "a") as f:
+        f.write('{"id": 3, "query": "quest')
+
+    reopened = MemoryStore(str(tmp_path), SIZE)
+    assert_memories(reopened, 1, 2)
+    add(reopened, 4)
+    assert_memories(MemoryStore(str(tmp_path), SIZE), 1, 2, 4)
+
+
+def test_failed_segment_write_is_rolled_back(tmp_path, monkeypatch):
+    store = MemoryStore(str(tmp_path), SIZE)
+    add(store, 1, 2)
+    embeddings_path = only_file(store, "embeddings_*")
+    segment_path = only_file(store, "segment_*")
+    sizes = os.path.getsize(embeddings_path), os.path.getsize(segment_path)
+
+    # The embeddings fsync succeeds, the segment's fails (e.g. ENOSPC)
+    real_fsync = os.fsync
+    calls = []
+
+    def failing_fsync(fd):
+        calls.append(fd)
+        if len(calls) == 2:
+            raise OSError(28, "No space left on device")
+        real_fsync(fd)
+
+    monkeypatch.setattr(memory_store.os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        add(store, 3)
+    monkeypatch.setattr(memory_store.os, "fsync", real_fsync)
+
+    assert (os.path.getsize(embeddings_path), os.path.getsize(segment_path)) == sizes
+    add(store, 4)
+    assert_memories(store, 1, 2, 4)
+    assert_memories(MemoryStore(str(tmp_path), SIZE), 1, 2, 4)
+
+
+def test_interrupted_compaction_keeps_the_live_generation(tmp_path, monkeypatch):
+    store = MemoryStore(str(tmp_path), SIZE)
+    add(store, 1, 2, 3)
+    store.delete(USER, [2])
+
+    # Crash after the new generation is written but before CURRENT points at it
+    def crash(user_id, generation):
+        raise OSError("crashed")
+
+    monkeypatch.setattr(store, "_set_generation", crash)
+    with pytest.raises(OSError):
+        store.compact(USER)
+
+    reopened = MemoryStore(str(tmp_path), SIZE)
+    assert_memories(reopened, 1, 3)
+    add(reopened, 4)
+    reopened.compact(USER)
+    assert_memories(MemoryStore(str(tmp_path), SIZE), 1, 3, 4)
+    assert len(glob.glob(os.path.join(str(tmp_path), USER, "segment_*"))) == 1
+
+
+def test_float16_files_are_converted_on_next_write(tmp_path):
+    add(MemoryStore(str(tmp_path), SIZE), 1, 2)
+
+    store = MemoryStore(str(tmp_path), SIZE, embedding_dtype="float16")
+    assert_memories(store, 1, 2)
+    add(store, 3)
+    assert only_file(store, "embeddings_*").endswith(".f16")
+    assert_memories(MemoryStore(str(tmp_path), SIZE, embedding_dtype="float16"), 1, 2, 3)
+
+
+@pytest.mark.parametrize("user_id", ["..", "../../x", "a/b", ""])
+def test_unsafe_user_ids_stay_inside_the_store(tmp_path, user_id):
+    base_dir = tmp_path / "memory" / "data"
+    outside = tmp_path / "keep.txt"
+    outside.write_text("not a memory file")
+    store = MemoryStore(str(base_dir), SIZE)
+    records = [{"id": value, "query": f"question {value}", "response": "answer"} for value in (1, 2)]
+    store.append_many(user_id, records, np.stack([vector(1), vector(2)]))
+    store.compact(user_id)
+
+    assert outside.read_text() == "not a memory file"
+    assert sorted(os.listdir(tmp_path)) == ["keep.txt", "memory"]
+    assert os.listdir(base_dir.parent) == ["data"]
+
+    reopened = MemoryStore(str(base_dir), SIZE)
+    assert reopened.user_ids() == [user_id]
+    loaded, embeddings = reopened.load(user_id)
+    assert [record["id"] for record in loaded] == [1, 2]
+    np.testing.assert_array_equal(embeddings[1], vector(2))
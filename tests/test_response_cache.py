@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.api.response_cache import ResponseCache
+
+SIZE = 8
+
+
+def vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(SIZE).astype('float32')
+
+
+def test_queries_naming_different_identifiers_do_not_match():
+    cache = ResponseCache()
+    embedding = vector(0)
+    cache.store("u1", "When will order ORD-1042 arrive?", embedding, "Tuesday")
+
+    assert cache.lookup("u1", "When will order ORD-1042 arrive?", embedding) == "Tuesday"
+    assert cache.lookup("u1", "When will order ORD-1043 arrive?", embedding) is None
+    assert cache.lookup("u1", "When will order ord-1042 arrive", embedding) == "Tuesday"
+
+
+def test_matrix_rows_follow_evictions_and_growth():
+    cache = ResponseCache(max_entries=40)
+    for i in range(100):
+        cache.store("u1", f"question {i}", vector(i), f"answer {i}")
+
+    # The oldest 60 were evicted; the rest still map to their own answers
+    assert cache.lookup("u1", "question 10", vector(10)) is None
+    for i in range(60, 100):
+        assert cache.lookup("u1", f"question {i}", vector(i)) == f"answer {i}"
+    assert cache.get_stats()["entries"] == 40
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    cache = ResponseCache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr("app.api.response_cache.time.time", lambda: now[0])
+    cache.store("u1", "old question", vector(1), "old")
+    now[0] += 5
+    cache.store("u1", "new question", vector(2), "new")
+    now[0] += 6
+
+    assert cache.lookup("u1", "old question", vector(1)) is None
+    assert cache.lookup("u1", "new question", vector(2)) == "new"
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_global_scope_shares_only_answers_without_personal_context():
+    cache = ResponseCache(scope="global")
+    memories = [{"timestamp": 1.0, "query": "my last order"}]
+    cache.store("alice", "what is my order status", vector(1), "Alice's order shipped", memories)
+    cache.store("alice", "what are your opening hours", vector(2), "9 to 5")
+
+    assert cache.lookup("bob", "what is my order status", vector(1)) is None
+    assert cache.lookup("alice", "what is my order status", vector(1), memories) == "Alice's order shipped"
+    assert cache.lookup("bob", "what are your opening hours", vector(2)) == "9 to 5"
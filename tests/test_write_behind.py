@@ -0,0 +1,81 @@
+import threading
+
+from app.memory.write_behind import WriteBehindQueue
+
+
+class FlakyWriter:
+    """Records written operations; fails every operation of the users in failing"""
+
+    def __init__(self):
+        self.failing = set()
+        self.written = []
+        self.lock = threading.Lock()
+
+    def __call__(self, operations):
+        with self.lock:
+            failed = [operation for operation in operations if operation[1] in self.failing]
+            self.written.extend(operation for operation in operations if operation[1] not in self.failing)
+            return failed
+
+
+def test_failed_writes_stay_pending_and_are_retried_in_order():
+    writer = FlakyWriter()
+    writer.failing.add("a")
+    queue = WriteBehindQueue(writer, max_delay_ms=0, retry_delay_ms=20)
+    try:
+        queue.put("append", "a", 1)
+        queue.put("append", "b", 1)
+        queue.flush()
+        assert queue.pending("a") == 1
+        assert queue.pending("b") == 0
+
+        # Held behind the failed write, so it can't overtake it
+        queue.put("delete", "a", 1)
+        queue.flush()
+        assert queue.pending("a") == 2
+        assert [operation for operation in writer.written if operation[1] == "a"] == []
+
+        writer.failing.clear()
+        queue.put("append", "b", 2)
+        queue.flush()
+        with queue._cond:
+            queue._cond.wait_for(lambda: not queue._pending["a"], timeout=5)
+        assert queue.pending("a") == 0
+        assert [operation for operation in writer.written if operation[1] == "a"] == [
+            ("append", "a", 1), ("delete", "a", 1)
+        ]
+        stats = queue.get_stats()
+        assert stats["errors"] >= 1 and stats["retries"] >= 1 and stats["held"] == 0
+    finally:
+        queue.close()
+
+
+def test_raising_write_fn_fails_the_whole_batch():
+    calls = []
+
+    def write(operations):
+        calls.append(list(operations))
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    queue = WriteBehindQueue(write, max_delay_ms=0, retry_delay_ms=10)
+    try:
+        queue.put("append", "a", 1)
+        queue.flush()
+        with queue._cond:
+            queue._cond.wait_for(lambda: not queue._pending["a"], timeout=5)
+        assert calls == [[("append", "a", 1)], [("append", "a", 1)]]
+        assert queue.get_stats()["errors"] == 1
+    finally:
+        queue.close()
+
+
+def test_close_drops_what_still_fails():
+    writer = FlakyWriter()
+    writer.failing.add("a")
+    queue = WriteBehindQueue(writer, max_delay_ms=0, retry_delay_ms=60000)
+    queue.put("append", "a", 1)
+    queue.flush()
+    queue.close()
+    assert queue.pending("a") == 0
+    assert queue.get_stats()["dropped"] == 1